@@ -0,0 +1,97 @@
+'''
+Logging setup of the application, done once by mainGUI before the window is built. Every logger
+hands its records to a QueueHandler, so logging from the GUI thread or a worker never waits on the
+disk; a QueueListener thread writes them to a rotating log file in the user's data directory.
+Levels are set per logger: the application logs from INFO, chatty libraries (matplotlib's font
+manager, PIL) only from WARNING, and the perf channel (see perflog.py) from INFO.
+'''
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+import perflog
+
+#set to write the log somewhere else
+LOG_DIR_VARIABLE = "DLC_DISPLAY_LOG_DIR"
+LOG_NAME = "app.log"
+
+#the log file is rotated at this size, keeping this many old files
+MAX_LOG_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+LEVELS = {
+    "": logging.INFO,
+    "matplotlib": logging.WARNING,
+    "PIL": logging.WARNING,
+    perflog.LOGGER_NAME: logging.INFO,
+}
+
+_listener = None
+_queue_handler = None
+
+def log_dir():
+    '''
+    Directory of the log file, created if it does not exist yet.
+    '''
+    directory = os.environ.get(LOG_DIR_VARIABLE)
+    if not directory:
+        if os.name == 'nt':
+            directory = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 'DeepLabCut-Display', 'logs')
+        else:
+            directory = os.path.join(os.environ.get('XDG_STATE_HOME', os.path.join(os.path.expanduser('~'), '.local', 'state')),
+                                     'DeepLabCut-Display')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def configure(directory=None, levels=None):
+    '''
+    Route all logging through a queue to the log file, with LEVELS (updated by levels) as the
+    per-logger levels. Only the first call has an effect. Returns the path of the log file.
+    '''
+    global _listener, _queue_handler
+    path = os.path.join(directory or log_dir(), LOG_NAME)
+    if _listener is not None:
+        return path
+
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=MAX_LOG_BYTES, backupCount=BACKUP_COUNT,
+                                                        encoding='utf-8', delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    logging.getLogger().addHandler(_queue_handler)
+    for name, level in dict(LEVELS, **(levels or {})).items():
+        logging.getLogger(name).setLevel(level)
+    logging.captureWarnings(True)
+
+    _listener = logging.handlers.QueueListener(records, file_handler)
+    _listener.start()
+    atexit.register(shutdown)
+
+    #exceptions nothing caught (e.g. in a Qt slot) end up in the log too
+    def log_exception(exc_type, exc_value, traceback):
+        logging.getLogger().critical("Uncaught exception", exc_info=(exc_type, exc_value, traceback))
+        sys.__excepthook__(exc_type, exc_value, traceback)
+    sys.excepthook = log_exception
+    return path
+
+def shutdown():
+    '''
+    Write out the queued records and detach the queue, e.g. on exit.
+    '''
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    logging.getLogger().removeHandler(_queue_handler)
+    sys.excepthook = sys.__excepthook__
+    logging.captureWarnings(False)
+    _listener = None
+    _queue_handler = None
@@ -0,0 +1,183 @@
+'''
+Command line tool computing gait parameters for many trials without the user interface. Every DLC
+file is handled by its own worker process, which reads the file, computes the requested parameters
+and writes them to CSV; only a one-row summary of each trial is sent back. A failed file is
+reported in the error log and does not stop the others.
+
+    python batchgait.py landmarks.json "Head Length,Speed,Stride Length" trials/ -o results/
+
+The landmark file is a JSON object mapping each anatomical landmark of the parameter dialog to the
+body part name used in the DLC files, e.g. {"Right Hock": "righthock", "Withers": "withers"}.
+Inputs can be files, directories (searched recursively) or glob patterns. With --threshold and
+--max-jump points are masked and short gaps filled (see cleaning.py) before any parameter is computed.
+'''
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import cleaning
+import gaitcalc
+import posecache
+import posefile
+
+SUMMARY_NAME = "summary.csv"
+ERROR_LOG_NAME = "errors.log"
+
+def find_inputs(inputs):
+    '''
+    DLC files named by the inputs, in order and without duplicates.
+    '''
+    paths = []
+    for name in inputs:
+        if os.path.isdir(name):
+            matches = posecache.pose_files(name)
+        else:
+            matches = sorted(glob.glob(name, recursive=True)) or [name]
+        for path in matches:
+            if os.path.splitext(path)[1].lower() in posefile.SUPPORTED_EXTENSIONS and path not in paths:
+                paths.append(path)
+    return paths
+
+def output_names(paths):
+    '''
+    Output file prefix of every trial, the file name without extension made unique.
+    '''
+    names = {}
+    used = set()
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, i = stem, 2
+        while name in used:
+            name = "{}_{}".format(stem, i)
+            i += 1
+        used.add(name)
+        names[path] = name
+    return names
+
+def process_trial(path, name, landmarks, parameters, output_dir, summ_stats=False, cleaning_options=None):
+    '''
+    Compute one trial and write its CSVs. Runs in a worker process; returns the summary row.
+    cleaning_options are the keyword arguments of cleaning.clean, None to use the data as read.
+    '''
+    pose = posecache.load(path)
+    summary = {"Trial": name, "File": path, "Frames": len(pose)}
+    if cleaning_options is not None:
+        result = cleaning.clean(pose, **cleaning_options)
+        pose = result.pose
+        summary["Masked Points"] = int(result.masked.sum())
+        summary["Repaired Points"] = int(result.repaired.sum())
+    engine = gaitcalc.GaitEngine(pose, landmarks)
+
+    calc_frame = engine.parameters(parameters)
+    for column in calc_frame.columns:
+        summary[column + " Mean"] = calc_frame[column].mean()
+        summary[column + " Standard Deviation"] = calc_frame[column].std()
+    if summ_stats:
+        calc_frame = gaitcalc.with_summary_statistics(calc_frame)
+    if len(calc_frame.columns):
+        calc_frame.to_csv(os.path.join(output_dir, name + "_parameters.csv"))
+
+    if any(p in parameters for p in gaitcalc.STRIDE_PARAMETERS):
+        stride_df = engine.stride_table()
+        stride_df.to_csv(os.path.join(output_dir, name + "_strides.csv"))
+        summary["Strides"] = len(stride_df)
+        for column in gaitcalc.STRIDE_PARAMETERS:
+            summary[column + " Mean"] = stride_df[column].mean()
+    return summary
+
+def run_batch(paths, landmarks, parameters, output_dir, workers=None, summ_stats=False, log=print,
+              cleaning_options=None):
+    '''
+    Process all trials over a pool of worker processes. Writes the summary table and, if any file
+    failed, the error log to output_dir. Returns the summary DataFrame and the number of failures.
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    names = output_names(paths)
+    rows = {}
+    errors = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_trial, path, names[path], landmarks, parameters, output_dir, summ_stats,
+                                   cleaning_options): path
+                   for path in paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                rows[path] = future.result()
+                status = "done"
+            except Exception as e:
+                errors.append("{}\n{}".format(path, "".join(traceback.format_exception(type(e), e, e.__traceback__))))
+                status = "FAILED: {}".format(e)
+            elapsed = time.perf_counter() - start
+            log("[{}/{}] {:.1f}s {} {}".format(done, len(paths), elapsed, path, status))
+
+    #summary rows in input order, whatever order the workers finished in
+    summary = pd.DataFrame([rows[path] for path in paths if path in rows])
+    summary.to_csv(os.path.join(output_dir, SUMMARY_NAME), index=False)
+    if errors:
+        with open(os.path.join(output_dir, ERROR_LOG_NAME), 'w') as file:
+            file.write("\n".join(errors))
+    return summary, len(errors)
+
+def parse_parameters(text):
+    '''
+    Parameter names from a comma separated list or from a file with one name per line.
+    '''
+    if os.path.isfile(text):
+        with open(text) as file:
+            names = [line.strip() for line in file]
+    else:
+        names = [name.strip() for name in text.split(",")]
+    names = [name for name in names if name]
+    unknown = [name for name in names if name not in gaitcalc.GAIT_PARAMETERS]
+    if unknown:
+        raise ValueError("Unknown gait parameters: {}. Known parameters: {}".format(
+            ", ".join(unknown), ", ".join(gaitcalc.GAIT_PARAMETERS)))
+    return names
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute gait parameters for a set of DeepLabCut files.")
+    parser.add_argument("landmarks", help="JSON file mapping landmarks to DLC body part names")
+    parser.add_argument("parameters", help="comma separated parameter names, or a file with one per line")
+    parser.add_argument("inputs", nargs="+", help="DLC files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="gait_results", help="directory for the result CSVs")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--summary-stats", action="store_true", help="prepend summary statistics rows to each trial's CSV")
+    parser.add_argument("--threshold", type=float, default=None, help="mask points below this likelihood")
+    parser.add_argument("--max-jump", type=float, default=None, help="mask single frame jumps over this many pixels/frame")
+    parser.add_argument("--max-gap", type=int, default=cleaning.DEFAULT_MAX_GAP,
+                        help="fill masked gaps up to this many frames (default: %(default)s)")
+    parser.add_argument("--interpolation", choices=cleaning.METHODS, default="linear", help="how masked gaps are filled")
+    args = parser.parse_args(argv)
+
+    with open(args.landmarks) as file:
+        landmarks = json.load(file)
+    try:
+        parameters = parse_parameters(args.parameters)
+    except ValueError as e:
+        parser.error(str(e))
+    paths = find_inputs(args.inputs)
+    if not paths:
+        parser.error("No DLC files found.")
+
+    cleaning_options = None
+    if args.threshold is not None or args.max_jump is not None:
+        cleaning_options = {"threshold": args.threshold or 0.0, "max_jump": args.max_jump,
+                            "max_gap": args.max_gap, "method": args.interpolation}
+    _, failures = run_batch(paths, landmarks, parameters, args.output, args.workers, args.summary_stats,
+                            log=lambda message: print(message, file=sys.stderr), cleaning_options=cleaning_options)
+    print("{} of {} trials processed, results in {}".format(len(paths) - failures, len(paths), args.output))
+    if failures:
+        print("Errors written to " + os.path.join(args.output, ERROR_LOG_NAME))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+'''
+Benchmark of the processing stages on synthetic data, run from the command line. A DLC pose table
+(any number of frames and body parts) with gait-like periodic movement and likelihood dropouts,
+and a video, are generated in a scratch directory; then ingest, masking, smoothing, the parameter
+kernels, stride detection, plot rendering (offscreen with Agg) and frame access are each timed over a few
+runs with the same code the application uses. The results are written as JSON together with the
+configuration, the machine and the git commit, so two commits can be compared on one machine:
+
+    python benchmark.py -o before.json
+    (change something)
+    python benchmark.py -o after.json --compare before.json
+
+With --compare the median of every stage is compared to the baseline and the exit status is 1
+if any stage got slower by more than --tolerance.
+'''
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import cleaning
+import decimate
+import framesource
+import gaitcalc
+import posefile
+import smoothing
+from posedata import PoseData, COORDS
+
+STAGES = ["ingest", "masking", "retention", "smoothing", "kernels", "strides", "render",
+          "frames sequential", "frames random", "frames cached"]
+
+#cleaning settings of the masking stage, a typical choice for a DLC trial
+THRESHOLD = 0.6
+MAX_JUMP = 40.0
+
+#low-pass cutoff (Hz) of the smoothing stage
+CUTOFF = 6.0
+
+#stride period of the synthetic gait, a third of it is swing
+STRIDE_FRAMES = 60
+SWING_FRACTION = 1 / 3
+
+#footfall order of a walk, as a fraction of the stride
+LIMB_PHASES = {"Right Hind": 0.0, "Right Fore": 0.25, "Left Hind": 0.5, "Left Fore": 0.75}
+
+#forward speed of the body and of a limb in stance, pixels per frame
+BODY_SPEED = 2.0
+STANCE_SPEED = 0.5
+
+#body parts drawn in the render stage, on both axes
+RENDER_BODYPARTS = 4
+
+#frames read by the random and cached frame access stages
+RANDOM_FRAMES = 100
+
+DEFAULTS = {"frames": 20000, "bodyparts": len(gaitcalc.LANDMARKS), "dropout": 0.05, "seed": 0,
+            "video_frames": 300, "width": 640, "height": 480, "fps": 30}
+
+def bodypart_name(landmark):
+    return landmark.lower().replace(" ", "")
+
+def limb_of(landmark):
+    '''
+    Limb (of LIMB_PHASES) a landmark belongs to, None for the head and trunk.
+    '''
+    side = "Left" if landmark.startswith("Left") else "Right" if landmark.startswith("Right") else None
+    if side is None:
+        return None
+    fore = any(word in landmark for word in ("Front", "Knee"))
+    return side + (" Fore" if fore else " Hind")
+
+def synthetic_landmarks(bodyparts):
+    '''
+    Landmark to body part mapping of a synthetic trial with this many body parts; body parts past
+    the landmarks of the parameter dialog are extra points on the trunk.
+    '''
+    return {landmark: bodypart_name(landmark) for landmark in gaitcalc.LANDMARKS[:bodyparts]}
+
+def synthetic_pose(frames, bodyparts=DEFAULTS["bodyparts"], dropout=DEFAULTS["dropout"], seed=0) -> PoseData:
+    '''
+    Pose predictions of a horse walking left to right. Head and trunk points move at a constant
+    speed and bob twice per stride; limb points alternate between a fast swing, lifted off the
+    ground, and a slow stance, with the limbs a quarter stride apart. About dropout of the points
+    are in short runs with a low likelihood and a position off by tens of pixels, as DLC predicts
+    occluded points.
+    '''
+    rng = np.random.default_rng(seed)
+    landmarks = list(gaitcalc.LANDMARKS[:bodyparts])
+    names = [bodypart_name(l) for l in landmarks] + ["point{}".format(i) for i in range(len(landmarks), bodyparts)]
+    limbs = [limb_of(l) for l in landmarks] + [None] * (bodyparts - len(landmarks))
+
+    t = np.arange(frames)
+    values = np.empty((frames, bodyparts, len(COORDS)), dtype=np.float32)
+    swing_speed = (BODY_SPEED - STANCE_SPEED * (1 - SWING_FRACTION)) / SWING_FRACTION
+    offsets = rng.uniform(-150, 150, size=(bodyparts, 2))
+    for i, limb in enumerate(limbs):
+        if limb is None:
+            x = BODY_SPEED * t
+            y = 3 * np.sin(4 * np.pi * t / STRIDE_FRAMES)
+        else:
+            stride = (t / STRIDE_FRAMES + LIMB_PHASES[limb]) % 1
+            swing = stride < SWING_FRACTION
+            x = np.cumsum(np.where(swing, swing_speed, STANCE_SPEED))
+            y = -20 * np.sin(np.pi * np.minimum(stride / SWING_FRACTION, 1))
+        values[:, i, 0] = x + offsets[i, 0]
+        values[:, i, 1] = y + offsets[i, 1] + 300
+    values[:, :, :2] += rng.normal(0, 0.5, size=(frames, bodyparts, 2))
+    values[:, :, 2] = rng.uniform(0.9, 1.0, size=(frames, bodyparts))
+
+    #dropouts in runs of 1 to 15 frames, 8 on average
+    runs = int(dropout * frames * bodyparts / 8)
+    starts = rng.integers(0, frames, runs)
+    lengths = rng.integers(1, 16, runs)
+    parts = rng.integers(0, bodyparts, runs)
+    frame = np.repeat(starts, lengths) + (np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths))
+    part = np.repeat(parts, lengths)
+    keep = frame < frames
+    frame, part = frame[keep], part[keep]
+    values[frame, part, 2] = rng.uniform(0, 0.3, len(frame))
+    values[frame, part, :2] += rng.normal(0, 30, size=(len(frame), 2))
+    return PoseData(values, names)
+
+def write_dlc_csv(pose: PoseData, path, scorer="DLC_benchmark"):
+    '''
+    Write pose as a single animal DLC CSV (scorer, bodyparts and coords header rows, frame index).
+    '''
+    columns = len(pose.bodyparts) * len(COORDS)
+    with open(path, 'w', newline='') as file:
+        file.write(",".join(["scorer"] + [scorer] * columns) + "\n")
+        file.write(",".join(["bodyparts"] + [name for name in pose.bodyparts for _ in COORDS]) + "\n")
+        file.write(",".join(["coords"] + list(COORDS) * len(pose.bodyparts)) + "\n")
+        table = np.column_stack([np.arange(len(pose)), pose.values.reshape(len(pose), columns)])
+        np.savetxt(file, table, delimiter=",", fmt=["%d"] + ["%.6g"] * columns)
+
+def write_video(path, frames, width, height, fps=30):
+    '''
+    MPEG-4 video of a moving texture, with a keyframe every 12 frames like most camera footage.
+    '''
+    cv2 = framesource.opencv()
+    texture = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise ValueError("Unable to write video file: " + str(path))
+    for i in range(frames):
+        writer.write(np.roll(texture, 4 * i, axis=1))
+    writer.release()
+
+def timings(run, repeat, setup=None, teardown=None):
+    '''
+    Time run over repeat runs; setup() is called before each run (untimed) and its result passed
+    to run and then to teardown.
+    '''
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        run(state)
+        times.append((time.perf_counter() - start) * 1000)
+        if teardown is not None:
+            teardown(state)
+    return {"runs": repeat, "best_ms": min(times), "median_ms": float(np.median(times)), "mean_ms": float(np.mean(times))}
+
+class Trial:
+    '''
+    Synthetic pose file and video of a benchmark run, written to directory.
+    '''
+    def __init__(self, directory, config):
+        self.config = config
+        self.pose = synthetic_pose(config["frames"], config["bodyparts"], config["dropout"], config["seed"])
+        self.landmarks = synthetic_landmarks(config["bodyparts"])
+        self.csv_path = os.path.join(directory, "synthetic.csv")
+        write_dlc_csv(self.pose, self.csv_path)
+        self.video_path = os.path.join(directory, "synthetic.mp4")
+        write_video(self.video_path, config["video_frames"], config["width"], config["height"], config["fps"])
+        framesource.SeekIndex.for_video(self.video_path)
+        self.cleaned = cleaning.clean(self.pose, THRESHOLD, MAX_JUMP).pose
+
+    def parameters(self):
+        '''
+        Per-frame parameters whose landmarks are all mapped.
+        '''
+        return [name for name in gaitcalc.GAIT_PARAMETERS if name not in gaitcalc.STRIDE_PARAMETERS
+                and all(l in self.landmarks for l in gaitcalc.NODES[name].landmarks)]
+
+    def random_frames(self):
+        return np.random.default_rng(self.config["seed"]).integers(0, self.config["video_frames"], RANDOM_FRAMES)
+
+def bench_ingest(trial, repeat):
+    result = timings(lambda _: posefile.read_pose(trial.csv_path), repeat)
+    result["bytes"] = os.path.getsize(trial.csv_path)
+    return result
+
+def bench_masking(trial, repeat):
+    return timings(lambda _: cleaning.clean(trial.pose, THRESHOLD, MAX_JUMP), repeat)
+
+def bench_retention(trial, repeat):
+    thresholds = np.linspace(0, 1, 1000)
+    return timings(lambda _: cleaning.retention(trial.pose, thresholds), repeat)
+
+def bench_smoothing(trial, repeat):
+    #the cleaned data, so the filter also has to work around the gaps left unfilled
+    return timings(lambda _: smoothing.smooth_pose(trial.cleaned, CUTOFF, trial.config["fps"]), repeat)
+
+def bench_kernels(trial, repeat):
+    parameters = trial.parameters()
+    result = timings(lambda engine: engine.parameters(parameters), repeat,
+                     setup=lambda: gaitcalc.GaitEngine(trial.cleaned, trial.landmarks))
+    result["parameters"] = len(parameters)
+    return result
+
+def bench_strides(trial, repeat):
+    engine = gaitcalc.GaitEngine(trial.cleaned, trial.landmarks)
+    result = timings(lambda engine: engine.stride_table(), repeat,
+                     setup=lambda: gaitcalc.GaitEngine(trial.cleaned, trial.landmarks))
+    result["strides"] = len(engine.stride_table())
+    return result
+
+def bench_render(trial, repeat):
+    '''
+    Plot x and y of the first body parts through the level-of-detail traces and draw the figure.
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    def setup():
+        figure = Figure(figsize=(12, 6), dpi=100, constrained_layout=True)
+        FigureCanvasAgg(figure)
+        return figure, [decimate.DecimatedTraces(ax) for ax in figure.subplots(2, 1)]
+
+    def render(state):
+        figure, traces = state
+        for name in trial.cleaned.bodyparts[:RENDER_BODYPARTS]:
+            xy = trial.cleaned.xy(name)
+            traces[0].plot(xy[:, 0], label=name)
+            traces[1].plot(xy[:, 1], label=name)
+        figure.canvas.draw()
+    return timings(render, repeat, setup=setup)
+
+def bench_frames(trial, repeat, indices, cache_bytes, warm=False):
+    def setup():
+        source = framesource.FrameSource(trial.video_path, cache_bytes=cache_bytes)
+        if warm:
+            for index in indices:
+                source.frame(int(index))
+        return source
+
+    def read(source):
+        for index in indices:
+            source.frame(int(index))
+    result = timings(read, repeat, setup=setup, teardown=lambda source: source.close())
+    result["frames"] = len(indices)
+    return result
+
+BENCHMARKS = {
+    "ingest": bench_ingest,
+    "masking": bench_masking,
+    "retention": bench_retention,
+    "smoothing": bench_smoothing,
+    "kernels": bench_kernels,
+    "strides": bench_strides,
+    "render": bench_render,
+    "frames sequential": lambda trial, repeat: bench_frames(trial, repeat, range(trial.config["video_frames"]), 0),
+    "frames random": lambda trial, repeat: bench_frames(trial, repeat, trial.random_frames(), 0),
+    "frames cached": lambda trial, repeat: bench_frames(trial, repeat, trial.random_frames(),
+                                                        framesource.DEFAULT_CACHE_BYTES, warm=True),
+}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def machine():
+    return {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(),
+            "python": platform.python_version(), "numpy": np.__version__}
+
+def run_benchmark(config=None, stages=STAGES, repeat=3, directory=None, log=print):
+    '''
+    Generate the synthetic trial (in directory, or a temporary one) and time the stages. Returns
+    the results as a dict ready for JSON.
+    '''
+    config = dict(DEFAULTS, **(config or {}))
+    unknown = [stage for stage in stages if stage not in BENCHMARKS]
+    if unknown:
+        raise ValueError("Unknown stages: {}. Known stages: {}".format(", ".join(unknown), ", ".join(STAGES)))
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = directory or scratch
+        os.makedirs(directory, exist_ok=True)
+        start = time.perf_counter()
+        trial = Trial(directory, config)
+        log("Generated {} frames x {} body parts and a {} frame video in {:.1f}s".format(
+            config["frames"], config["bodyparts"], config["video_frames"], time.perf_counter() - start))
+
+        results = {}
+        for stage in stages:
+            results[stage] = BENCHMARKS[stage](trial, repeat)
+            log("{:<18} median {:9.2f} ms  best {:9.2f} ms".format(stage, results[stage]["median_ms"], results[stage]["best_ms"]))
+
+    return {"created": datetime.datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+            "machine": machine(), "config": config, "repeat": repeat, "stages": results}
+
+def compare(baseline, current, tolerance=0.2):
+    '''
+    Rows (stage, baseline ms, current ms, ratio, regressed) of the stages timed in both results,
+    by median; a stage regressed if it is more than tolerance slower.
+    '''
+    rows = []
+    for stage, result in current["stages"].items():
+        if stage not in baseline["stages"]:
+            continue
+        old, new = baseline["stages"][stage]["median_ms"], result["median_ms"]
+        ratio = new / old if old > 0 else float("inf")
+        rows.append((stage, old, new, ratio, ratio > 1 + tolerance))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the processing stages on synthetic DLC data and video.")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="JSON file for the results")
+    parser.add_argument("--frames", type=int, default=DEFAULTS["frames"], help="frames of the pose table")
+    parser.add_argument("--bodyparts", type=int, default=DEFAULTS["bodyparts"], help="body parts of the pose table")
+    parser.add_argument("--dropout", type=float, default=DEFAULTS["dropout"], help="fraction of points with a low likelihood")
+    parser.add_argument("--video-frames", type=int, default=DEFAULTS["video_frames"], help="frames of the video")
+    parser.add_argument("--width", type=int, default=DEFAULTS["width"], help="video width")
+    parser.add_argument("--height", type=int, default=DEFAULTS["height"], help="video height")
+    parser.add_argument("--seed", type=int, default=DEFAULTS["seed"], help="seed of the synthetic data")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs of every stage (default: %(default)s)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma separated stages to run (default: all)")
+    parser.add_argument("--data-dir", default=None, help="keep the synthetic files in this directory")
+    parser.add_argument("--compare", default=None, help="results JSON of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown of the median counted as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    config = {"frames": args.frames, "bodyparts": args.bodyparts, "dropout": args.dropout, "seed": args.seed,
+              "video_frames": args.video_frames, "width": args.width, "height": args.height}
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    try:
+        results = run_benchmark(config, stages, args.repeat, args.data_dir)
+    except ValueError as e:
+        parser.error(str(e))
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print("Results written to " + args.output)
+
+    if args.compare is None:
+        return 0
+    with open(args.compare) as file:
+        baseline = json.load(file)
+    if baseline["config"] != results["config"]:
+        print("Warning: the baseline was run with a different configuration", file=sys.stderr)
+    rows = compare(baseline, results, args.tolerance)
+    print("{:<18} {:>12} {:>12} {:>8}".format("stage", "baseline ms", "current ms", "ratio"))
+    for stage, old, new, ratio, regressed in rows:
+        print("{:<18} {:12.2f} {:12.2f} {:8.2f}{}".format(stage, old, new, ratio, "  REGRESSION" if regressed else ""))
+    return 1 if any(row[-1] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
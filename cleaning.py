@@ -0,0 +1,161 @@
+'''
+Cleaning of pose predictions before they are plotted or used for gait parameters. Points are
+masked where their likelihood is below a threshold or where they jump away from both neighbouring
+frames faster than a maximum speed (single-frame outliers), and masked gaps up to a maximum length
+are filled by interpolation between the valid frames around them. Everything is done for all body
+parts at once with array operations; only cubic interpolation fits one spline per body part.
+clean_tail brings the cleaning of a growing file up to date by cleaning only its end again.
+retention gives the share of frames every body part keeps over a range of thresholds, to pick one.
+'''
+import numpy as np
+
+from posedata import PoseData, COORDS, LIKELIHOOD
+
+METHODS = ("linear", "cubic", "none")
+
+#longest gap (in frames) filled by default
+DEFAULT_MAX_GAP = 10
+
+class CleanResult:
+    '''
+    The cleaned pose, with NaN x and y where points were masked and not repaired, and the boolean
+    (frames, bodyparts) arrays of the points that were masked and of those filled in again.
+    '''
+    def __init__(self, pose: PoseData, masked_points: np.ndarray, repaired_points: np.ndarray):
+        self.pose = pose
+        self.masked_points = masked_points
+        self.repaired_points = repaired_points
+
+    #number of frames masked and repaired per body part
+    @property
+    def masked(self):
+        return self.masked_points.sum(axis=0)
+
+    @property
+    def repaired(self):
+        return self.repaired_points.sum(axis=0)
+
+    def masked_frames(self, bodypart):
+        return int(self.masked_points[:, self.pose.bodypart_index[bodypart]].sum())
+
+    def repaired_frames(self, bodypart):
+        return int(self.repaired_points[:, self.pose.bodypart_index[bodypart]].sum())
+
+    def to_dataframe(self):
+        '''
+        The cleaned pose as PoseData.to_dataframe, with a "<bodypart>_repaired" column after the
+        coordinates of every body part that is True where the point was masked and filled in again.
+        '''
+        import pandas as pd
+        bodyparts = self.pose.bodyparts
+        repaired = pd.DataFrame(self.repaired_points, columns=[bodypart + "_repaired" for bodypart in bodyparts])
+        columns = [bodypart + "_" + coord for bodypart in bodyparts for coord in COORDS + ("repaired",)]
+        return pd.concat([self.pose.to_dataframe(), repaired], axis=1)[columns]
+
+def invalid_points(pose: PoseData, threshold=0.0, max_jump=None):
+    '''
+    Boolean (frames, bodyparts) array of the points to mask: missing, below the likelihood
+    threshold, or (with max_jump in pixels/frame) further than max_jump from both the previous and
+    the next frame.
+    '''
+    xy = pose.values[:, :, :LIKELIHOOD]
+    invalid = np.isnan(xy).any(axis=2) | pose.below(threshold)
+    if max_jump is not None and len(pose) > 2:
+        masked = np.where(invalid[:, :, None], np.nan, xy)
+        step = np.hypot(*np.moveaxis(np.diff(masked, axis=0), 2, 0))
+        #NaN steps (next to an already masked point) compare as no jump
+        jump = step > max_jump
+        invalid[1:-1] |= jump[:-1] & jump[1:]
+    return invalid
+
+def retention(pose: PoseData, thresholds):
+    '''
+    Fraction of the frames of every body part whose likelihood is at least each threshold, as a
+    (thresholds, bodyparts) array. The likelihoods are sorted once, every threshold is then a binary
+    search per body part. Missing likelihoods count as not retained.
+    '''
+    thresholds = np.asarray(thresholds, dtype=pose.values.dtype)
+    #NaN sorts last, so the first valid[b] values of column b are its likelihoods
+    ordered = np.sort(pose.likelihoods, axis=0)
+    valid = (~np.isnan(ordered)).sum(axis=0)
+    curve = np.empty((len(thresholds), len(pose.bodyparts)))
+    for bodypart, count in enumerate(valid):
+        curve[:, bodypart] = count - np.searchsorted(ordered[:count, bodypart], thresholds, side='left')
+    return curve / max(len(pose), 1)
+
+def gap_bounds(invalid):
+    '''
+    For every frame and column, the nearest valid frame before (-1 if none) and after (frames if none).
+    '''
+    frames = len(invalid)
+    index = np.arange(frames)[:, None]
+    before = np.maximum.accumulate(np.where(invalid, -1, index), axis=0)
+    after = np.minimum.accumulate(np.where(invalid, frames, index)[::-1], axis=0)[::-1]
+    return before, after
+
+def fill_gaps(xy, invalid, max_gap=DEFAULT_MAX_GAP, method="linear"):
+    '''
+    Copy of xy (frames, bodyparts, 2) with masked points NaN, except those in gaps of at most
+    max_gap frames with valid frames on both sides, which are interpolated. Returns the filled
+    array and the boolean (frames, bodyparts) array of the repaired points.
+    '''
+    if method not in METHODS:
+        raise ValueError("Unknown interpolation method '{}', expected one of {}".format(method, ", ".join(METHODS)))
+    frames = len(xy)
+    filled = np.where(invalid[:, :, None], np.nan, xy)
+    before, after = gap_bounds(invalid)
+    repaired = invalid & (before >= 0) & (after < frames) & (after - before - 1 <= max_gap)
+    if method == "none" or not repaired.any():
+        return filled, np.zeros_like(invalid)
+
+    if method == "linear":
+        index = np.arange(frames)[:, None]
+        start = np.take_along_axis(filled, np.clip(before, 0, frames - 1)[:, :, None], axis=0)
+        end = np.take_along_axis(filled, np.clip(after, 0, frames - 1)[:, :, None], axis=0)
+        weight = ((index - before) / np.maximum(after - before, 1))[:, :, None]
+        filled = np.where(repaired[:, :, None], start + (end - start) * weight, filled)
+    else:
+        #SciPy is only loaded when cubic filling is asked for
+        from scipy.interpolate import CubicSpline
+        for bodypart in np.flatnonzero(repaired.any(axis=0)):
+            valid = np.flatnonzero(~invalid[:, bodypart])
+            spline = CubicSpline(valid, xy[valid, bodypart], axis=0)
+            targets = np.flatnonzero(repaired[:, bodypart])
+            filled[targets, bodypart] = spline(targets)
+    return filled.astype(xy.dtype, copy=False), repaired
+
+def clean(pose: PoseData, threshold=0.0, max_jump=None, max_gap=DEFAULT_MAX_GAP, method="linear") -> CleanResult:
+    '''
+    Mask and repair the points of pose. Likelihoods are kept as they are. If nothing needs to be
+    masked the result holds pose itself, not a copy.
+    '''
+    invalid = invalid_points(pose, threshold, max_jump)
+    if not invalid.any():
+        return CleanResult(pose, invalid, np.zeros_like(invalid))
+
+    filled, repaired = fill_gaps(pose.values[:, :, :LIKELIHOOD], invalid, max_gap, method)
+    values = pose.values.copy()
+    values[:, :, :LIKELIHOOD] = filled
+    return CleanResult(PoseData(values, pose.bodyparts), invalid, repaired)
+
+def clean_tail(pose: PoseData, start, threshold=0.0, max_jump=None, max_gap=DEFAULT_MAX_GAP, method="linear"):
+    '''
+    Clean a pose whose first start rows were already cleaned with the same settings, after more
+    rows were appended to it. Returns first, the first row whose cleaning may have changed, and
+    the CleanResult of the rows from first on, equal to those rows of clean(pose, ...). Only a
+    window of about twice max_gap rows before start is cleaned again, except with cubic filling,
+    which fits every gap to the whole body part and so cleans the whole pose again.
+    '''
+    if method == "cubic" or start <= 0:
+        return 0, clean(pose, threshold, max_jump, max_gap, method)
+
+    #the new rows can mask row start - 1 as a jump and close a gap at the end, which changes the
+    #rows of a gap of at most max_gap frames ending there; a longer one is not filled either way
+    first = max(start - 1 - max_gap, 0)
+    #a gap reaching first whose valid frame before is outside the window is longer than max_gap,
+    #and one more row gives the jump test of the window's first row its previous frame
+    context = max(first - max_gap - 1, 0)
+    result = clean(PoseData(pose.values[context:], pose.bodyparts), threshold, max_jump, max_gap, method)
+    offset = first - context
+    return first, CleanResult(PoseData(result.pose.values[offset:], pose.bodyparts),
+                              result.masked_points[offset:], result.repaired_points[offset:])
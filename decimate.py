@@ -0,0 +1,107 @@
+'''
+Level-of-detail rendering for long pose traces. Instead of handing matplotlib every frame, the
+visible range of a trace is cut into one bin per pixel column of the axes and each bin is reduced
+to its minimum and maximum (in the order they occur), so spikes survive at every zoom level.
+Frames with no data (NaN, e.g. below the likelihood threshold) are kept as gaps in the line so
+dropouts stay visible too. Once zoomed in far enough the full resolution points are drawn.
+'''
+import numpy as np
+
+def minmax_envelope(y, start=0, stop=None, n_bins=1000):
+    '''
+    Decimate y[start:stop] to the min/max envelope of n_bins bins. Returns the x (frame numbers)
+    and y values to plot, and whether they are the full resolution data.
+    '''
+    y = np.asarray(y)[start:stop]
+    n = len(y)
+    if n <= 2 * n_bins:
+        return np.arange(start, start + n), y, True
+
+    bin_size = -(-n // n_bins)
+    n_bins = -(-n // bin_size)
+    bins = np.full(n_bins * bin_size, np.nan)
+    bins[:n] = y
+    bins = bins.reshape(n_bins, bin_size)
+
+    missing = np.isnan(bins)
+    empty = missing.all(axis=1)
+    #NaN padding of the last bin is not a dropout
+    dropouts = missing.copy()
+    dropouts.reshape(-1)[n:] = False
+    has_dropout = dropouts.any(axis=1)
+
+    #per bin: where the minimum, the maximum and the first dropout are
+    index = np.stack([np.where(missing, np.inf, bins).argmin(axis=1),
+                      np.where(missing, -np.inf, bins).argmax(axis=1),
+                      dropouts.argmax(axis=1)], axis=1)
+    keep = np.stack([~empty, ~empty, has_dropout], axis=1)
+
+    #put the kept points of every bin in frame order
+    order = np.argsort(np.where(keep, index, bin_size), axis=1, kind='stable')
+    index = np.take_along_axis(index, order, axis=1)
+    keep = np.take_along_axis(keep, order, axis=1)
+
+    rows = np.arange(n_bins)[:, None]
+    values = bins[rows, index]
+    frames = start + rows * bin_size + index
+    return frames[keep], values[keep], False
+
+class DecimatedTraces:
+    '''
+    Lines of one axes drawn through minmax_envelope. The full data of every line is kept and the
+    visible range is decimated again whenever the x limits of the axes or the canvas size change.
+    '''
+    def __init__(self, ax):
+        self.ax = ax
+        self.data = {}
+        ax.callbacks.connect('xlim_changed', self.refresh)
+        ax.figure.canvas.mpl_connect('resize_event', self.refresh)
+
+    def reset(self):
+        '''
+        Forget all lines, needed after the axes have been cleared (which also drops its callbacks).
+        '''
+        self.data.clear()
+        self.ax.callbacks.connect('xlim_changed', self.refresh)
+
+    def plot(self, y, **kwargs):
+        #plotted with its data (not set afterwards) so the axes autoscale to it
+        frames, values, full_resolution = self.decimate(y)
+        line, = self.ax.plot(frames, values, marker='.' if full_resolution else 'None', **kwargs)
+        self.data[line] = y
+        return line
+
+    def set_data(self, line, y):
+        '''
+        Replace the full data of a line, e.g. after more frames were appended to it.
+        '''
+        self.data[line] = y
+        self.update_line(line)
+
+    def remove(self, line):
+        del self.data[line]
+        line.remove()
+
+    def clear(self):
+        for line in list(self.data):
+            self.remove(line)
+
+    def refresh(self, _event=None):
+        for line in self.data:
+            self.update_line(line)
+
+    def visible_range(self, length):
+        if self.ax.get_autoscalex_on():
+            return 0, length
+        xmin, xmax = self.ax.get_xlim()
+        #one point either side so the line runs to the edges of the axes
+        return max(int(np.floor(xmin)) - 1, 0), min(int(np.ceil(xmax)) + 2, length)
+
+    def decimate(self, y):
+        start, stop = self.visible_range(len(y))
+        return minmax_envelope(y, start, stop, max(int(self.ax.bbox.width), 1))
+
+    def update_line(self, line):
+        frames, values, full_resolution = self.decimate(self.data[line])
+        line.set_data(frames, values)
+        line.set_marker('.' if full_resolution else 'None')
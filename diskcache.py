@@ -0,0 +1,70 @@
+'''
+Helpers shared by the on-disk caches: where cache entries live and how the total size of a cache
+directory is kept under its quota. Every entry is a subdirectory of the cache directory; the
+modification time of the entry is its last use, and the least recently used entries are deleted first.
+'''
+import os
+import shutil
+import hashlib
+
+#set to override the location of all on-disk caches
+CACHE_DIR_VARIABLE = "DLC_DISPLAY_CACHE"
+
+def cache_dir(name):
+    '''
+    Directory of the named cache, created if it does not exist yet.
+    '''
+    root = os.environ.get(CACHE_DIR_VARIABLE)
+    if not root:
+        if os.name == 'nt':
+            root = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 'DeepLabCut-Display', 'cache')
+        else:
+            root = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'DeepLabCut-Display')
+    directory = os.path.join(root, name)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def file_key(path, *extra):
+    '''
+    Cache key of a file: changes whenever the file is moved, rewritten or resized.
+    '''
+    stat = os.stat(path)
+    parts = [os.path.abspath(path), str(stat.st_size), str(stat.st_mtime_ns)] + [str(e) for e in extra]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+def touch(entry):
+    '''
+    Mark a cache entry as just used.
+    '''
+    os.utime(entry)
+
+def entry_size(entry):
+    size = 0
+    for dirpath, _, filenames in os.walk(entry):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return size
+
+def enforce_quota(directory, max_bytes, keep=()):
+    '''
+    Delete the least recently used entries of a cache directory until it holds at most max_bytes.
+    Entries named in keep are never deleted. Returns the number of bytes left in the directory.
+    '''
+    entries = []
+    for name in os.listdir(directory):
+        entry = os.path.join(directory, name)
+        if os.path.isdir(entry):
+            entries.append((os.path.getmtime(entry), entry_size(entry), entry))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.basename(entry) in keep:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+    return total
@@ -0,0 +1,20 @@
+'''
+OpenCV for the frame modules. cv2 is imported by opencv() the first time a frame is decoded or
+resized, not with the modules, so the player window opens without loading it. framesource and
+framestore both use it; it imports neither of them.
+'''
+_cv2 = None
+
+def opencv():
+    '''
+    The cv2 module, imported the first time anything is decoded or resized.
+    '''
+    global _cv2
+    if _cv2 is None:
+        import cv2
+        _cv2 = cv2
+    return _cv2
+
+def resize(frame, width, height):
+    cv2 = opencv()
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,581 @@
+'''
+On-demand frame access for the video player. Frames are decoded from the video file only when
+they are requested and are kept in a least-recently-used cache that is bounded by a memory budget,
+so opening a video costs the same no matter how long it is. A background read-ahead thread keeps
+the frames around the current position decoded while the user scrubs, and a keyframe index saved
+next to the video makes seeks to arbitrary frames frame-accurate. While scrubbing, a downscaled
+proxy of the video can be shown instead of decoding full resolution frames. Given a disk quota,
+the proxy (and optionally the full resolution frames) are kept in a persistent FrameStore so that
+reopening a video does not decode it again. OpenCV is imported by framecv.opencv() on first use,
+not with the module, so the player window opens without loading it.
+'''
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import framestore
+import perflog
+import profiling
+from framecv import opencv, resize
+
+#default memory budget for decoded frames (1 GiB holds ~40 frames of 4K BGR video)
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+
+#number of frames decoded ahead of the current position in the direction of scrubbing
+DEFAULT_PREFETCH_WINDOW = 30
+
+FORWARD = 1
+BACKWARD = -1
+
+#largest width of the scrubbing proxy, whatever the size of the display
+PROXY_MAX_WIDTH = 640
+
+#appended to the video file name to name its seek index sidecar
+SEEK_INDEX_SUFFIX = ".seekindex.npz"
+
+class SeekIndex:
+    '''
+    Keyframe positions and per-frame timestamps of a video, built once by walking the compressed
+    packets (nothing is decoded) and saved to a sidecar file next to the video for later opens.
+    '''
+    def __init__(self, keyframes: np.ndarray, timestamps: np.ndarray):
+        self.keyframes = keyframes
+        self.timestamps = timestamps
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def keyframe_before(self, index):
+        '''
+        Frame number of the last keyframe at or before frame number index.
+        '''
+        position = np.searchsorted(self.keyframes, index, side='right') - 1
+        return int(self.keyframes[max(position, 0)])
+
+    def frame_at(self, msec):
+        '''
+        Frame number of the frame presented at msec milliseconds.
+        '''
+        position = np.searchsorted(self.timestamps, msec + 0.5, side='right') - 1
+        return int(min(max(position, 0), len(self.timestamps) - 1))
+
+    @staticmethod
+    def sidecar_path(video_path):
+        return str(video_path) + SEEK_INDEX_SUFFIX
+
+    @classmethod
+    def build(cls, video_path):
+        cv2 = opencv()
+        capture = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+        #with the raw stream format grab() only demuxes the next packet instead of decoding it
+        if not capture.isOpened() or not capture.set(cv2.CAP_PROP_FORMAT, -1):
+            capture.release()
+            raise ValueError("Unable to index video file: " + str(video_path))
+
+        keyframes = []
+        timestamps = []
+        while capture.grab():
+            if capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(len(timestamps))
+            timestamps.append(capture.get(cv2.CAP_PROP_POS_MSEC))
+        capture.release()
+
+        if not timestamps:
+            raise ValueError("Unable to index video file: " + str(video_path))
+        if not keyframes or keyframes[0] != 0:
+            keyframes.insert(0, 0)
+        return cls(np.array(keyframes, dtype=np.int64), np.array(timestamps, dtype=np.float64))
+
+    def save(self, video_path):
+        stat = os.stat(video_path)
+        np.savez(self.sidecar_path(video_path), keyframes=self.keyframes, timestamps=self.timestamps,
+                 video_size=stat.st_size, video_mtime=stat.st_mtime)
+
+    @classmethod
+    def load(cls, video_path):
+        '''
+        Read the sidecar of video_path, returning None if there is none or it is out of date.
+        '''
+        try:
+            stat = os.stat(video_path)
+            with np.load(cls.sidecar_path(video_path)) as sidecar:
+                if sidecar['video_size'] != stat.st_size or sidecar['video_mtime'] != stat.st_mtime:
+                    return None
+                return cls(sidecar['keyframes'], sidecar['timestamps'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    @classmethod
+    def for_video(cls, video_path):
+        '''
+        Load the sidecar of video_path, building and saving it first if needed.
+        '''
+        index = cls.load(video_path)
+        if index is None:
+            index = cls.build(video_path)
+            try:
+                index.save(video_path)
+            except OSError:
+                #read-only video folder, the index is still used for this session
+                pass
+        return index
+
+class FrameCache:
+    '''
+    Least-recently-used store of decoded frames keyed by frame number. The total size of the
+    stored arrays never exceeds max_bytes (a single frame larger than the budget is not stored).
+    Safe to share between the GUI thread and the read-ahead thread.
+    '''
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, index):
+        return index in self._frames
+
+    def get(self, index):
+        with self._lock:
+            frame = self._frames.get(index)
+            if frame is not None:
+                self._frames.move_to_end(index)
+            return frame
+
+    def put(self, index, frame: np.ndarray):
+        if frame.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._frames.pop(index, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._frames[index] = frame
+            self.nbytes += frame.nbytes
+
+            #evict the least recently used frames until we are back under budget
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._frames.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = 0
+
+class ProxyStream:
+    '''
+    Downscaled copy of every frame of a video used for interactive scrubbing. Frames are kept in
+    a memory-mapped temporary file (so a long video does not have to fit in RAM) and are filled
+    in as the video is decoded.
+    '''
+    def __init__(self, frame_count, width, height):
+        self.width = width
+        self.height = height
+        self._file = tempfile.TemporaryFile()
+        self.frames = np.memmap(self._file, dtype=np.uint8, mode='w+', shape=(frame_count, height, width, 3))
+        self.filled = np.zeros(frame_count, dtype=bool)
+
+    def __len__(self):
+        return len(self.filled)
+
+    @staticmethod
+    def fit(width, height, bound_width, bound_height):
+        '''
+        Size of a proxy frame that fits inside the bounding size while keeping the aspect ratio.
+        '''
+        scale = min(bound_width / width, bound_height / height, PROXY_MAX_WIDTH / width, 1)
+        return max(int(width * scale), 1), max(int(height * scale), 1)
+
+    def get(self, index):
+        if index < len(self.filled) and self.filled[index]:
+            return self.frames[index]
+        return None
+
+    def filled_bytes(self):
+        return int(self.filled.sum()) * self.width * self.height * 3
+
+    def put(self, index, frame: np.ndarray):
+        if index < len(self.filled) and not self.filled[index]:
+            self.frames[index] = resize(frame, self.width, self.height)
+            self.filled[index] = True
+
+    def close(self):
+        del self.frames
+        self._file.close()
+
+class FrameSource:
+    '''
+    Random access to the frames of a video file. Only the container header is read when the
+    source is opened; frames are decoded (and cached) by frame() as they are needed.
+    Frames are returned as BGR uint8 arrays of shape (height, width, 3), as decoded by OpenCV.
+
+    hits and misses count the frame() requests that were and were not already in the cache,
+    which is the figure to watch when tuning the read-ahead window. proxy_hits counts the requests
+    answered from the scrubbing proxy by scrub_frame().
+
+    Seeking goes through a SeekIndex when one is available: the capture is positioned on the
+    nearest preceding keyframe and decodes forward to the requested frame, checking where it
+    actually landed against the indexed timestamps. Without an index OpenCV's own frame seek is used.
+
+    disk_quota enables the persistent frame store for the proxy, with store_full_resolution the
+    decoded full resolution frames are stored as well.
+    '''
+    def __init__(self, path, cache_bytes=DEFAULT_CACHE_BYTES, disk_quota=None, store_full_resolution=False):
+        cv2 = opencv()
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError("Unable to open video file: " + str(path))
+
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        self.seek_index = SeekIndex.load(path)
+        if self.seek_index is not None:
+            self.frame_count = len(self.seek_index)
+        elif self.frame_count <= 0:
+            #some streams do not report a length, fall back to counting them once
+            self.frame_count = self._count_frames()
+
+        self.cache = FrameCache(cache_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.proxy_hits = 0
+        self.prefetcher = None
+        self.proxy = None
+        self._proxy_thread = None
+        self._proxy_bounds = None
+        self._proxy_stopped = False
+        self._closing = False
+
+        #called from the indexing thread with the frame count of the seek index when it differs from
+        #the count reported by the video header, to hand it to set_frame_count on the GUI thread;
+        #if None the count is changed right away
+        self.frame_count_changed = None
+
+        self.disk_quota = disk_quota
+        self.full_store = None
+        if disk_quota is not None and store_full_resolution:
+            self.full_store = framestore.FrameStore.open(path, self.frame_count, self.width, self.height, disk_quota)
+
+        #the capture is shared with the read-ahead thread, only one thread may decode at a time
+        self._decode_lock = threading.Lock()
+
+        #frame number the capture will decode on its next read(), lets sequential access skip seeking
+        self._next_index = 0
+
+        #set after a seek through the index, the next grab() reports where the seek landed
+        self._verify_seek = False
+
+    def __len__(self):
+        return self.frame_count
+
+    @property
+    def aspect_ratio(self):
+        return self.width / self.height
+
+    def frame(self, index: int) -> np.ndarray:
+        '''
+        Return frame number index, decoding it if it is not already cached.
+        '''
+        if index < 0 or index >= self.frame_count:
+            raise IndexError("Frame {} is out of range for a video of {} frames".format(index, self.frame_count))
+
+        frame = self.cache.get(index)
+        if frame is not None:
+            self.hits += 1
+            return frame
+
+        self.misses += 1
+        with self._decode_lock:
+            #the read-ahead thread may have decoded it while we waited for the lock
+            frame = self.cache.get(index)
+            if frame is None:
+                frame = self._load(index)
+                self.cache.put(index, frame)
+        return frame
+
+    def scrub_frame(self, index: int):
+        '''
+        Return frame number index for display while scrubbing: the full resolution frame if it is
+        already cached, otherwise its proxy, decoding the full frame only if neither is available.
+        The second value is True when the returned frame is full resolution.
+        '''
+        frame = self.cache.get(index)
+        if frame is not None:
+            self.hits += 1
+            return frame, True
+        if self.proxy is not None:
+            frame = self.proxy.get(index)
+            if frame is not None:
+                self.proxy_hits += 1
+                return frame, False
+        return self.frame(index), True
+
+    def start_proxy(self, bound_width, bound_height):
+        '''
+        Create the scrubbing proxy sized to fit the display (bound_width x bound_height) and fill it on
+        a background thread. Only with a disk quota (the opt-in frame store) is the proxy instead
+        stored at up to PROXY_MAX_WIDTH, whatever the display, so one stored proxy serves every
+        window size when the video is opened again.
+        '''
+        if self.proxy is None:
+            self._proxy_bounds = (bound_width, bound_height)
+            self._proxy_stopped = False
+            if self.disk_quota is not None:
+                #a stored proxy is kept at its largest size so it is reused whatever the window size,
+                #it is written once and read back on later opens instead of decoding again
+                width, height = ProxyStream.fit(self.width, self.height, PROXY_MAX_WIDTH, PROXY_MAX_WIDTH)
+                self.proxy = framestore.FrameStore.open(self.path, self.frame_count, width, height, self.disk_quota)
+            if self.proxy is None:
+                width, height = ProxyStream.fit(self.width, self.height, bound_width, bound_height)
+                self.proxy = ProxyStream(self.frame_count, width, height)
+            self._proxy_thread = threading.Thread(target=self._build_proxy, daemon=True)
+            self._proxy_thread.start()
+
+    def _build_proxy(self):
+        #a capture of our own, so building the proxy never moves the one used for display
+        missing = np.flatnonzero(~self.proxy.filled[:])
+        if len(missing) == 0:
+            return
+
+        #frames already stored are only grabbed, not converted, and we stop after the last missing one
+        capture = opencv().VideoCapture(self.path)
+        index = 0
+        while not self._closing and not self._proxy_stopped and index <= missing[-1]:
+            with profiling.worker():
+                if not capture.grab():
+                    break
+                if not self.proxy.filled[index]:
+                    success, image = capture.retrieve()
+                    if success:
+                        self.proxy.put(index, image)
+            index += 1
+        capture.release()
+
+    def prefetch(self, index: int):
+        '''
+        Decode frame number index into the cache without counting it as a request.
+        '''
+        with self._decode_lock:
+            if index in self.cache:
+                return
+            self.cache.put(index, self._load(index))
+
+    def start_prefetch(self, window=DEFAULT_PREFETCH_WINDOW):
+        '''
+        Start the background thread that decodes frames ahead of the positions passed to read_ahead().
+        '''
+        if self.prefetcher is None:
+            self.prefetcher = Prefetcher(self, window)
+            self.prefetcher.start()
+
+    def read_ahead(self, position: int, direction=FORWARD):
+        if self.prefetcher is not None:
+            self.prefetcher.request(position, direction)
+
+    def start_indexing(self):
+        '''
+        Build the seek index (and its sidecar) on a background thread if it was not loaded from disk.
+        '''
+        if self.seek_index is None:
+            threading.Thread(target=self._build_seek_index, daemon=True).start()
+
+    def _build_seek_index(self):
+        try:
+            with profiling.worker():
+                seek_index = SeekIndex.for_video(self.path)
+        except ValueError:
+            return
+        with self._decode_lock:
+            self.seek_index = seek_index
+        if len(seek_index) != self.frame_count:
+            if self.frame_count_changed is not None:
+                self.frame_count_changed(len(seek_index))
+            else:
+                self.set_frame_count(len(seek_index))
+
+    def set_frame_count(self, frame_count):
+        '''
+        Change the number of frames, e.g. to the count of the seek index when the video header
+        reported a different one. The proxy and frame store sized for the old count are replaced,
+        and the proxy is rebuilt for the new count.
+        '''
+        if frame_count == self.frame_count:
+            return
+        bounds = self._proxy_bounds if self.proxy is not None else None
+        self._proxy_stopped = True
+        if self._proxy_thread is not None:
+            self._proxy_thread.join()
+            self._proxy_thread = None
+        with self._decode_lock:
+            self.frame_count = frame_count
+            if self.proxy is not None:
+                self.proxy.close()
+                self.proxy = None
+            if self.full_store is not None:
+                self.full_store.close()
+                self.full_store = framestore.FrameStore.open(self.path, frame_count, self.width, self.height, self.disk_quota)
+        if bounds is not None:
+            self.start_proxy(*bounds)
+
+    def hit_rate(self):
+        requests = self.hits + self.proxy_hits + self.misses
+        return (self.hits + self.proxy_hits) / requests if requests else 0.0
+
+    def memory_usage(self):
+        '''
+        Bytes of decoded frames held in memory by the cache, and in the memory-mapped proxy and
+        full resolution store (paged in from disk as they are used).
+        '''
+        return {"frame cache": self.cache.nbytes,
+                "proxy": self.proxy.filled_bytes() if self.proxy is not None else 0,
+                "frame store": self.full_store.filled_bytes() if self.full_store is not None else 0}
+
+    def close(self):
+        self._closing = True
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+            self.prefetcher = None
+        if self._proxy_thread is not None:
+            self._proxy_thread.join()
+            self._proxy_thread = None
+        with self._decode_lock:
+            self.cache.clear()
+            self.capture.release()
+            if self.proxy is not None:
+                self.proxy.close()
+                self.proxy = None
+            if self.full_store is not None:
+                self.full_store.close()
+                self.full_store = None
+
+    def _load(self, index):
+        if self.full_store is not None:
+            frame = self.full_store.get(index)
+            if frame is not None:
+                return frame
+        with perflog.timed("decode", index):
+            frame = self._decode(index)
+        if self.full_store is not None:
+            self.full_store.put(index, frame)
+        return frame
+
+    def _decode(self, index):
+        if index != self._next_index:
+            self._seek(index)
+
+        #grab (without converting) up to the requested frame, then convert only that one
+        success = True
+        while success and self._next_index <= index:
+            success = self.capture.grab()
+            if success and self._verify_seek:
+                self._verify_seek = False
+                landed = self.seek_index.frame_at(self.capture.get(opencv().CAP_PROP_POS_MSEC))
+                if landed > index:
+                    #overshot the requested frame, let OpenCV do the seek instead
+                    self.capture.set(opencv().CAP_PROP_POS_FRAMES, index)
+                    self._next_index = index
+                    continue
+                self._next_index = landed
+            self._next_index += 1
+
+        if success:
+            success, image = self.capture.retrieve()
+        if not success:
+            #position of the capture is unknown after a failed read
+            self._next_index = -1
+            raise IndexError("Unable to decode frame {} of {}".format(index, self.path))
+
+        if self.proxy is not None:
+            self.proxy.put(index, image)
+        return image
+
+    def _seek(self, index):
+        cv2 = opencv()
+        if self.seek_index is None:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self._next_index = index
+            return
+
+        keyframe = self.seek_index.keyframe_before(index)
+        if keyframe <= self._next_index <= index:
+            #already inside the run of frames that has to be decoded anyway
+            return
+        self.capture.set(cv2.CAP_PROP_POS_MSEC, self.seek_index.timestamps[keyframe])
+        self._next_index = keyframe
+        self._verify_seek = True
+
+    def _count_frames(self):
+        count = 0
+        while self.capture.grab():
+            count += 1
+        self.capture.set(opencv().CAP_PROP_POS_FRAMES, 0)
+        return count
+
+class Prefetcher(threading.Thread):
+    '''
+    Worker thread that decodes a window of frames next to the most recently requested position.
+    A newer request interrupts the window being decoded, so fast scrubbing only ever decodes
+    around where the user currently is.
+    '''
+    def __init__(self, source: FrameSource, window=DEFAULT_PREFETCH_WINDOW):
+        super().__init__(daemon=True)
+        self.source = source
+        self.window = window
+        self._request = None
+        self._stopped = False
+        self._condition = threading.Condition()
+
+    def request(self, position, direction=FORWARD):
+        with self._condition:
+            self._request = (position, direction)
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self.join()
+
+    def frames_to_prefetch(self, position, direction):
+        '''
+        Frame numbers to decode for a request, in decoding order. The window is limited to half
+        of what fits in the cache so prefetching never evicts the frames it just decoded.
+        '''
+        window = self.window
+        frame = self.source.cache.get(position)
+        if frame is not None:
+            window = min(window, max(self.source.cache.max_bytes // frame.nbytes // 2, 1))
+
+        if direction == BACKWARD:
+            #decode the preceding frames in ascending order, a single seek then sequential reads
+            return range(max(position - window, 0), position)
+        return range(position + 1, min(position + 1 + window, len(self.source)))
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._request is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                position, direction = self._request
+                self._request = None
+
+            for index in self.frames_to_prefetch(position, direction):
+                if self._request is not None or self._stopped:
+                    break
+                try:
+                    with profiling.worker():
+                        self.source.prefetch(index)
+                except IndexError:
+                    break
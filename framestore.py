@@ -0,0 +1,119 @@
+'''
+Persistent on-disk store of decoded video frames. Frames of one video at one resolution are written
+to a raw file with a fixed stride per frame which is memory-mapped, so loading a stored frame is a
+slice of the mapping instead of a decode. Stores are kept in the "frames" cache directory, keyed by
+the video's path, size and modification time, and the least recently used stores are deleted once
+the cache grows past its disk quota. The store is opt-in: it is only used when the
+DLC_DISPLAY_FRAME_STORE_GB environment variable gives its quota in gigabytes.
+'''
+import os
+import shutil
+
+import numpy as np
+
+import diskcache
+import framecv
+
+CACHE_NAME = "frames"
+
+#default total disk space used by stored frames of all videos
+DEFAULT_QUOTA_BYTES = 20 * 1024 * 1024 * 1024
+
+#set to a number of gigabytes to keep decoded frames on disk within that quota
+QUOTA_VARIABLE = "DLC_DISPLAY_FRAME_STORE_GB"
+
+def configured_quota():
+    '''
+    Disk quota in bytes set by QUOTA_VARIABLE, or None (no frames stored) when it is unset, 0 or not a number.
+    '''
+    try:
+        gigabytes = float(os.environ.get(QUOTA_VARIABLE, "0"))
+    except ValueError:
+        return None
+    return int(gigabytes * 1024 ** 3) if gigabytes > 0 else None
+
+class FrameStore:
+    '''
+    Memory-mapped frames of a video at a fixed resolution. filled records which frames have been
+    written, so a store can be filled in over several sessions.
+    '''
+    def __init__(self, entry, frame_count, width, height):
+        self.entry = entry
+        self.width = width
+        self.height = height
+
+        frames_path = os.path.join(entry, "frames.raw")
+        filled_path = os.path.join(entry, "filled.npy")
+        shape = (frame_count, height, width, 3)
+        if os.path.exists(frames_path) and os.path.exists(filled_path):
+            self.filled = np.lib.format.open_memmap(filled_path, mode='r+')
+            if self.filled.shape != (frame_count,):
+                raise ValueError("Stored frames do not match the video")
+            self.frames = np.memmap(frames_path, dtype=np.uint8, mode='r+', shape=shape)
+        else:
+            self.frames = np.memmap(frames_path, dtype=np.uint8, mode='w+', shape=shape)
+            self.filled = np.lib.format.open_memmap(filled_path, mode='w+', dtype=bool, shape=(frame_count,))
+
+    def __len__(self):
+        return len(self.filled)
+
+    def filled_bytes(self):
+        return int(self.filled.sum()) * self.width * self.height * 3
+
+    @staticmethod
+    def store_bytes(frame_count, width, height):
+        return frame_count * (width * height * 3 + 1)
+
+    @classmethod
+    def open(cls, video_path, frame_count, width, height, quota=DEFAULT_QUOTA_BYTES):
+        '''
+        Open (or create) the store of video_path at the given resolution. Returns None if the store
+        would not fit in the quota or cannot be created.
+        '''
+        nbytes = cls.store_bytes(frame_count, width, height)
+        if nbytes > quota:
+            return None
+
+        try:
+            directory = diskcache.cache_dir(CACHE_NAME)
+            key = diskcache.file_key(video_path, width, height)
+            entry = os.path.join(directory, key)
+            if os.path.isdir(entry):
+                diskcache.enforce_quota(directory, quota, keep=(key,))
+            else:
+                #make room before the new store is allocated
+                diskcache.enforce_quota(directory, quota - nbytes)
+                os.makedirs(entry)
+            diskcache.touch(entry)
+        except OSError:
+            return None
+
+        try:
+            return cls(entry, frame_count, width, height)
+        except (OSError, ValueError):
+            #stale or damaged store, start it over
+            shutil.rmtree(entry, ignore_errors=True)
+            try:
+                os.makedirs(entry)
+                return cls(entry, frame_count, width, height)
+            except (OSError, ValueError):
+                return None
+
+    def get(self, index):
+        if index < len(self.filled) and self.filled[index]:
+            return self.frames[index]
+        return None
+
+    def put(self, index, frame: np.ndarray):
+        if index < len(self.filled) and not self.filled[index]:
+            if frame.shape[:2] != (self.height, self.width):
+                frame = framecv.resize(frame, self.width, self.height)
+            self.frames[index] = frame
+            self.filled[index] = True
+
+    def close(self):
+        #frames are flushed before the flags that say they were written
+        self.frames.flush()
+        self.filled.flush()
+        del self.frames
+        del self.filled
@@ -0,0 +1,274 @@
+'''
+Gait parameter calculations without any user interface, shared by the parameter dialog and the
+batch command line tool.
+
+Every parameter is declared once in a registry together with the intermediate products it is
+computed from (landmark positions, velocities, the detected strides, ...), and those again declare
+theirs, which makes a dependency graph. A GaitEngine resolves a set of requested parameters to the
+nodes of that graph they need, computes each node once and keeps it for as long as the engine
+lives, and runs nodes that do not depend on each other on a thread pool. A new parameter is one
+more declaration at the bottom of this file.
+'''
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import pandas as pd
+
+import kinematics
+import perflog
+import profiling
+import stridedetect
+from posedata import PoseData
+
+LANDMARKS = ["Nostril", "Poll", "Withers", "Shoulder", "Elbow", "Mid Back", "Croup", "Hip",
+             "Stifle", "Dock", "Left Front Hoof", "Left Hind Hoof", "Left Hock", "Left Front Fetlock",
+             "Left Hind Fetlock", "Left Knee", "Right Front Hoof", "Right Hind Hoof", "Right Hock",
+             "Right Front Fetlock", "Right Hind Fetlock", "Right Knee"]
+
+class Node:
+    '''
+    One product of the dependency graph. function is called with the engine and the values of the
+    input nodes, in order. landmarks are all landmarks the value depends on, directly or through
+    its inputs, so the same node computed for another landmark mapping is kept apart. inputs can
+    also be a function of the engine returning the input names, for nodes whose inputs depend on
+    the landmark mapping; landmarks must then name every landmark those inputs may depend on.
+    '''
+    def __init__(self, name, function, inputs=(), landmarks=(), per_stride=False):
+        self.name = name
+        self.function = function
+        self.per_stride = per_stride
+        landmarks = list(landmarks)
+        if callable(inputs):
+            self.inputs = inputs
+        else:
+            self.inputs = tuple(inputs)
+            for node in self.inputs:
+                landmarks += [l for l in NODES[node].landmarks if l not in landmarks]
+        self.landmarks = tuple(landmarks)
+
+#every node by name, and the names of the nodes that are gait parameters in the order they are offered
+NODES = {}
+PARAMETERS = []
+
+def intermediate(name, function, inputs=(), landmarks=()):
+    '''
+    Declare an intermediate product (once, later declarations of the same name are ignored) and
+    return its name.
+    '''
+    if name not in NODES:
+        NODES[name] = Node(name, function, inputs, landmarks)
+    return name
+
+def parameter(name, function, inputs=(), per_stride=False, landmarks=()):
+    NODES[name] = Node(name, function, inputs, landmarks, per_stride=per_stride)
+    PARAMETERS.append(name)
+
+#========INTERMEDIATES==========
+def position(landmark):
+    return intermediate("position of " + landmark,
+                        lambda engine: engine.pose.xy(engine.body_part(landmark)), landmarks=(landmark,))
+
+def velocity(landmark):
+    #since each frame is recorded, we do not need a delta-x step
+    return intermediate("velocity of " + landmark,
+                        lambda engine, xy: np.gradient(xy, axis=0), inputs=(position(landmark),))
+
+def strides(limbs):
+    '''
+    Stride table of the given limbs (names of stridedetect.LIMBS), detected together.
+    '''
+    def detect(engine, *positions):
+        if not positions:
+            return pd.DataFrame(columns=stridedetect.STRIDE_COLUMNS)
+        return stridedetect.detect_strides(np.stack([xy[:, 0] for xy in positions], axis=1), limbs)
+    return intermediate("strides of " + ", ".join(limbs), detect,
+                        inputs=[position(stridedetect.LIMBS[limb]) for limb in limbs])
+
+#========PARAMETER KINDS========
+def distance_parameter(name, landmark1, landmark2):
+    parameter(name, lambda engine, point1, point2: kinematics.distances(point1, point2),
+              inputs=(position(landmark1), position(landmark2)))
+
+def angle_parameter(name, vertex, endpoint1, endpoint2):
+    parameter(name, lambda engine, v, point1, point2: kinematics.angles(v, point1, point2),
+              inputs=(position(vertex), position(endpoint1), position(endpoint2)))
+
+def swing_angle_parameter(name, vertex, endpoint):
+    '''
+    Angle at vertex between endpoint and the vertical through vertex.
+    '''
+    def swing_angle(engine, v, point):
+        return kinematics.angles(v, point, v + np.array([0, 1], dtype=v.dtype))
+    parameter(name, swing_angle, inputs=(position(vertex), position(endpoint)))
+
+def speed_parameter(name, landmark):
+    '''
+    Speed (horizontal and vertical component) of a point on the body in pixels/frame.
+    '''
+    parameter(name, lambda engine, v: np.hypot(v[:, 0], v[:, 1]), inputs=(velocity(landmark),))
+
+def stride_parameter(name):
+    #a column of the stride table of every mapped limb, which limbs those are depends on the mapping
+    parameter(name, lambda engine, table: table[name].to_numpy(), per_stride=True,
+              inputs=lambda engine: (strides(engine.stride_limbs()),), landmarks=stridedetect.LIMBS.values())
+
+class GaitEngine:
+    '''
+    Computes gait parameters of one trial. landmarks maps anatomical landmarks to the body part
+    names in the pose data; it can be changed between calls, results for the old mapping are kept.
+    A calculation that may still be running when the mapping changes (e.g. on a pool thread) should
+    get an engine of its own from with_landmarks, which shares the computed nodes.
+    '''
+    def __init__(self, pose: PoseData, landmarks=None, max_workers=None):
+        self.pose = pose
+        self.landmarks = dict(landmarks or {})
+        self.max_workers = max_workers
+        self.memo = {}
+        #the memo is filled from the thread pool, and can be shared by engines running at the same time
+        self.memo_lock = threading.Lock()
+
+    def with_landmarks(self, landmarks):
+        '''
+        Engine for the same pose with another landmark mapping, sharing the nodes computed by this one.
+        '''
+        engine = GaitEngine(self.pose, landmarks, self.max_workers)
+        engine.memo = self.memo
+        engine.memo_lock = self.memo_lock
+        return engine
+
+    def body_part(self, landmark):
+        name = self.landmarks.get(landmark)
+        if name not in self.pose:
+            raise KeyError("Landmark '{}' is not mapped to a body part of the data (got {!r})".format(landmark, name))
+        return name
+
+    def key(self, name):
+        return (name,) + tuple(self.landmarks.get(l) for l in NODES[name].landmarks)
+
+    def inputs(self, name):
+        '''
+        Names of the input nodes of a node under the current landmark mapping.
+        '''
+        inputs = NODES[name].inputs
+        return inputs(self) if callable(inputs) else inputs
+
+    def resolve(self, names):
+        '''
+        The requested nodes and everything they depend on, each after its inputs.
+        '''
+        order = []
+        def visit(name):
+            if name not in NODES:
+                raise ValueError("Unknown gait parameter: {}".format(name))
+            if name in order:
+                return
+            for input_name in self.inputs(name):
+                visit(input_name)
+            order.append(name)
+        for name in names:
+            visit(name)
+        return order
+
+    def evaluate(self, name):
+        node = NODES[name]
+        with self.memo_lock:
+            inputs = [self.memo[self.key(i)] for i in self.inputs(name)]
+        with perflog.timed("compute", name, frames=len(self.pose)), profiling.worker():
+            return node.function(self, *inputs)
+
+    def compute(self, names, progress=None):
+        '''
+        Dict with the value of every named node. Nodes already computed for the current landmark
+        mapping are reused; the others run on a thread pool as soon as their inputs are ready.
+        progress(done, total) is called with the number of nodes computed after each one.
+        '''
+        order = self.resolve(names)
+        with self.memo_lock:
+            pending = [name for name in order if self.key(name) not in self.memo]
+        total = len(pending)
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                running = {}
+                while pending or running:
+                    with self.memo_lock:
+                        ready = [n for n in pending if all(self.key(i) in self.memo for i in self.inputs(n))]
+                    for name in ready:
+                        pending.remove(name)
+                        running[executor.submit(self.evaluate, name)] = name
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        value = future.result()
+                        with self.memo_lock:
+                            self.memo[self.key(name)] = value
+                    if progress is not None:
+                        progress(total - len(pending) - len(running), total)
+        with self.memo_lock:
+            return {name: self.memo[self.key(name)] for name in names}
+
+    def parameters(self, queried_gait_parameters, progress=None):
+        '''
+        DataFrame with one column per queried per-frame parameter and one row per frame.
+        '''
+        names = [name for name in queried_gait_parameters if not (name in NODES and NODES[name].per_stride)]
+        values = self.compute(names, progress)
+        return pd.DataFrame({name: values[name] for name in names}, index=range(len(self.pose)), columns=names)
+
+    def stride_limbs(self):
+        '''
+        Limbs whose stride landmark is mapped to a body part of the data.
+        '''
+        return [limb for limb, landmark in stridedetect.LIMBS.items() if self.landmarks.get(landmark) in self.pose]
+
+    def stride_table(self, limbs=None, progress=None):
+        '''
+        DataFrame with the limb, start, end, length and duty factor of every stride, for the given
+        limbs or all limbs that are mapped.
+        '''
+        limbs = tuple(limbs if limbs is not None else self.stride_limbs())
+        if not limbs:
+            return pd.DataFrame(columns=stridedetect.STRIDE_COLUMNS)
+        name = strides(limbs)
+        return self.compute([name], progress)[name]
+
+def with_summary_statistics(calc_frame: pd.DataFrame):
+    '''
+    calc_frame with its minimum, maximum, standard deviation and mean prepended as rows.
+    '''
+    # Calculate the statistics (min, max, std, mean) for all columns
+    statistics = calc_frame.agg(['min', 'max', 'std', 'mean'])
+
+    # Rename the index to the names of the statistics
+    statistics.index = ['Minimum', 'Maximum', 'Standard Deviation', 'Mean']
+
+    # Concatenate the new DataFrame with the original DataFrame and reindex
+    return pd.concat([statistics, calc_frame])
+
+#========REGISTRY===============
+#DISTANCES
+distance_parameter("Head Length", "Poll", "Nostril")
+distance_parameter("Neck Length", "Poll", "Withers")
+distance_parameter("Right Hind Cannon Length", "Right Hock", "Right Hind Fetlock")
+distance_parameter("Right Fore Cannon Length", "Right Knee", "Right Front Fetlock")
+distance_parameter("Right Hind Croup to Hoof Length", "Croup", "Right Hind Hoof")
+distance_parameter("Right Fore Withers to Hoof Length", "Withers", "Right Front Hoof")
+
+#ANGLES
+swing_angle_parameter("Hind Limb Swing Angle", "Croup", "Right Hind Hoof")
+swing_angle_parameter("Fore Limb Swing Angle", "Withers", "Right Front Hoof")
+angle_parameter("Fore Fetlock Angle", "Right Front Fetlock", "Right Front Hoof", "Right Knee")
+angle_parameter("Hind Fetlock Angle", "Right Hind Fetlock", "Right Hind Hoof", "Right Hock")
+angle_parameter("Back Angle", "Mid Back", "Croup", "Withers")
+
+#SPEED
+speed_parameter("Speed", "Withers")
+
+#STRIDES
+stride_parameter("Stride Length")
+stride_parameter("Duty Factor")
+
+GAIT_PARAMETERS = list(PARAMETERS)
+
+#parameters that come per stride instead of per frame
+STRIDE_PARAMETERS = [name for name in PARAMETERS if NODES[name].per_stride]
@@ -1,34 +1,77 @@
-from cProfile import label
-from cmath import inf
-import sys
-from tkinter import Y
-from turtle import color
-from xml.etree.ElementTree import tostring
-
 import matplotlib
-import matplotlib.pyplot as plt
 matplotlib.use('Qt5Agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
-from matplotlib.axis import Axis
 
 import numpy as np
-import pandas as pd
-import csv
-import string
-import traceback
+import logging
+import os
 
 import PyQt5.QtWidgets as qtw
-import PyQt5.QtGui as qtg
 import PyQt5.QtCore as qtc
 
-import gait_parameters
+import posedata
+import posefile
+import posecache
+import posetail
+import cleaning
+import plotcursor
+import decimate
+import tasks
+import perflog
+import profiling
+
+logger = logging.getLogger(__name__)
+
+#the current-frame line is redrawn at most once per this many milliseconds, however often the video moves
+CURSOR_INTERVAL_MS = 16
+
+#the likelihood threshold slider moves in steps of 1/THRESHOLD_STEPS, the data is cleaned again at most once per interval while dragging
+THRESHOLD_STEPS = 1000
+THRESHOLD_INTERVAL_MS = 50
 
 class MplCanvas(FigureCanvasQTAgg):
     def __init__(self):
-        self.fig, self.axes = plt.subplots(2, 1, constrained_layout = True)
+        #a bare Figure, pyplot (and its figure manager) is not needed inside Qt
+        self.fig = Figure(constrained_layout = True)
+        self.axes = self.fig.subplots(2, 1)
         super(MplCanvas, self).__init__(self.fig)
 
+class RetentionDialog(qtw.QDialog):
+    '''
+    Percentage of frames kept against the likelihood threshold, one curve per body part. Clicking
+    the plot picks the threshold at that point.
+    '''
+    thresholdPicked = qtc.pyqtSignal(float)
+
+    def __init__(self, thresholds, curves, threshold, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Frames Retained by Likelihood Threshold")
+        self.figure = Figure(constrained_layout=True)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        for name, curve in curves.items():
+            self.ax.plot(thresholds, curve, label=name)
+        self.ax.set_xlabel('Likelihood Threshold')
+        self.ax.set_ylabel('Frames Retained (%)')
+        self.ax.set_xlim(thresholds[0], thresholds[-1])
+        self.ax.set_ylim(0, 101)
+        if len(curves) <= 12:
+            self.ax.legend(fontsize='small')
+        self.marker = self.ax.axvline(threshold, color='r')
+        self.canvas.mpl_connect('button_press_event', self.pick)
+
+        layout = qtw.QVBoxLayout(self)
+        layout.addWidget(self.canvas)
+
+    def set_threshold(self, threshold):
+        self.marker.set_xdata([threshold, threshold])
+        self.canvas.draw_idle()
+
+    def pick(self, event):
+        if event.inaxes != self.ax or event.xdata is None: return
+        self.thresholdPicked.emit(min(max(event.xdata, 0), 1))
+
 class DataDisplay(qtw.QWidget):
     def __init__(self):
         super().__init__()
@@ -40,8 +83,41 @@ class DataDisplay(qtw.QWidget):
         self.bodypart_list = [] #stores the names of all the unique body parts in string
         self.threshold = 0 #likelihood threshold for filtering points, by default set to 0 (all points meet threshold)
 
-        #create an empty data frame using pandas API
-        self.data_frame = pd.DataFrame()
+        #coalesces video position changes (e.g. during playback) into one cursor redraw per interval
+        self.cursorTimer = qtc.QTimer(self)
+        self.cursorTimer.setSingleShot(True)
+        self.cursorTimer.setInterval(CURSOR_INTERVAL_MS)
+        self.cursorTimer.timeout.connect(self.update_cursor)
+
+        #coalesces threshold slider movements into one cleaning and plot update per interval
+        self.thresholdTimer = qtc.QTimer(self)
+        self.thresholdTimer.setSingleShot(True)
+        self.thresholdTimer.setInterval(THRESHOLD_INTERVAL_MS)
+        self.thresholdTimer.timeout.connect(self.refresh_cleaning)
+        self.retentionDialog = None
+
+        #pose predictions of the open file as read (raw_pose) and cleaned (pose), empty until a file is opened
+        self.raw_pose = posedata.PoseData(np.empty((0, 0, 3), dtype=np.float32), [])
+        self.pose = self.raw_pose
+
+        #masking of jumps and filling of masked gaps, on top of the likelihood threshold
+        self.cleaning_settings = {"max_jump": None, "max_gap": cleaning.DEFAULT_MAX_GAP, "method": "linear"}
+        self.clean_result = None
+
+        #followed CSV: the rows read so far as read and cleaned, their masked and repaired points, and the
+        #thread reading new ones
+        self.raw_buffer = None
+        self.pose_buffer = None
+        self.mask_buffer = None
+        self.repair_buffer = None
+        self.tail_reader = None
+
+        #pose file being parsed in the background, None when idle
+        self.load_task = None
+
+        #gait parameters computed from self.pose, kept between openings of the parameter dialog
+        self.gait_engine = None
+        qtw.QApplication.instance().aboutToQuit.connect(self.stop_follow)
 
         self.init_ui()
         self.show()
@@ -52,10 +128,31 @@ class DataDisplay(qtw.QWidget):
         self.openBtn = qtw.QPushButton('Open CSV Data')
         self.openBtn.clicked.connect(self.open_file)
 
+        #create follow a growing CSV button
+        self.followBtn = qtw.QPushButton('Follow CSV')
+        self.followBtn.setCheckable(True)
+        self.followBtn.toggled.connect(self.toggle_follow)
+
         #create toggle points by threshold button
         self.thresholdBtn = qtw.QPushButton('Set Likelihood Threshold')
         self.thresholdBtn.clicked.connect(self.set_likelihood_threshold)
 
+        #create likelihood threshold slider, plots follow it while dragging
+        self.thresholdSlider = qtw.QSlider(qtc.Qt.Horizontal)
+        self.thresholdSlider.setRange(0, THRESHOLD_STEPS)
+        self.thresholdSlider.valueChanged.connect(self.threshold_slider_moved)
+        self.thresholdLabel = qtw.QLabel()
+        self.thresholdLabel.setMinimumWidth(40)
+        self.update_threshold_label()
+
+        #create retention curve button
+        self.retentionBtn = qtw.QPushButton('Retention Curve')
+        self.retentionBtn.clicked.connect(self.show_retention)
+
+        #create cleaning settings button
+        self.cleanBtn = qtw.QPushButton('Clean Data')
+        self.cleanBtn.clicked.connect(self.set_cleaning)
+
         #create calculate a new column button
         self.calcBtn = qtw.QPushButton("Calculate Gait Parameters")
         self.calcBtn.clicked.connect(self.calc_gait_parameters)
@@ -63,6 +160,10 @@ class DataDisplay(qtw.QWidget):
         #create save data button
         self.saveBtn = qtw.QPushButton('Save Data')
         self.saveBtn.clicked.connect(self.save_filtered_data)
+
+        #create save cleaned data button
+        self.saveCleanedBtn = qtw.QPushButton('Save Cleaned Data')
+        self.saveCleanedBtn.clicked.connect(self.save_cleaned_data)
         
         # Create the maptlotlib FigureCanvas object
         self.plot = MplCanvas()
@@ -74,13 +175,30 @@ class DataDisplay(qtw.QWidget):
         self.plot.mpl_connect('button_release_event', self.release_graph)
         self.plot.mpl_connect('motion_notify_event', self.move_mouse)
 
+        #current frame line, moved by blitting instead of redrawing the plots
+        self.cursor = plotcursor.BlitCursor(self.plot, self.plot.axes, color = 'r', label = 'current frame')
+
+        #plotted series, drawn as a min/max envelope of the visible range at the resolution of the axes
+        self.traces = [decimate.DecimatedTraces(ax) for ax in self.plot.axes]
+
+        #one (x line, y line) pair, its masked (x, y) data and its cached (min x, max x, min y, max y) per plotted body part
+        self.series = {}
+        self.series_data = {}
+        self.series_limits = {}
+
+        #runs change_plotted_data once the current burst of selection signals is over
+        self.plotUpdateTimer = qtc.QTimer(self)
+        self.plotUpdateTimer.setSingleShot(True)
+        self.plotUpdateTimer.setInterval(0)
+        self.plotUpdateTimer.timeout.connect(self.change_plotted_data)
+
 
         #create a list_widget to control plotted variables
         self.list_widget = qtw.QListWidget()
         self.list_widget.setMaximumWidth(200)
         self.list_widget.setSelectionMode(2) #2 == MultiSelection, 3 == ExtendedSelection
-        self.list_widget.itemClicked.connect(self.change_plotted_data)
-        self.list_widget.itemSelectionChanged.connect(self.change_plotted_data)
+        self.list_widget.itemClicked.connect(self.schedule_plot_update)
+        self.list_widget.itemSelectionChanged.connect(self.schedule_plot_update)
 
         #add widgets to layout
         graphLayout = qtw.QHBoxLayout()
@@ -88,10 +206,19 @@ class DataDisplay(qtw.QWidget):
         buttonLayout = qtw.QHBoxLayout()
         plotLayout.addWidget(self.plot)
         buttonLayout.addWidget(self.openBtn)
+        buttonLayout.addWidget(self.followBtn)
         buttonLayout.addWidget(self.thresholdBtn)
+        buttonLayout.addWidget(self.cleanBtn)
         buttonLayout.addWidget(self.calcBtn)
         buttonLayout.addWidget(self.saveBtn)
+        buttonLayout.addWidget(self.saveCleanedBtn)
         plotLayout.addLayout(buttonLayout)
+        thresholdLayout = qtw.QHBoxLayout()
+        thresholdLayout.addWidget(qtw.QLabel('Likelihood Threshold'))
+        thresholdLayout.addWidget(self.thresholdSlider)
+        thresholdLayout.addWidget(self.thresholdLabel)
+        thresholdLayout.addWidget(self.retentionBtn)
+        plotLayout.addLayout(thresholdLayout)
         graphLayout.addLayout(plotLayout)
         graphLayout.addWidget(self.list_widget)
         self.setLayout(graphLayout)
@@ -99,179 +226,313 @@ class DataDisplay(qtw.QWidget):
 
     #Open CSV data, Plot on Graph
     def open_file(self):
-        filename, _ = qtw.QFileDialog.getOpenFileName(self, "Open Spreadsheet Data")
+        filename, _ = qtw.QFileDialog.getOpenFileName(self, "Open Spreadsheet Data", filter=posefile.FILE_FILTER)
 
         if filename: 
-            try:
-                #load data into pandas dataframe
-                if filename.endswith(".csv"):
-                    self.data_frame = pd.read_csv(filename)
-                elif filename.endswith(".xlsx"):
-                    self.data_frame = pd.read_excel(filename)
-                else:
-                    raise ValueError("Unsupported file type. Only CSV and Excel are allowed.")
-
-                #clean data by combining labels and reindexing
-                bodyparts_labels = self.data_frame.loc[0]
-                coords_labels = self.data_frame.loc[1]
-                labels = [i + "_" + j for i, j in zip(bodyparts_labels, coords_labels)]
-                self.data_frame.columns = labels
-                self.data_frame = self.data_frame.iloc[2: , : ]
-                self.data_frame.index = range(len(self.data_frame.index))
-                self.data_frame = self.data_frame.drop(columns=["bodyparts_coords"])
-
-                #create a list of the bodyparts add to the list widget: only add one for each triplet of x,y, likelihood
-                self.bodypart_list.clear()
-                for col in self.data_frame.columns:
-                    #convert dtype from object to float64
-                    self.data_frame[col] = pd.to_numeric(self.data_frame[col],errors = 'coerce')
-                    #add column label to list_widget
-                    bodyparts_label = str(col).split('_')[0]
-                    if bodyparts_label not in self.bodypart_list:
-                        self.bodypart_list.append(bodyparts_label)
-                        item = qtw.QListWidgetItem(bodyparts_label)
-                        self.list_widget.addItem(item)
-                
-                self.num_frames = len(self.data_frame.index)
-                self.plot.axes[0].clear()
-                self.plot.axes[1].clear()
-                self.plot.axes[0].set_xlabel('Frame Number')
-                self.plot.axes[0].set_ylabel('Pixel Coordinate (X)')
-                self.plot.axes[1].set_xlabel('Frame Number')
-                self.plot.axes[1].set_ylabel('Pixel Coordinate (Y)')
-                self.plot.axes[0].margins(x=0, y=0)
-                self.plot.axes[1].margins(x=0, y=0)
-                self.plot.axes[0].legend()
-                self.plot.axes[1].legend()
-                self.plot.axes[0].axvline(x = 0, color = 'r', label = 'current frame')
-                self.plot.axes[1].axvline(x = 0, color = 'r', label = 'current frame')
-
-                self.plot.draw_idle()
-            except Exception as e:
-                show_warning_messagebox(str(e))
-                traceback.print_exc()
+            if self.load_task is not None:
+                self.load_task.cancel()
+            #load into one float32 array of (frames, bodyparts, x/y/likelihood) on the task pool, parsed only on the first open
+            task = tasks.Task(lambda task: posecache.load(filename, progress=task.report))
+            tasks.ProgressDialog(task, "Loading " + os.path.basename(filename) + "...", self)
+            task.signals.finished.connect(lambda pose: self.pose_loaded(task, pose))
+            task.signals.failed.connect(lambda message: self.pose_load_failed(task, message))
+            task.signals.cancelled.connect(lambda: self.pose_load_failed(task, None))
+            self.load_task = tasks.start(task)
+
+    def pose_loaded(self, task, pose):
+        #a newer file was opened meanwhile
+        if task is not self.load_task or task.is_cancelled(): return
+        self.load_task = None
+        try:
+            self.followBtn.setChecked(False)
+            self.load_pose(pose)
+        except Exception as e:
+            logger.exception("Could not show the loaded pose data")
+            show_warning_messagebox(str(e))
+
+    #message is None when the load was cancelled
+    def pose_load_failed(self, task, message):
+        if task is not self.load_task: return
+        self.load_task = None
+        if message is not None:
+            show_warning_messagebox(message)
+
+    #show a new set of pose predictions, with empty plots
+    def load_pose(self, pose):
+        self.raw_pose = pose
+        self.raw_buffer = None
+        self.pose_buffer = None
+        self.mask_buffer = None
+        self.repair_buffer = None
+
+        #create a list of the bodyparts add to the list widget
+        self.bodypart_list = list(pose.bodyparts)
+        self.list_widget.clear()
+        for bodyparts_label in self.bodypart_list:
+            item = qtw.QListWidgetItem(bodyparts_label)
+            self.list_widget.addItem(item)
+        self.apply_cleaning()
+
+        self.num_frames = len(self.pose)
+        self.plot.axes[0].clear()
+        self.plot.axes[1].clear()
+        for traces in self.traces:
+            traces.reset()
+        self.series.clear()
+        self.series_data.clear()
+        self.series_limits.clear()
+        self.plot.axes[0].set_xlabel('Frame Number')
+        self.plot.axes[0].set_ylabel('Pixel Coordinate (X)')
+        self.plot.axes[1].set_xlabel('Frame Number')
+        self.plot.axes[1].set_ylabel('Pixel Coordinate (Y)')
+        self.plot.axes[0].margins(x=0, y=0)
+        self.plot.axes[1].margins(x=0, y=0)
+        self.current_frame = 0
+        self.cursor.position = 0
+        self.cursor.reset()
+        self.plot.axes[0].legend()
+        self.plot.axes[1].legend()
+        self.cursor.set_visible(True)
 
-    #save the data w/ current threshold to file
-    def save_filtered_data(self):
-        save_path, _ = qtw.QFileDialog.getSaveFileName(self, "Save Filtered Data Points to File", '', '*.csv')
+    #bytes held by the pose arrays and the plotted series, for the profiling panel
+    def memory_usage(self):
+        if self.raw_buffer is not None:
+            raw = self.raw_buffer.buffer.nbytes
+            cleaned = sum(b.buffer.nbytes for b in (self.pose_buffer, self.mask_buffer, self.repair_buffer))
+        else:
+            raw = self.raw_pose.values.nbytes
+            cleaned = self.pose.values.nbytes if self.pose is not self.raw_pose else 0
+        series = sum(x.buffer.nbytes + y.buffer.nbytes for x, y in self.series_data.values())
+        return {"pose (raw)": raw, "pose (cleaned)": cleaned, "plotted series": series}
+
+    #========FOLLOW MODE=================
+    #watch a CSV that DeepLabCut is still writing and plot rows as they are appended
+    def toggle_follow(self, checked):
+        if not checked:
+            self.stop_follow()
+            return
 
-        data = []
-        columns = []
-        for body_part in self.bodypart_list:
-            x_data = self.data_frame.loc[:, body_part + "_x"]
-            y_data = self.data_frame.loc[:, body_part + "_y"]
-            likelihood_data = self.data_frame.loc[:, body_part + "_likelihood"]
+        filename, _ = qtw.QFileDialog.getOpenFileName(self, "Follow DeepLabCut CSV", filter="CSV (*.csv)")
+        if not filename:
+            self.followBtn.setChecked(False)
+            return
+        try:
+            tail = posetail.CsvTail(filename)
+        except Exception as e:
+            self.followBtn.setChecked(False)
+            show_warning_messagebox(str(e))
+            return
+
+        self.stop_follow()
+        self.load_pose(tail.empty_pose())
+        self.raw_buffer = posetail.GrowableArray((len(tail.bodyparts), 3))
+        self.pose_buffer = posetail.GrowableArray((len(tail.bodyparts), 3))
+        self.mask_buffer = posetail.GrowableArray((len(tail.bodyparts),), dtype=bool)
+        self.repair_buffer = posetail.GrowableArray((len(tail.bodyparts),), dtype=bool)
+        self.tail_reader = posetail.TailReader(tail, parent=self)
+        self.tail_reader.rowsRead.connect(self.append_rows)
+        self.tail_reader.restarted.connect(self.restart_follow)
+        self.tail_reader.failed.connect(self.follow_failed)
+        self.tail_reader.start()
+
+    def stop_follow(self):
+        if self.tail_reader is not None:
+            self.tail_reader.stop()
+            self.tail_reader = None
+
+    def follow_failed(self, message):
+        self.followBtn.setChecked(False)
+        show_warning_messagebox(message)
+
+    #the followed file was truncated and is read again from the top
+    def restart_follow(self):
+        self.raw_buffer.clear()
+        self.raw_pose = posedata.PoseData(self.raw_buffer.data, self.bodypart_list)
+        self.apply_cleaning()
+        self.num_frames = 0
+        self.clear_series()
+        self.change_plotted_data()
 
-            x_data = x_data.to_numpy()
-            y_data = y_data.to_numpy()
-            likelihood_data = likelihood_data.to_numpy()
+    #extend the pose arrays and the plotted series by the newly read rows, without replotting the older ones
+    def append_rows(self, rows):
+        start = len(self.pose_buffer)
+        self.raw_buffer.append(rows)
+        self.raw_pose = posedata.PoseData(self.raw_buffer.data, self.bodypart_list)
+
+        #the new rows are cleaned together with the end of the earlier ones, so jumps and gaps across two
+        #reads come out as in a full clean; the cleaned rows from first on are replaced
+        first, result = cleaning.clean_tail(self.raw_pose, start, self.threshold, **self.cleaning_settings)
+        self.store_cleaned(first, result)
+        self.update_cleaning_tooltips()
+        self.num_frames = len(self.pose)
+
+        #grow the x range with the file, unless the user is looking at an earlier part of it
+        for ax in self.plot.axes:
+            xmin, xmax = ax.get_xlim()
+            if ax.get_autoscalex_on() or xmax >= start - 1:
+                #no xlim_changed callbacks, the series are redrawn once below
+                ax.set_xlim(0 if ax.get_autoscalex_on() else xmin, max(self.num_frames - 1, 1), emit=False)
+
+        for name in self.series:
+            self.extend_series(name, first)
+        self.update_ylim()
+        self.plot.draw_idle()
 
-            x_data = np.ma.masked_where(likelihood_data < self.threshold, x_data)
-            y_data = np.ma.masked_where(likelihood_data < self.threshold, y_data)
+    #save the data w/ current threshold to file
+    def save_filtered_data(self):
+        save_path, _ = qtw.QFileDialog.getSaveFileName(self, "Save Filtered Data Points to File", '', '*.csv')
 
-            x_data = np.ma.filled(x_data, np.nan)
-            y_data = np.ma.filled(x_data, np.nan)
+        if not save_path: return
+        df = self.raw_pose.to_dataframe(threshold=self.threshold)
+        df.to_csv(save_path)
 
-            columns.append(body_part+"_x")
-            columns.append(body_part+"_y")
-            columns.append(body_part+"_likelihood")
+    #save the cleaned data (current threshold, jump masking and gap filling) and which points were repaired
+    def save_cleaned_data(self):
+        if self.clean_result is None:
+            show_warning_messagebox("Open a pose file before saving cleaned data.")
+            return
+        save_path, _ = qtw.QFileDialog.getSaveFileName(self, "Save Cleaned Data Points to File", '', '*.csv')
 
-            data.append(x_data)
-            data.append(y_data)
-            data.append(likelihood_data)
-        data = np.swapaxes(data, 0, 1)      
-        df = pd.DataFrame(data=data, columns=columns)
+        if not save_path: return
+        df = self.clean_result.to_dataframe()
         df.to_csv(save_path)
   
-    #switch the data plotted on the graph
+    #collapse the several list widget signals of one click into a single plot update
+    def schedule_plot_update(self):
+        if not self.plotUpdateTimer.isActive():
+            self.plotUpdateTimer.start()
+
+    #switch the data plotted on the graph: only the body parts added to or removed from the selection are touched
+    @profiling.probe("change_plotted_data")
     def change_plotted_data(self):
-        while self.plot.axes[0].lines:
-            self.plot.axes[0].lines[-1].remove()
-        while self.plot.axes[1].lines:
-            self.plot.axes[1].lines[-1].remove()
-        
-        items = self.list_widget.selectedItems()
-        #grab max/min y to set plot bounds
-        minx, maxx, miny, maxy = 0, 1, 0, 1 #initialized for case of empty plot
-        if items:
-            minx = inf
-            maxx = -inf
-            miny = inf
-            maxy = -inf
-
-        for i in items:
-
-            #update this function to incorporate threshold member variable when plotting
-            x_data = self.data_frame.loc[:, i.text() + "_x"]
-            y_data = self.data_frame.loc[:, i.text() + "_y"]
-            likelihood_data = self.data_frame.loc[:, i.text() + "_likelihood"]
-            x_data = x_data.to_numpy()
-            y_data = y_data.to_numpy()
-            likelihood_data = likelihood_data.to_numpy()
-            x_data = np.ma.masked_where(likelihood_data < self.threshold, x_data)
-            y_data = np.ma.masked_where(likelihood_data < self.threshold, y_data)
-
-            #cmap = matplotlib.colormaps['plasma']
-            #colored = [cmap(tl) for tl in likelihood_data]
-
-
-            self.plot.axes[0].plot(range(len(x_data)), x_data, label = i.text(), marker='.')
-            self.plot.axes[1].plot(range(len(y_data)), y_data, label = i.text(), marker='.')
-
-            #catch runtime warning when all nans (from threshold == 1)
-            if (minx > np.nanmin(x_data)):
-                minx = np.nanmin(x_data)
-            if (maxx < np.nanmax(x_data)):
-                maxx = np.nanmax(x_data)
-            if (miny > np.nanmin(y_data)):
-                miny = np.nanmin(y_data)
-            if (maxy < np.nanmax(y_data)):
-                maxy = np.nanmax(y_data)
-        
-        self.plot.axes[0].axvline(x = self.current_frame, color = 'r', label = 'current frame')
-        self.plot.axes[1].axvline(x = self.current_frame, color = 'r', label = 'current frame')
+        selected = [i.text() for i in self.list_widget.selectedItems()]
 
-        self.plot.axes[0].legend()
-        self.plot.axes[1].legend()
-        #reset vertical axis range
-        dx = (maxx - minx)*0.1
-        dy = (maxy - miny)*0.1
-        try:
-            self.plot.axes[0].set_ylim(minx-dx, maxx+dx)
-            self.plot.axes[1].set_ylim(miny-dy, maxy+dy)
-        except ValueError as e:
-            self.plot.axes[0].set_ylim(0, 1)
-            self.plot.axes[0].set_ylim(0, 1)
+        with perflog.timed("plot", "change plotted data", series=len(selected)):
+            for name in list(self.series):
+                if name not in selected:
+                    self.remove_series(name)
+            for name in selected:
+                if name not in self.series:
+                    self.add_series(name)
 
+            self.plot.axes[0].legend()
+            self.plot.axes[1].legend()
+            self.update_ylim()
 
         self.plot.draw_idle()
 
+    #x and y of a body part from frame start on, masked points that were not repaired are NaN and become gaps in the line
+    def masked_series(self, name, start=0):
+        return self.pose.x(name)[start:], self.pose.y(name)[start:]
+
+    def add_series(self, name):
+        x_data, y_data = self.masked_series(name)
+        #kept growable so follow mode can append to them
+        series_x = posetail.GrowableArray(capacity=len(x_data))
+        series_y = posetail.GrowableArray(capacity=len(y_data))
+        series_x.append(x_data)
+        series_y.append(y_data)
+
+        #cmap = matplotlib.colormaps['plasma']
+        #colored = [cmap(tl) for tl in likelihood_data]
+
+        self.series[name] = (self.traces[0].plot(series_x.data, label = name), self.traces[1].plot(series_y.data, label = name))
+        self.series_data[name] = (series_x, series_y)
+        self.series_limits[name] = None
+        self.merge_limits(name, x_data, y_data)
+
+    #replace the frames from start on of a plotted series with the current ones
+    def extend_series(self, name, start):
+        x_data, y_data = self.masked_series(name, start)
+        line_x, line_y = self.series[name]
+        series_x, series_y = self.series_data[name]
+        series_x.truncate(start)
+        series_y.truncate(start)
+        series_x.append(x_data)
+        series_y.append(y_data)
+        self.traces[0].set_data(line_x, series_x.data)
+        self.traces[1].set_data(line_y, series_y.data)
+        self.merge_limits(name, x_data, y_data)
+
+    #cache the bounds of the series so the vertical axis range is not recomputed from the data
+    def merge_limits(self, name, x_data, y_data):
+        if np.isnan(x_data).all():
+            #all points below the threshold (e.g. threshold == 1), or no points
+            return
+        limits = (np.nanmin(x_data), np.nanmax(x_data), np.nanmin(y_data), np.nanmax(y_data))
+        old = self.series_limits[name]
+        if old is not None:
+            limits = (min(old[0], limits[0]), max(old[1], limits[1]), min(old[2], limits[2]), max(old[3], limits[3]))
+        self.series_limits[name] = limits
+
+    #replace the data of every plotted series, keeping its lines
+    @profiling.probe("refresh_series")
+    def refresh_series(self):
+        with perflog.timed("plot", "refresh series", series=len(self.series)):
+            self.replace_series_data()
+        self.plot.draw_idle()
+
+    def replace_series_data(self):
+        for name, (line_x, line_y) in self.series.items():
+            x_data, y_data = self.masked_series(name)
+            series_x, series_y = self.series_data[name]
+            series_x.clear()
+            series_y.clear()
+            series_x.append(x_data)
+            series_y.append(y_data)
+            self.traces[0].set_data(line_x, series_x.data)
+            self.traces[1].set_data(line_y, series_y.data)
+            self.series_limits[name] = None
+            self.merge_limits(name, x_data, y_data)
+        self.update_ylim()
+
+    def remove_series(self, name):
+        line_x, line_y = self.series.pop(name)
+        self.traces[0].remove(line_x)
+        self.traces[1].remove(line_y)
+        del self.series_data[name]
+        del self.series_limits[name]
+
+    def clear_series(self):
+        for name in list(self.series):
+            self.remove_series(name)
+
+    #reset vertical axis range from the cached bounds of the plotted series
+    def update_ylim(self):
+        limits = [l for l in self.series_limits.values() if l is not None]
+        if not limits:
+            self.plot.axes[0].set_ylim(0, 1)
+            self.plot.axes[1].set_ylim(0, 1)
+            return
+        limits = np.array(limits)
+        minx, maxx = limits[:, 0].min(), limits[:, 1].max()
+        miny, maxy = limits[:, 2].min(), limits[:, 3].max()
+        dx = (maxx - minx)*0.1
+        dy = (maxy - miny)*0.1
+        self.plot.axes[0].set_ylim(minx-dx, maxx+dx)
+        self.plot.axes[1].set_ylim(miny-dy, maxy+dy)
+
     #=======GRAPH INTERACTIVITY========
     def click_graph(self, event):
         self.mouse_hold = True
         if all(event.inaxes != ax for ax in self.plot.axes): return
-        if self.plot.axes[0].lines and self.plot.axes[1].lines:
-            self.plot.axes[0].lines[-1].remove()
-            self.plot.axes[1].lines[-1].remove()
+        if self.has_data():
             self.current_frame = int(event.xdata)
-            self.plot.axes[0].axvline(x = self.current_frame, color = 'r', label = 'current frame')
-            self.plot.axes[1].axvline(x = self.current_frame, color = 'r', label = 'current frame')
-            self.plot.draw_idle()
+            self.cursor.set_position(self.current_frame)
             #print("grapher_click_graph")
     
+    def has_data(self):
+        return self.num_frames > 0
+
     def release_graph(self, event):
         self.mouse_hold = False
     
     def move_mouse(self, event):
         if self.mouse_hold:
             if all(event.inaxes != ax for ax in self.plot.axes): return
-            if self.plot.axes[0].lines and self.plot.axes[1].lines:
-                self.plot.axes[0].lines[-1].remove()
-                self.plot.axes[1].lines[-1].remove()
+            if self.has_data():
                 self.current_frame = int(event.xdata)
-                self.plot.axes[0].axvline(x = self.current_frame, color = 'r', label = 'current frame')
-                self.plot.axes[1].axvline(x = self.current_frame, color = 'r', label = 'current frame')
-                self.plot.draw_idle()
+                self.cursor.set_position(self.current_frame)
                 #print("grapher_click_graph")
 
     def zoom(self, event):
@@ -303,21 +564,118 @@ class DataDisplay(qtw.QWidget):
 
     #========DATA MANIPULATION===========
     def set_likelihood_threshold(self):
-        self.threshold, done = qtw.QInputDialog.getDouble(self,
+        threshold, done = qtw.QInputDialog.getDouble(self,
          "Threshold Dialog",
-         "Enter a likelihood value between 0-1. Graph will only display points above this threshold.",
-          value=0, min=0, max=1, decimals=3)
-        self.change_plotted_data()
+         "Enter a likelihood value between 0-1. Points below this threshold are masked, and gaps up to the\n"
+         "maximum length set under 'Clean Data' are filled in.",
+          value=self.threshold, min=0, max=1, decimals=3)
+        if not done: return
+        self.thresholdSlider.setValue(round(threshold * THRESHOLD_STEPS))
+
+    def threshold_slider_moved(self, value):
+        self.threshold = value / THRESHOLD_STEPS
+        self.update_threshold_label()
+        if self.retentionDialog is not None:
+            self.retentionDialog.set_threshold(self.threshold)
+        if not self.thresholdTimer.isActive():
+            self.thresholdTimer.start()
+
+    def update_threshold_label(self):
+        self.thresholdLabel.setText("{:.3f}".format(self.threshold))
+
+    #percentage of frames kept against the threshold for the selected (or all) body parts
+    def show_retention(self):
+        if not self.has_data(): return
+        names = [i.text() for i in self.list_widget.selectedItems()] or self.bodypart_list
+        thresholds = np.linspace(0, 1, THRESHOLD_STEPS // 10 + 1)
+        curve = cleaning.retention(self.raw_pose, thresholds) * 100
+        curves = {name: curve[:, self.raw_pose.bodypart_index[name]] for name in names}
+
+        if self.retentionDialog is not None:
+            self.retentionDialog.close()
+        self.retentionDialog = RetentionDialog(thresholds, curves, self.threshold, parent=self)
+        self.retentionDialog.thresholdPicked.connect(
+            lambda threshold: self.thresholdSlider.setValue(round(threshold * THRESHOLD_STEPS)))
+        self.retentionDialog.finished.connect(self.retention_closed)
+        self.retentionDialog.show()
+
+    def retention_closed(self):
+        self.retentionDialog = None
+
+    def set_cleaning(self):
+        dialog = qtw.QDialog(self)
+        dialog.setWindowTitle("Cleaning Settings")
+        form = qtw.QFormLayout(dialog)
+
+        jumpBox = qtw.QDoubleSpinBox()
+        jumpBox.setRange(0, 10000)
+        jumpBox.setSpecialValueText("Off")
+        jumpBox.setSuffix(" px/frame")
+        jumpBox.setValue(self.cleaning_settings["max_jump"] or 0)
+        form.addRow("Mask jumps faster than", jumpBox)
+
+        gapBox = qtw.QSpinBox()
+        gapBox.setRange(0, 10000)
+        gapBox.setSuffix(" frames")
+        gapBox.setValue(self.cleaning_settings["max_gap"])
+        form.addRow("Fill gaps up to", gapBox)
+
+        methodBox = qtw.QComboBox()
+        methodBox.addItems(cleaning.METHODS)
+        methodBox.setCurrentText(self.cleaning_settings["method"])
+        form.addRow("Interpolation", methodBox)
+
+        buttons = qtw.QDialogButtonBox(qtw.QDialogButtonBox.Ok | qtw.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        form.addRow(buttons)
+
+        if dialog.exec_() != qtw.QDialog.Accepted: return
+        self.cleaning_settings = {"max_jump": jumpBox.value() or None, "max_gap": gapBox.value(),
+                                  "method": methodBox.currentText()}
+        self.refresh_cleaning()
+
+    #clean the data again with the current settings and update the plotted series in place
+    def refresh_cleaning(self):
+        self.apply_cleaning()
+        self.refresh_series()
+
+    def apply_cleaning(self):
+        self.clean_result = cleaning.clean(self.raw_pose, self.threshold, **self.cleaning_settings)
+        self.pose = self.clean_result.pose
+        if self.pose_buffer is not None:
+            #follow mode keeps extending the cleaned rows
+            self.store_cleaned(0, self.clean_result)
+        self.update_cleaning_tooltips()
+
+    #follow mode: replace the cleaned rows from first on with those of result
+    def store_cleaned(self, first, result):
+        buffers = (self.pose_buffer, self.mask_buffer, self.repair_buffer)
+        for buffer, rows in zip(buffers, (result.pose.values, result.masked_points, result.repaired_points)):
+            buffer.truncate(first)
+            buffer.append(rows)
+        self.pose = posedata.PoseData(self.pose_buffer.data, self.bodypart_list)
+        self.clean_result = cleaning.CleanResult(self.pose, self.mask_buffer.data, self.repair_buffer.data)
+
+    def update_cleaning_tooltips(self):
+        for i in range(self.list_widget.count()):
+            item = self.list_widget.item(i)
+            name = item.text()
+            item.setToolTip("{} frames masked, {} repaired".format(self.clean_result.masked_frames(name),
+                                                                   self.clean_result.repaired_frames(name)))
 
     def calc_gait_parameters(self):
         items = [self.list_widget.item(i).text() for i in range(self.list_widget.count())]
 
         if items:
-            dialog = gait_parameters.ParameterInputDialog(items, self.data_frame)
+            #the gait engine pulls in SciPy, loaded on first use instead of at startup
+            import gait_parameters
+            import gaitcalc
+            if self.gait_engine is None or self.gait_engine.pose is not self.pose:
+                self.gait_engine = gaitcalc.GaitEngine(self.pose)
+            dialog = gait_parameters.ParameterInputDialog(items, self.pose, self.gait_engine)
             if dialog.exec_() == qtw.QDialog.Accepted:
-                print("Landmarks:", dialog.confirmed_landmarks)
-                print("Gait Parameters:", dialog.queried_gait_parameters)
-                print("Summary Statistics:", dialog.summ_stats)
+                logger.info("Calculated gait parameters %s", dialog.queried_gait_parameters)
 
         else:
             qtw.QMessageBox.warning(self, "No landmarks are available! Try loading a data file.")
@@ -331,12 +689,12 @@ class DataDisplay(qtw.QWidget):
         frame = round(position)
         self.current_frame = frame
 
-        if self.plot.axes[0].lines and self.plot.axes[1].lines:
-            self.plot.axes[0].lines[-1].remove()
-            self.plot.axes[1].lines[-1].remove()
-            self.plot.axes[0].axvline(x = self.current_frame, color = 'r', label = 'current frame')
-            self.plot.axes[1].axvline(x = self.current_frame, color = 'r', label = 'current frame')
-            self.plot.draw_idle()
+        if not self.cursorTimer.isActive():
+            self.cursorTimer.start()
+
+    def update_cursor(self):
+        if self.has_data() and self.cursor.position != self.current_frame:
+            self.cursor.set_position(self.current_frame)
 
     #Store the duration of video in graph object, supports vertical line scrubbing function.
     def video_duration_changed(self, duration):
@@ -0,0 +1,34 @@
+'''
+Batch kernels for the gait parameters. Each works on whole arrays of points, shape (frames, 2)
+with x and y in the last axis, in a handful of NumPy operations instead of a Python call per
+frame. The result has the dtype of the inputs (float32 pose data gives float32 results) and can
+be written into a preallocated array through out.
+'''
+import numpy as np
+
+def angles(vertex, point1, point2, out=None):
+    '''
+    Signed angle in degrees at vertex from point1 to point2, per frame. Same result as
+    gait_parameters.angle on every row.
+    '''
+    vector1 = np.subtract(point1, vertex)
+    vector2 = np.subtract(point2, vertex)
+    #z component of the cross product and the dot product of the two vectors
+    cross = vector1[..., 0] * vector2[..., 1] - vector1[..., 1] * vector2[..., 0]
+    dot = vector1[..., 0] * vector2[..., 0] + vector1[..., 1] * vector2[..., 1]
+    radians = np.arctan2(cross, dot, out=out)
+    return np.degrees(radians, out=out)
+
+def distances(point1, point2, out=None):
+    '''
+    Euclidean distance between point1 and point2, per frame.
+    '''
+    difference = np.subtract(point2, point1)
+    return np.hypot(difference[..., 0], difference[..., 1], out=out)
+
+def speeds(x, y, out=None):
+    '''
+    Speed in pixels/frame of a point with coordinates x and y, from the central difference of
+    both components.
+    '''
+    return np.hypot(np.gradient(x), np.gradient(y), out=out)
@@ -5,11 +5,16 @@ import PyQt5.QtWidgets as qtw
 import PyQt5.QtGui as qtg
 import PyQt5.QtCore as qtc
 
+#logging is set up once, before any other module of the application logs
+import applog
+applog.configure()
+
 import videoplayer
 import grapher
+import perfview
 
 
-class MainWindow(qtw.QWidget):
+class MainWindow(qtw.QMainWindow):
     def __init__(self):
         super().__init__()
 
@@ -28,18 +33,47 @@ class MainWindow(qtw.QWidget):
         splitter.addWidget(self.videoplayer)
         splitter.addWidget(self.graph)
 
+        #performance log viewer, created when first opened
+        self.perfDialog = None
+        perfBtn = qtw.QPushButton('Performance Log')
+        perfBtn.clicked.connect(self.show_perf_log)
+
+        #latency, cache and memory figures, docked on the right and hidden until asked for
+        self.profilingDock = qtw.QDockWidget("Profiling", self)
+        self.profilingDock.setWidget(perfview.ProfilingPanel(self.videoplayer, self.graph))
+        self.addDockWidget(qtc.Qt.RightDockWidgetArea, self.profilingDock)
+        self.profilingDock.hide()
+        profilingBtn = qtw.QPushButton('Profiling')
+        profilingBtn.setCheckable(True)
+        profilingBtn.toggled.connect(self.profilingDock.setVisible)
+        self.profilingDock.visibilityChanged.connect(profilingBtn.setChecked)
+
+        statusLayout = qtw.QHBoxLayout()
+        statusLayout.addStretch()
+        statusLayout.addWidget(profilingBtn)
+        statusLayout.addWidget(perfBtn)
+
         outerLayout = qtw.QVBoxLayout()
         outerLayout.addWidget(splitter)
-        self.setLayout(outerLayout)
+        outerLayout.addLayout(statusLayout)
+        central = qtw.QWidget()
+        central.setLayout(outerLayout)
+        self.setCentralWidget(central)
 
         #supports syncronized scrubbing of graph alongside video
-        self.videoplayer.slider.sliderMoved.connect(self.graph.video_position_changed)
+        self.videoplayer.positionChanged.connect(self.graph.video_position_changed)
         #reverse connection - clicking on graph shifts video frame
         self.graph.plot.mpl_connect('button_press_event', self.videoplayer.click_graph)
         self.graph.plot.mpl_connect('motion_notify_event', self.videoplayer.move_mouse_graph)
 
         self.showMaximized()
 
+    def show_perf_log(self):
+        if self.perfDialog is None:
+            self.perfDialog = perfview.PerfLogDialog(self)
+        self.perfDialog.show()
+        self.perfDialog.raise_()
+
 #Initialize
 app = qtw.QApplication([])
 mw = MainWindow()
@@ -0,0 +1,105 @@
+'''
+Opt-in performance channel. The hot paths wrap their stages (load, parse, decode, plot, compute)
+in timed(); while recording is enabled every stage becomes a structured record (stage, name,
+duration in ms, thread and any extra fields) kept in a bounded in-memory buffer for the in-app
+viewer, and logged as one JSON object per line to the "perf" logger, which ends up in the log
+file. While recording is disabled timed() costs one flag check. Recording starts enabled when the
+DLC_DISPLAY_PERF environment variable is set to anything but 0.
+'''
+import collections
+import csv
+import json
+import logging
+import os
+import threading
+import time
+
+LOGGER_NAME = "perf"
+ENABLE_VARIABLE = "DLC_DISPLAY_PERF"
+
+STAGES = ("load", "parse", "decode", "plot", "compute")
+
+#records kept in memory, the oldest are dropped first
+MAX_RECORDS = 50000
+
+#columns every record has, extra fields follow them in exports
+FIELDS = ["time", "stage", "name", "ms", "thread"]
+
+logger = logging.getLogger(LOGGER_NAME)
+records = collections.deque(maxlen=MAX_RECORDS)
+enabled = os.environ.get(ENABLE_VARIABLE, "0") not in ("", "0")
+
+def set_enabled(on):
+    global enabled
+    enabled = bool(on)
+
+class timed:
+    '''
+    Context manager recording how long its block took as one stage. Fields given here or set on
+    .fields inside the block (e.g. the number of frames read) are kept with the record; a block
+    left by an exception is recorded with failed=True.
+    '''
+    __slots__ = ("stage", "name", "fields", "start")
+
+    def __init__(self, stage, name="", **fields):
+        self.stage = stage
+        self.name = name
+        self.fields = fields
+        self.start = None
+
+    def __enter__(self):
+        if enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.start is not None:
+            if exc_type is not None:
+                self.fields["failed"] = True
+            record(self.stage, self.name, time.perf_counter() - self.start, **self.fields)
+        return False
+
+def record(stage, name, seconds, **fields):
+    entry = {"time": time.time(), "stage": stage, "name": str(name), "ms": round(seconds * 1000, 3),
+             "thread": threading.current_thread().name}
+    entry.update(fields)
+    records.append(entry)
+    logger.info(json.dumps(entry, default=str))
+
+def snapshot(stage=None):
+    '''
+    Copy of the records kept so far, oldest first, optionally of one stage only.
+    '''
+    entries = list(records)
+    if stage is not None:
+        entries = [entry for entry in entries if entry["stage"] == stage]
+    return entries
+
+def clear():
+    records.clear()
+
+def summary(entries):
+    '''
+    Per stage: number of records, total and mean milliseconds.
+    '''
+    totals = {}
+    for entry in entries:
+        count, total = totals.get(entry["stage"], (0, 0.0))
+        totals[entry["stage"]] = (count + 1, total + entry["ms"])
+    return {stage: {"count": count, "total_ms": total, "mean_ms": total / count} for stage, (count, total) in totals.items()}
+
+def export(path, entries=None):
+    '''
+    Write records (by default all kept so far) to path, as CSV if it ends in .csv and as one JSON
+    object per line otherwise.
+    '''
+    entries = snapshot() if entries is None else entries
+    with open(path, 'w', newline='') as file:
+        if path.lower().endswith(".csv"):
+            extra = sorted({key for entry in entries for key in entry} - set(FIELDS))
+            writer = csv.DictWriter(file, fieldnames=FIELDS + extra)
+            writer.writeheader()
+            writer.writerows(entries)
+        else:
+            for entry in entries:
+                file.write(json.dumps(entry, default=str) + "\n")
@@ -0,0 +1,232 @@
+'''
+In-app views of the performance instrumentation. PerfLogDialog shows the performance channel
+(perflog.py): it switches recording on and off, lists the records newest first with a per-stage
+summary, and exports them to CSV or JSON lines to attach to a report of a slow session.
+ProfilingPanel, shown in a dock of the main window, follows the latency probes (profiling.py),
+the frame cache hit rates and the memory held by frames and pose arrays, and captures cProfile
+dumps.
+'''
+import json
+import os
+import sys
+
+import PyQt5.QtWidgets as qtw
+import PyQt5.QtCore as qtc
+
+import perflog
+import profiling
+
+#rows shown in the table, the export always has every record kept
+MAX_SHOWN = 2000
+
+#the table is refreshed this often while recording
+REFRESH_INTERVAL_MS = 1000
+
+COLUMNS = ["Time", "Stage", "Name", "ms", "Thread", "Details"]
+
+class PerfLogDialog(qtw.QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Performance Log")
+        self.resize(800, 500)
+
+        self.recordCheck = qtw.QCheckBox("Record timings")
+        self.recordCheck.setChecked(perflog.enabled)
+        self.recordCheck.toggled.connect(self.set_recording)
+
+        self.stageBox = qtw.QComboBox()
+        self.stageBox.addItem("All stages", None)
+        for stage in perflog.STAGES:
+            self.stageBox.addItem(stage, stage)
+        self.stageBox.currentIndexChanged.connect(self.refresh)
+
+        self.table = qtw.QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(qtw.QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+
+        self.summaryLabel = qtw.QLabel()
+
+        refreshBtn = qtw.QPushButton("Refresh")
+        refreshBtn.clicked.connect(self.refresh)
+        clearBtn = qtw.QPushButton("Clear")
+        clearBtn.clicked.connect(self.clear)
+        exportBtn = qtw.QPushButton("Export...")
+        exportBtn.clicked.connect(self.export)
+
+        topLayout = qtw.QHBoxLayout()
+        topLayout.addWidget(self.recordCheck)
+        topLayout.addStretch()
+        topLayout.addWidget(self.stageBox)
+        buttonLayout = qtw.QHBoxLayout()
+        buttonLayout.addWidget(self.summaryLabel)
+        buttonLayout.addStretch()
+        buttonLayout.addWidget(refreshBtn)
+        buttonLayout.addWidget(clearBtn)
+        buttonLayout.addWidget(exportBtn)
+
+        layout = qtw.QVBoxLayout(self)
+        layout.addLayout(topLayout)
+        layout.addWidget(self.table)
+        layout.addLayout(buttonLayout)
+
+        self.refreshTimer = qtc.QTimer(self)
+        self.refreshTimer.setInterval(REFRESH_INTERVAL_MS)
+        self.refreshTimer.timeout.connect(self.refresh)
+        self.refresh()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refreshTimer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refreshTimer.stop()
+
+    def set_recording(self, on):
+        perflog.set_enabled(on)
+
+    def refresh(self):
+        entries = perflog.snapshot(self.stageBox.currentData())
+        shown = entries[::-1][:MAX_SHOWN]
+        self.table.setRowCount(len(shown))
+        for row, entry in enumerate(shown):
+            details = {key: value for key, value in entry.items() if key not in perflog.FIELDS}
+            values = [qtc.QDateTime.fromMSecsSinceEpoch(int(entry["time"] * 1000)).toString("hh:mm:ss.zzz"),
+                      entry["stage"], entry["name"], "{:.3f}".format(entry["ms"]), entry["thread"],
+                      json.dumps(details, default=str) if details else ""]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, qtw.QTableWidgetItem(value))
+
+        stages = perflog.summary(entries)
+        self.summaryLabel.setText("   ".join("{}: {} in {:.0f} ms (mean {:.2f})".format(
+            stage, s["count"], s["total_ms"], s["mean_ms"]) for stage, s in stages.items()) or "No records")
+
+    def clear(self):
+        perflog.clear()
+        self.refresh()
+
+    def export(self):
+        path, _ = qtw.QFileDialog.getSaveFileName(self, "Export Performance Log", '',
+                                                  "CSV (*.csv);;JSON lines (*.jsonl)")
+        if path:
+            perflog.export(path)
+
+#the profiling panel is refreshed this often while shown
+PANEL_REFRESH_MS = 500
+
+LATENCY_COLUMNS = ["Probe", "Calls", "p50 ms", "p95 ms", "p99 ms", "Max ms"]
+
+def format_bytes(n):
+    for unit in ("B", "KiB", "MiB"):
+        if n < 1024:
+            return "{:.0f} {}".format(n, unit)
+        n /= 1024
+    return "{:.1f} GiB".format(n)
+
+class ProfilingPanel(qtw.QWidget):
+    '''
+    Rolling latencies of the probes, cache hit rates and memory use of the video player's frame
+    source and the data display's pose arrays.
+    '''
+    def __init__(self, videoplayer, graph, parent=None):
+        super().__init__(parent)
+        self.videoplayer = videoplayer
+        self.graph = graph
+        self.capture = profiling.ProfileCapture()
+
+        self.table = qtw.QTableWidget(0, len(LATENCY_COLUMNS))
+        self.table.setHorizontalHeaderLabels(LATENCY_COLUMNS)
+        self.table.setEditTriggers(qtw.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(qtw.QHeaderView.ResizeToContents)
+
+        self.cacheLabel = qtw.QLabel()
+        self.memoryLabel = qtw.QLabel()
+        for label in (self.cacheLabel, self.memoryLabel):
+            label.setTextInteractionFlags(qtc.Qt.TextSelectableByMouse)
+
+        resetBtn = qtw.QPushButton("Reset")
+        resetBtn.clicked.connect(self.reset)
+        self.profileBtn = qtw.QPushButton("Start cProfile")
+        self.profileBtn.setCheckable(True)
+        self.profileBtn.setToolTip("Profile the GUI thread and the background tasks, frame read-ahead and proxy building")
+        self.profileBtn.toggled.connect(self.toggle_profile)
+
+        buttonLayout = qtw.QHBoxLayout()
+        buttonLayout.addWidget(resetBtn)
+        buttonLayout.addWidget(self.profileBtn)
+
+        layout = qtw.QVBoxLayout(self)
+        layout.addWidget(self.table)
+        layout.addWidget(qtw.QLabel("<b>Caches</b>"))
+        layout.addWidget(self.cacheLabel)
+        layout.addWidget(qtw.QLabel("<b>Memory</b>"))
+        layout.addWidget(self.memoryLabel)
+        layout.addLayout(buttonLayout)
+
+        self.refreshTimer = qtc.QTimer(self)
+        self.refreshTimer.setInterval(PANEL_REFRESH_MS)
+        self.refreshTimer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refreshTimer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refreshTimer.stop()
+
+    def refresh(self):
+        latencies = profiling.latencies()
+        self.table.setRowCount(len(latencies))
+        for row, (name, stats) in enumerate(latencies.items()):
+            values = [name, str(stats["count"])] + ["{:.2f}".format(stats[key]) for key in ("p50", "p95", "p99", "max")]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, qtw.QTableWidgetItem(value))
+
+        self.cacheLabel.setText("\n".join(self.cache_lines()))
+        memory = self.memory_usage()
+        self.memoryLabel.setText("\n".join("{}: {}".format(name, format_bytes(n)) for name, n in memory.items()) or "Nothing loaded")
+
+    def cache_lines(self):
+        lines = []
+        source = self.videoplayer.frame_source
+        if source is not None:
+            lines.append("Frames: {:.1%} hit ({} cached, {} proxy, {} decoded), {} in memory".format(
+                source.hit_rate(), source.hits, source.proxy_hits, source.misses, len(source.cache)))
+        #only when the gait engine has been loaded, the panel does not import it
+        smoothing = sys.modules.get("smoothing")
+        if smoothing is not None:
+            info = smoothing.lowpass.cache_info()
+            lines.append("Filter designs: {} hits, {} designed".format(info.hits, info.misses))
+        return lines or ["No video open"]
+
+    def memory_usage(self):
+        memory = {}
+        if self.videoplayer.frame_source is not None:
+            memory.update(self.videoplayer.frame_source.memory_usage())
+        memory.update(self.graph.memory_usage())
+        return {name: n for name, n in memory.items() if n}
+
+    def reset(self):
+        profiling.reset()
+        self.refresh()
+
+    def toggle_profile(self, checked):
+        if checked:
+            self.capture.start()
+            self.profileBtn.setText("Stop cProfile")
+            return
+        self.profileBtn.setText("Start cProfile")
+        path, _ = qtw.QFileDialog.getSaveFileName(self, "Save cProfile Statistics", "session.prof", "*.prof")
+        if not path:
+            #stopped without keeping the capture
+            self.capture.cancel()
+            return
+        seconds = self.capture.stop(path)
+        qtw.QMessageBox.information(self, "cProfile", "{:.0f} s of the session written to {} (summary in {})".format(
+            seconds, path, os.path.basename(path) + ".txt"))
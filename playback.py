@@ -0,0 +1,104 @@
+'''
+Wall-clock driven playback of a video. The clock decides which frame should be on screen from the
+time elapsed since playback started, the video's native frame rate and the playback rate. When
+decoding or drawing falls behind, the frames that are already late are skipped (and counted as
+dropped) so that playback keeps real time instead of slowing down.
+'''
+import time
+from collections import deque
+
+import PyQt5.QtCore as qtc
+
+#selectable playback rates, as multiples of the video's native frame rate
+PLAYBACK_RATES = [0.25, 0.5, 1.0, 2.0, 4.0]
+
+#frame rate assumed for videos that do not report one
+DEFAULT_FPS = 30.0
+
+#length of the window the achieved frame rate is measured over
+FPS_WINDOW_SECONDS = 1.0
+
+class PlaybackClock(qtc.QObject):
+    '''
+    Emits frameDue with the number of the frame to display whenever a new frame falls due.
+    '''
+    frameDue = qtc.pyqtSignal(int)
+    stopped = qtc.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.fps = DEFAULT_FPS
+        self.rate = 1.0
+        self.frame_count = 0
+
+        self.current_frame = 0
+        self.dropped_frames = 0
+
+        self._start_frame = 0
+        self._elapsed = qtc.QElapsedTimer()
+        self._shown = deque()
+
+        self._timer = qtc.QTimer(self)
+        self._timer.setTimerType(qtc.Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+    def set_video(self, fps, frame_count):
+        self.stop()
+        self.fps = fps if fps and fps > 0 else DEFAULT_FPS
+        self.frame_count = frame_count
+
+    def is_running(self):
+        return self._timer.isActive()
+
+    def start(self, from_frame):
+        self.current_frame = from_frame
+        self.dropped_frames = 0
+        self._shown.clear()
+        self._restart_timing()
+        self._timer.start()
+
+    def stop(self):
+        if self._timer.isActive():
+            self._timer.stop()
+            self.stopped.emit()
+
+    def seek(self, frame):
+        '''
+        Continue playing from frame, e.g. after the user moved the slider during playback.
+        '''
+        self.current_frame = frame
+        if self.is_running():
+            self._restart_timing()
+
+    def set_rate(self, rate):
+        self.rate = rate
+        if self.is_running():
+            self._restart_timing()
+
+    def achieved_fps(self):
+        if len(self._shown) < 2:
+            return 0.0
+        return (len(self._shown) - 1) / (self._shown[-1] - self._shown[0])
+
+    def _restart_timing(self):
+        self._start_frame = self.current_frame
+        self._elapsed.start()
+        #tick twice per frame interval so a due frame is never more than half a frame late
+        self._timer.setInterval(max(int(1000 / (self.fps * self.rate) / 2), 1))
+
+    def _tick(self):
+        due = self._start_frame + int(self._elapsed.elapsed() / 1000 * self.fps * self.rate)
+        due = min(due, self.frame_count - 1)
+        if due <= self.current_frame:
+            if self.current_frame >= self.frame_count - 1:
+                self.stop()
+            return
+
+        self.dropped_frames += due - self.current_frame - 1
+        self.current_frame = due
+        self.frameDue.emit(due)
+
+        now = time.perf_counter()
+        self._shown.append(now)
+        while now - self._shown[0] > FPS_WINDOW_SECONDS:
+            self._shown.popleft()
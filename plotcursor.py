@@ -0,0 +1,65 @@
+'''
+Current-frame cursor for the data plots, drawn with matplotlib blitting. The rendered plots are
+cached without the cursor each time the canvas draws; moving the cursor restores that cached
+background and draws only the cursor lines on top of it, so a cursor update costs the same no
+matter how many series are plotted.
+'''
+import profiling
+
+class BlitCursor:
+    '''
+    One persistent vertical line per axes, kept at the same x position on all of them.
+    '''
+    def __init__(self, canvas, axes, **line_kwargs):
+        self.canvas = canvas
+        self.axes = axes
+        self.line_kwargs = line_kwargs
+        self.position = 0
+        self.visible = False
+        self.lines = []
+        self.background = None
+
+        canvas.mpl_connect('draw_event', self.on_draw)
+        self.reset()
+
+    def reset(self):
+        '''
+        Create the cursor lines again, needed after the axes have been cleared.
+        '''
+        for line in self.lines:
+            if line.axes is not None:
+                line.remove()
+        #animated lines are left out of normal draws and hence out of the cached background
+        self.lines = [ax.axvline(x=self.position, animated=True, visible=self.visible, **self.line_kwargs)
+                      for ax in self.axes]
+
+    def is_cursor(self, line):
+        return any(line is cursor_line for cursor_line in self.lines)
+
+    def set_visible(self, visible):
+        self.visible = visible
+        for line in self.lines:
+            line.set_visible(visible)
+        self.canvas.draw_idle()
+
+    @profiling.probe("cursor")
+    def set_position(self, position):
+        self.position = position
+        for line in self.lines:
+            line.set_xdata([position, position])
+
+        if self.background is None:
+            #nothing cached yet, the next full draw will include the cursor
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_lines()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def draw_lines(self):
+        for ax, line in zip(self.axes, self.lines):
+            ax.draw_artist(line)
+
+    def on_draw(self, _event):
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.draw_lines()
@@ -0,0 +1,146 @@
+'''
+On-disk cache of converted pose files, so an Excel or CSV export is parsed only once. The parsed
+float32 array is saved as .npy next to a small json file with the body part names, in the "pose"
+cache directory. Entries are keyed by the source's path, size and modification time plus a hash of
+its first and last bytes, and later opens memory-map the saved array instead of parsing the file
+again. The least recently used entries are deleted once the cache grows past its quota.
+
+Run as a script to convert every pose file of a directory ahead of time:
+
+    python posecache.py <directory> [--quota-mb N]
+'''
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+import diskcache
+import perflog
+import posefile
+from posedata import PoseData
+
+CACHE_NAME = "pose"
+
+#default total disk space used by converted pose files
+DEFAULT_QUOTA_BYTES = 2 * 1024 * 1024 * 1024
+
+#bytes hashed from each end of a file, enough to see a rewrite the size and time do not show
+HASH_SAMPLE_BYTES = 1024 * 1024
+
+VALUES_NAME = "values.npy"
+META_NAME = "meta.json"
+
+def content_hash(path):
+    '''
+    Hash of the size and the first and last HASH_SAMPLE_BYTES of a file.
+    '''
+    digest = hashlib.sha1()
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        digest.update(file.read(HASH_SAMPLE_BYTES))
+        if size > HASH_SAMPLE_BYTES:
+            file.seek(max(size - HASH_SAMPLE_BYTES, HASH_SAMPLE_BYTES))
+            digest.update(file.read())
+    digest.update(str(size).encode())
+    return digest.hexdigest()
+
+def entry_path(path):
+    return os.path.join(diskcache.cache_dir(CACHE_NAME), diskcache.file_key(path, content_hash(path)))
+
+def read_entry(entry):
+    '''
+    PoseData of a cache entry with its values memory-mapped, or None if the entry is missing or damaged.
+    '''
+    try:
+        with open(os.path.join(entry, META_NAME)) as file:
+            meta = json.load(file)
+        values = np.load(os.path.join(entry, VALUES_NAME), mmap_mode='r')
+        pose = PoseData(values, meta["bodyparts"])
+    except (OSError, ValueError, KeyError):
+        return None
+    diskcache.touch(entry)
+    return pose
+
+def write_entry(entry, pose: PoseData, source):
+    #written to a temporary directory first so a crash never leaves a half written entry behind
+    partial = entry + ".partial-{}".format(os.getpid())
+    os.makedirs(partial, exist_ok=True)
+    try:
+        np.save(os.path.join(partial, VALUES_NAME), np.ascontiguousarray(pose.values))
+        with open(os.path.join(partial, META_NAME), 'w') as file:
+            json.dump({"bodyparts": pose.bodyparts, "source": os.path.abspath(source)}, file)
+        os.replace(partial, entry)
+    finally:
+        shutil.rmtree(partial, ignore_errors=True)
+
+def load(path, quota=DEFAULT_QUOTA_BYTES, progress=None) -> PoseData:
+    '''
+    Read a pose file through the cache: memory-mapped from its entry if it was converted before,
+    otherwise parsed with posefile.read_pose (reporting to progress) and stored. Problems with the
+    cache itself never keep the file from opening, it is then just parsed.
+    '''
+    with perflog.timed("load", os.path.basename(path)) as timing:
+        pose = load_entry(path, quota, progress, timing.fields)
+    return pose
+
+def load_entry(path, quota, progress, fields):
+    #fields of the load record: whether the cache had the file
+    fields["cached"] = False
+    try:
+        entry = entry_path(path)
+    except OSError:
+        return posefile.read_pose(path, progress)
+
+    pose = read_entry(entry)
+    if pose is not None:
+        fields["cached"] = True
+        return pose
+
+    pose = posefile.read_pose(path, progress)
+    if pose.nbytes > quota:
+        return pose
+    try:
+        directory = os.path.dirname(entry)
+        #make room before the new entry is written
+        diskcache.enforce_quota(directory, quota - pose.nbytes)
+        shutil.rmtree(entry, ignore_errors=True)
+        write_entry(entry, pose, path)
+    except OSError:
+        return pose
+    return read_entry(entry) or pose
+
+def pose_files(directory):
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in posefile.SUPPORTED_EXTENSIONS:
+                yield os.path.join(dirpath, filename)
+
+def warm(directory, quota=DEFAULT_QUOTA_BYTES, log=print):
+    '''
+    Convert every pose file under directory into the cache. Returns the number of files converted;
+    files that cannot be read are reported through log and skipped.
+    '''
+    converted = 0
+    for path in pose_files(directory):
+        try:
+            pose = load(path, quota)
+        except Exception as e:
+            log("skipped {}: {}".format(path, e))
+            continue
+        log("cached {} ({} frames, {} body parts)".format(path, len(pose), len(pose.bodyparts)))
+        converted += 1
+    return converted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the DeepLabCut pose files of a directory into the display's cache.")
+    parser.add_argument("directory")
+    parser.add_argument("--quota-mb", type=int, default=DEFAULT_QUOTA_BYTES // (1024 * 1024),
+                        help="total size of the cache in MiB")
+    args = parser.parse_args()
+    if not os.path.isdir(args.directory):
+        sys.exit("Not a directory: " + args.directory)
+    warm(args.directory, args.quota_mb * 1024 * 1024)
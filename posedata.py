@@ -0,0 +1,103 @@
+'''
+Compact in-memory form of a DeepLabCut prediction file. All coordinates live in one contiguous
+float32 array of shape (frames, bodyparts, 3), the last axis holding x, y and likelihood, and body
+parts are looked up by name through an index map. Accessors return views into that array, so
+slicing a landmark or coordinate copies nothing. pandas is only imported by the DataFrame
+conversions, so holding pose data does not load it.
+'''
+import numpy as np
+
+COORDS = ("x", "y", "likelihood")
+X, Y, LIKELIHOOD = 0, 1, 2
+
+class PoseData:
+    def __init__(self, values: np.ndarray, bodyparts):
+        if values.ndim != 3 or values.shape[1] != len(bodyparts) or values.shape[2] != len(COORDS):
+            raise ValueError("Pose values must have shape (frames, {}, 3)".format(len(bodyparts)))
+        self.values = values
+        self.bodyparts = list(bodyparts)
+        self.bodypart_index = {name: i for i, name in enumerate(self.bodyparts)}
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def num_frames(self):
+        return self.values.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def __contains__(self, bodypart):
+        return bodypart in self.bodypart_index
+
+    def coord(self, bodypart, coord):
+        '''
+        View of one coordinate ("x", "y" or "likelihood", or its index) of a body part over all frames.
+        '''
+        if isinstance(coord, str):
+            coord = COORDS.index(coord)
+        return self.values[:, self.bodypart_index[bodypart], coord]
+
+    def x(self, bodypart):
+        return self.values[:, self.bodypart_index[bodypart], X]
+
+    def y(self, bodypart):
+        return self.values[:, self.bodypart_index[bodypart], Y]
+
+    def likelihood(self, bodypart):
+        return self.values[:, self.bodypart_index[bodypart], LIKELIHOOD]
+
+    def xy(self, bodypart):
+        '''
+        View of shape (frames, 2) with the x and y coordinates of a body part.
+        '''
+        return self.values[:, self.bodypart_index[bodypart], :LIKELIHOOD]
+
+    @property
+    def likelihoods(self):
+        '''
+        View of shape (frames, bodyparts) with the likelihood of every body part.
+        '''
+        return self.values[:, :, LIKELIHOOD]
+
+    def below(self, threshold):
+        '''
+        Boolean (frames, bodyparts) array of the points whose likelihood is below threshold, a number
+        or one per body part, from one broadcast comparison over all body parts.
+        '''
+        return self.likelihoods < np.asarray(threshold, dtype=self.values.dtype)
+
+    @classmethod
+    def from_dataframe(cls, data_frame: "pd.DataFrame"):
+        '''
+        Build from a wide DataFrame with "<bodypart>_<coord>" columns (the layout the display used to keep).
+        '''
+        import pandas as pd
+        bodyparts = []
+        for col in data_frame.columns:
+            bodypart, coord = str(col).rsplit('_', 1)
+            if coord in COORDS and bodypart not in bodyparts:
+                bodyparts.append(bodypart)
+
+        values = np.full((len(data_frame.index), len(bodyparts), len(COORDS)), np.nan, dtype=np.float32)
+        for i, bodypart in enumerate(bodyparts):
+            for j, coord in enumerate(COORDS):
+                column = bodypart + "_" + coord
+                if column in data_frame.columns:
+                    values[:, i, j] = pd.to_numeric(data_frame[column], errors='coerce').to_numpy()
+        return cls(values, bodyparts)
+
+    def to_dataframe(self, threshold=None):
+        '''
+        Wide DataFrame with "<bodypart>_<coord>" columns. With a threshold, x and y of points whose
+        likelihood is below it are NaN.
+        '''
+        import pandas as pd
+        values = self.values
+        if threshold is not None:
+            values = values.copy()
+            values[:, :, :LIKELIHOOD][self.below(threshold)] = np.nan
+        columns = [bodypart + "_" + coord for bodypart in self.bodyparts for coord in COORDS]
+        return pd.DataFrame(values.reshape(len(self), -1), columns=columns)
@@ -0,0 +1,142 @@
+'''
+Reading DeepLabCut prediction files into PoseData. The multi-row DLC header (scorer, optionally
+individuals, bodyparts and coords) is parsed on its own, and the numeric rows below it are read in
+one pass straight into float32, without first building a table of strings. Excel exports go through
+the same header parsing, and the native .h5 output of DeepLabCut is read without any text at all.
+pandas does the parsing and is imported by the readers, so importing this module stays cheap.
+'''
+import csv
+import os
+
+import numpy as np
+
+import perflog
+from posedata import PoseData, COORDS
+
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx", ".h5")
+FILE_FILTER = "Pose data (*.csv *.xlsx *.h5);;All files (*)"
+
+#rows parsed between two progress reports of read_csv
+PROGRESS_CHUNK_ROWS = 20000
+
+def read_pose(path, progress=None) -> PoseData:
+    '''
+    Read a DLC .csv, .xlsx or .h5 file, chosen by its extension. progress(done, total) is called
+    with the bytes read so far while a CSV is parsed; the other formats are read in one call.
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    readers = {".csv": lambda: read_csv(path, progress), ".xlsx": lambda: read_excel(path), ".h5": lambda: read_hdf(path)}
+    if extension not in readers:
+        raise ValueError("Unsupported file type. Only CSV, Excel and DLC .h5 files are allowed.")
+    with perflog.timed("parse", os.path.basename(path), bytes=os.path.getsize(path)) as timing:
+        pose = readers[extension]()
+        timing.fields.update(frames=len(pose), bodyparts=len(pose.bodyparts))
+    return pose
+
+def header_rows(rows):
+    '''
+    Take the DLC header from the first rows of a file. Returns the number of header rows and the
+    (individual, bodypart, coord) labels of every column; individual is None for single animal files.
+    '''
+    names = [str(row[0]).strip() for row in rows]
+    if "coords" not in names:
+        raise ValueError("Not a DeepLabCut file: no 'coords' header row found.")
+    n_rows = names.index("coords") + 1
+    header = {names[i]: [str(cell).strip() for cell in rows[i]] for i in range(n_rows)}
+    if "bodyparts" not in header:
+        raise ValueError("Not a DeepLabCut file: no 'bodyparts' header row found.")
+
+    individuals = header.get("individuals", [None] * len(header["coords"]))
+    labels = list(zip(individuals, header["bodyparts"], header["coords"]))
+    return n_rows, labels
+
+def column_layout(labels):
+    '''
+    Work out which columns hold which body part and coordinate. Returns the body part names and an
+    int array of shape (bodyparts, 3) with the column of each x, y and likelihood (-1 if missing).
+    Columns that are not coordinates (like the frame index) are left out.
+    '''
+    bodyparts = []
+    columns = {}
+    for column, (individual, bodypart, coord) in enumerate(labels):
+        if coord not in COORDS:
+            continue
+        #multi animal files repeat the body parts for every individual
+        name = bodypart if individual is None else individual + "_" + bodypart
+        if name not in columns:
+            bodyparts.append(name)
+            columns[name] = [-1] * len(COORDS)
+        columns[name][COORDS.index(coord)] = column
+
+    layout = np.array([columns[name] for name in bodyparts], dtype=np.intp).reshape(-1, len(COORDS))
+    return bodyparts, layout
+
+def gather(table: np.ndarray, layout: np.ndarray) -> np.ndarray:
+    '''
+    Rearrange a (frames, columns) table into a contiguous (frames, bodyparts, 3) float32 array.
+    '''
+    values = np.take(table, layout.clip(0), axis=1).astype(np.float32, copy=False)
+    values[:, layout < 0] = np.nan
+    return np.ascontiguousarray(values)
+
+def read_csv(path, progress=None) -> PoseData:
+    with open(path, newline='') as file:
+        reader = csv.reader(file)
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if (row and row[0].strip() == "coords") or len(rows) > 4:
+                break
+    n_rows, labels = header_rows(rows)
+    bodyparts, layout = column_layout(labels)
+
+    #only the coordinate columns, parsed by the C reader directly as float32
+    import pandas as pd
+    usecols = np.unique(layout[layout >= 0])
+    if progress is None:
+        table = pd.read_csv(path, skiprows=n_rows, header=None, usecols=usecols,
+                            dtype=np.float32, engine='c').to_numpy()
+    else:
+        #in chunks, reporting how far into the file the parser is after each one
+        size = os.path.getsize(path)
+        with open(path, 'rb') as file:
+            chunks = []
+            for chunk in pd.read_csv(file, skiprows=n_rows, header=None, usecols=usecols, dtype=np.float32,
+                                     engine='c', chunksize=PROGRESS_CHUNK_ROWS):
+                chunks.append(chunk.to_numpy())
+                progress(min(file.tell(), size), size)
+        table = np.concatenate(chunks) if chunks else np.empty((0, len(usecols)), dtype=np.float32)
+    layout = np.where(layout >= 0, np.searchsorted(usecols, layout), -1)
+    return PoseData(gather(table, layout), bodyparts)
+
+def read_excel(path) -> PoseData:
+    import pandas as pd
+    sheet = pd.read_excel(path, header=None)
+    rows = sheet.iloc[:5].fillna("").to_numpy().tolist()
+    n_rows, labels = header_rows(rows)
+    bodyparts, layout = column_layout(labels)
+
+    block = sheet.iloc[n_rows:]
+    try:
+        table = block.to_numpy(dtype=np.float32)
+    except ValueError:
+        #text in the data cells, fall back to converting column by column
+        table = block.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float32)
+    return PoseData(gather(table, layout), bodyparts)
+
+def read_hdf(path) -> PoseData:
+    #needs the optional pytables package, pandas raises an ImportError naming it when missing
+    import pandas as pd
+    frame = pd.read_hdf(path)
+    names = list(frame.columns.names)
+    if not isinstance(frame.columns, pd.MultiIndex) or "coords" not in names or "bodyparts" not in names:
+        raise ValueError("Not a DeepLabCut .h5 file: expected bodyparts and coords column levels.")
+
+    coords = frame.columns.get_level_values("coords")
+    bodyparts = frame.columns.get_level_values("bodyparts")
+    if "individuals" in names:
+        individuals = frame.columns.get_level_values("individuals")
+    else:
+        individuals = [None] * len(coords)
+    bodyparts, layout = column_layout(zip(individuals, bodyparts, coords))
+    return PoseData(gather(frame.to_numpy(), layout), bodyparts)
@@ -0,0 +1,139 @@
+'''
+Following a DLC CSV while inference is still writing it. CsvTail parses the header once and after
+that only the complete rows appended since the previous read, and GrowableArray keeps the rows read
+so far in a buffer that doubles its capacity when full, so each append costs O(new rows) amortized.
+TailReader polls the file on a worker thread and hands the new rows to the GUI thread by signal.
+pandas is imported by the first read, not with the module.
+'''
+import io
+import os
+import threading
+
+import numpy as np
+import PyQt5.QtCore as qtc
+
+import posefile
+from posedata import PoseData
+
+#how often a followed file is checked for new rows
+POLL_INTERVAL_MS = 500
+
+class GrowableArray:
+    '''
+    Array that grows along its first axis. data is a view of the rows appended so far; it is only
+    valid until the next append, which may move the rows to a larger buffer.
+    '''
+    def __init__(self, row_shape=(), dtype=np.float32, capacity=1024):
+        self.buffer = np.empty((max(capacity, 1),) + tuple(row_shape), dtype=dtype)
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def data(self):
+        return self.buffer[:self.length]
+
+    def append(self, rows):
+        '''
+        Append rows and return True if the buffer had to be moved (old views of data are stale).
+        '''
+        needed = self.length + len(rows)
+        moved = needed > len(self.buffer)
+        if moved:
+            capacity = len(self.buffer)
+            while capacity < needed:
+                capacity *= 2
+            buffer = np.empty((capacity,) + self.buffer.shape[1:], dtype=self.buffer.dtype)
+            buffer[:self.length] = self.buffer[:self.length]
+            self.buffer = buffer
+        self.buffer[self.length:needed] = rows
+        self.length = needed
+        return moved
+
+    def truncate(self, length):
+        '''
+        Drop the rows from length on; the next append writes over them.
+        '''
+        self.length = min(length, self.length)
+
+    def clear(self):
+        self.length = 0
+
+class CsvTail:
+    '''
+    Incremental reader of a DLC CSV. read_new returns the (rows, bodyparts, 3) float32 array of the
+    complete rows written since the last call; a row still being written is left for the next call.
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            lines = [file.readline() for _ in range(5)]
+        rows = [line.decode().rstrip('\r\n').split(',') for line in lines]
+        n_rows, labels = posefile.header_rows(rows)
+        self.bodyparts, layout = posefile.column_layout(labels)
+
+        self.usecols = np.unique(layout[layout >= 0])
+        self.layout = np.where(layout >= 0, np.searchsorted(self.usecols, layout), -1)
+        self.data_start = sum(len(line) for line in lines[:n_rows])
+        self.offset = self.data_start
+
+    def empty_pose(self):
+        return PoseData(np.empty((0, len(self.bodyparts), 3), dtype=np.float32), self.bodyparts)
+
+    def truncated(self):
+        '''
+        True if the file is now shorter than what was already read (e.g. inference restarted).
+        '''
+        return os.path.getsize(self.path) < self.offset
+
+    def restart(self):
+        self.offset = self.data_start
+
+    def read_new(self):
+        with open(self.path, 'rb') as file:
+            file.seek(self.offset)
+            chunk = file.read()
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return np.empty((0, len(self.bodyparts), 3), dtype=np.float32)
+        self.offset += end
+
+        import pandas as pd
+        table = pd.read_csv(io.BytesIO(chunk[:end]), header=None, usecols=self.usecols,
+                            dtype=np.float32, engine='c').to_numpy()
+        return posefile.gather(table, self.layout)
+
+class TailReader(qtc.QThread):
+    '''
+    Polls a CsvTail on its own thread. rowsRead carries each non-empty batch of new rows, restarted
+    is emitted before the file is read again from the top after it was truncated, and failed
+    carries the message of an error that ended following.
+    '''
+    rowsRead = qtc.pyqtSignal(object)
+    restarted = qtc.pyqtSignal()
+    failed = qtc.pyqtSignal(str)
+
+    def __init__(self, tail: CsvTail, interval_ms=POLL_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.tail = tail
+        self.interval = interval_ms / 1000
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+        self.wait()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                if self.tail.truncated():
+                    self.tail.restart()
+                    self.restarted.emit()
+                rows = self.tail.read_new()
+            except Exception as e:
+                self.failed.emit(str(e))
+                return
+            if len(rows):
+                self.rowsRead.emit(rows)
+            self._stopped.wait(self.interval)
@@ -0,0 +1,179 @@
+'''
+Lightweight latency probes for the interactive hot paths (seeking the video, resizing, replotting,
+moving the cursor, calculating). A probe keeps the durations of its last WINDOW calls in a ring
+buffer, enough for rolling p50/p95/p99 figures; recording a call costs two clock reads and an
+append, so the probes stay on all the time. ProfileCapture additionally runs cProfile over a
+window of the session and dumps the statistics to a file. cProfile only sees the thread that
+enables it, so the work done off the GUI thread (background tasks, gait computations, frame
+read-ahead and proxy building) runs inside worker(), which profiles it into the capture too.
+'''
+import collections
+import functools
+import io
+import threading
+import time
+
+import numpy as np
+
+#calls kept per probe for the rolling percentiles
+WINDOW = 1000
+
+PERCENTILES = (50, 95, 99)
+
+_samples = {}
+_counts = collections.Counter()
+_lock = threading.Lock()
+
+#the ProfileCapture running, if any
+_capture = None
+
+def record(name, seconds):
+    with _lock:
+        samples = _samples.get(name)
+        if samples is None:
+            samples = _samples[name] = collections.deque(maxlen=WINDOW)
+        samples.append(seconds * 1000)
+        _counts[name] += 1
+
+def probe(name):
+    '''
+    Decorator recording every call of the function under name.
+    '''
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def latency(name):
+    '''
+    Total number of calls, and the percentiles and maximum (ms) of the last WINDOW calls, of one
+    probe; None if it has not been called.
+    '''
+    with _lock:
+        if name not in _samples:
+            return None
+        samples = np.array(_samples[name])
+        count = _counts[name]
+    values = np.percentile(samples, PERCENTILES)
+    result = {"count": count, "max": float(samples.max())}
+    result.update(("p{}".format(p), float(v)) for p, v in zip(PERCENTILES, values))
+    return result
+
+def latencies():
+    with _lock:
+        names = sorted(_samples)
+    return {name: latency(name) for name in names}
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
+
+class worker:
+    '''
+    Context manager around work done off the GUI thread. While a capture is running the block is
+    profiled into that capture, with one profile per thread; otherwise it costs one check.
+    '''
+    __slots__ = ("capture", "profile")
+
+    def __enter__(self):
+        self.profile = None
+        capture = _capture
+        ident = threading.get_ident()
+        if capture is None or ident == capture.thread:
+            return self
+        with _lock:
+            if capture.profile is None:
+                return self
+            profile = capture.threads.get(ident)
+            if profile is None:
+                profile = capture.threads[ident] = capture.profile_class()
+            capture.busy.add(ident)
+        try:
+            profile.enable()
+        except ValueError:
+            #Python 3.12 and later: the capture's profiler already sees every thread
+            with _lock:
+                capture.busy.discard(ident)
+            return self
+        self.capture = capture
+        self.profile = profile
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profile is not None:
+            self.profile.disable()
+            with _lock:
+                self.capture.busy.discard(threading.get_ident())
+        return False
+
+class ProfileCapture:
+    '''
+    cProfile over a window of the session: the thread that starts it (the GUI thread, where the
+    probed paths run) and every worker() block run on other threads meanwhile. A block still
+    running when the capture stops is left out.
+    '''
+    def __init__(self):
+        self.profile = None
+        self.started = None
+        self.thread = None
+        self.threads = {}
+        self.busy = set()
+
+    @property
+    def running(self):
+        return self.profile is not None
+
+    def start(self):
+        global _capture
+        import cProfile
+        self.profile_class = cProfile.Profile
+        self.threads = {}
+        self.busy = set()
+        self.thread = threading.get_ident()
+        self.started = time.perf_counter()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        _capture = self
+
+    def finish(self):
+        '''
+        Stop profiling and return the profiles of the worker threads that are not inside a block.
+        '''
+        global _capture
+        _capture = None
+        self.profile.disable()
+        with _lock:
+            profile, self.profile = self.profile, None
+            workers = [p for ident, p in self.threads.items() if ident not in self.busy]
+            self.threads = {}
+        return profile, workers
+
+    def cancel(self):
+        self.finish()
+
+    def stop(self, path, top=40):
+        '''
+        Stop and dump the statistics of all threads to path (for pstats or snakeviz) and a
+        readable summary of the top functions by cumulative time to path + ".txt". Returns the
+        seconds captured.
+        '''
+        import pstats
+        profile, workers = self.finish()
+        seconds = time.perf_counter() - self.started
+        text = io.StringIO()
+        stats = pstats.Stats(profile, stream=text)
+        for worker_profile in workers:
+            stats.add(worker_profile)
+        stats.dump_stats(path)
+        text.write("GUI thread and {} worker threads\n".format(len(workers)))
+        stats.sort_stats("cumulative").print_stats(top)
+        with open(path + ".txt", 'w') as file:
+            file.write(text.getvalue())
+        return seconds
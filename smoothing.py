@@ -0,0 +1,74 @@
+'''
+Zero-phase low-pass smoothing of pose data. Butterworth designs are kept in second-order sections
+(stable at high orders, unlike the (b, a) form) and designed once per (order, cutoff, fps). Arrays
+are filtered along the frame axis with all other axes at once. NaN gaps, e.g. points masked by
+their likelihood, are not bridged: every contiguous run of valid frames is filtered on its own, and
+runs that share the same frames in several columns are filtered together.
+'''
+import functools
+
+import numpy as np
+from scipy.signal import butter, sosfiltfilt
+
+from posedata import PoseData, LIKELIHOOD
+
+@functools.lru_cache(maxsize=None)
+def lowpass(order, cutoff, fps):
+    '''
+    Butterworth low-pass filter of the given order in second-order sections. cutoff is in Hz
+    (cycles per frame for fps=1).
+    '''
+    return butter(order, cutoff, btype='low', output='sos', fs=fps)
+
+def default_padlen(sos):
+    #the padding sosfiltfilt uses by default
+    return 3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum()))
+
+def valid_runs(valid):
+    '''
+    (start, stop) of every run of True values of a 1-D boolean array.
+    '''
+    edges = np.diff(np.concatenate(([0], valid.astype(np.int8), [0])))
+    return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+
+def smooth(values, cutoff, fps, order=4):
+    '''
+    Zero-phase low-pass filter values (frames first, any other shape) with cutoff in Hz at fps
+    frames per second. Returns a new float array; NaN stays NaN. Runs of valid frames shorter
+    than the filter can handle are left as they are.
+    '''
+    values = np.asarray(values)
+    if not np.issubdtype(values.dtype, np.floating):
+        values = values.astype(float)
+    sos = lowpass(order, cutoff, fps)
+    padlen = default_padlen(sos)
+
+    columns = values.reshape(len(values), -1)
+    valid = ~np.isnan(columns)
+    if valid.all():
+        if len(values) <= padlen:
+            return values.copy()
+        return sosfiltfilt(sos, values, axis=0).astype(values.dtype, copy=False)
+
+    result = columns.copy()
+    complete = valid.all(axis=0)
+    if complete.any() and len(values) > padlen:
+        result[:, complete] = sosfiltfilt(sos, columns[:, complete], axis=0)
+
+    #columns with gaps: group the columns by run so each distinct run is filtered once
+    runs = {}
+    for column in np.flatnonzero(~complete):
+        for start, stop in valid_runs(valid[:, column]):
+            if stop - start > padlen:
+                runs.setdefault((start, stop), []).append(column)
+    for (start, stop), run_columns in runs.items():
+        result[start:stop, run_columns] = sosfiltfilt(sos, columns[start:stop, run_columns], axis=0)
+    return result.reshape(values.shape)
+
+def smooth_pose(pose: PoseData, cutoff, fps, order=4) -> PoseData:
+    '''
+    PoseData with the x and y of every body part smoothed and the likelihoods unchanged.
+    '''
+    values = pose.values.copy()
+    values[:, :, :LIKELIHOOD] = smooth(pose.values[:, :, :LIKELIHOOD], cutoff, fps, order)
+    return PoseData(values, pose.bodyparts)
@@ -0,0 +1,84 @@
+'''
+Stride and duty factor detection for several limbs at once. The horizontal hock (or knee) position
+of every limb is one column of a (frames, limbs) array; all columns are low-pass filtered together
+by smoothing.smooth, and footstrikes, toe-offs and duty factors are found with array operations
+over all limbs. The result is one tidy table with a row per stride.
+'''
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+import smoothing
+
+#limb -> landmark whose horizontal movement marks its strides
+LIMBS = {"Right Hind": "Right Hock", "Left Hind": "Left Hock", "Right Fore": "Right Knee", "Left Fore": "Left Knee"}
+
+#8th order Butterworth at 0.05 cycles/frame, the design the stride reference script used (MATLAB half power frequency)
+FILTER_ORDER = 8
+CUTOFF = 0.05
+
+#toe-offs are moved to this many frames past the rising crossing when the limb is still in swing there
+TOEOFF_DELAY = 10
+
+STRIDE_COLUMNS = ["Limb", "Stride Start", "Stride End", "Stride Length", "Duty Factor"]
+
+def crossings(gradient, threshold):
+    '''
+    Frames where each column falls below (footstrikes) and rises to (toe-offs) its threshold, as
+    boolean (frames - 1, limbs) arrays. NaN is neither above nor below, no crossing is found next to it.
+    '''
+    above = gradient >= threshold
+    known = ~np.isnan(gradient)
+    known = known[:-1] & known[1:]
+    return above[:-1] & ~above[1:] & known, ~above[:-1] & above[1:] & known
+
+def detect_strides(hock_x, limbs, order=FILTER_ORDER, cutoff=CUTOFF):
+    '''
+    Strides of every limb from a (frames, limbs) array of horizontal positions. Returns a DataFrame
+    with STRIDE_COLUMNS. A stride runs from one footstrike to the next; its duty factor is the
+    fraction of it before the first toe-off (NaN if there is none inside the stride). Strides with
+    a NaN position (an unrepaired gap) in them are left out.
+    '''
+    hock_x = np.asarray(hock_x, dtype=float).reshape(len(hock_x), -1)
+    frames = len(hock_x)
+    #cutoff is in cycles/frame, i.e. Hz at 1 frame per second
+    gradient = np.gradient(smoothing.smooth(hock_x, cutoff, fps=1, order=order), axis=0)
+
+    #peaks of the gradient are the middle of the swing, the swing/stance threshold is a quarter of their median
+    threshold = np.full(len(limbs), np.nan)
+    for limb in range(len(limbs)):
+        peaks, _ = find_peaks(np.abs(gradient[:, limb]), prominence=1, distance=25)
+        if len(peaks):
+            threshold[limb] = 0.25 * np.median(gradient[peaks, limb])
+    footstrike, toeoff = crossings(gradient, threshold)
+
+    #a toe-off counts from TOEOFF_DELAY frames on if the limb is still above the threshold there
+    delayed = np.zeros_like(toeoff)
+    delayed[:frames - 1 - TOEOFF_DELAY] = toeoff[:frames - 1 - TOEOFF_DELAY] & \
+        (gradient[TOEOFF_DELAY:frames - 1] > threshold)
+    use_delayed = delayed.any(axis=0)
+    toeoff = np.where(use_delayed, np.roll(delayed, TOEOFF_DELAY, axis=0), toeoff)
+
+    #one sorted key per event, limb * frames + frame, so all limbs are matched in one searchsorted
+    strike_limb, strike_frame = np.nonzero(footstrike.T)
+    toeoff_limb, toeoff_frame = np.nonzero(toeoff.T)
+    same_limb = strike_limb[1:] == strike_limb[:-1]
+    limb = strike_limb[1:][same_limb]
+    start = strike_frame[:-1][same_limb]
+    end = strike_frame[1:][same_limb]
+
+    toeoff_key = toeoff_limb * frames + toeoff_frame
+    first = np.searchsorted(toeoff_key, limb * frames + start, side='right')
+    found = first < len(toeoff_key)
+    stance_end = np.where(found, toeoff_key[np.minimum(first, len(toeoff_key) - 1)] - limb * frames, end)
+    inside = found & (stance_end < end)
+    dutyfactor = np.where(inside, (stance_end - start) / (end - start), np.nan)
+
+    #NaN frames of every limb up to each frame, a stride is kept if none fall between its footstrikes
+    missing = np.zeros((frames + 1, len(limbs)), dtype=int)
+    np.cumsum(np.isnan(gradient), axis=0, out=missing[1:])
+    complete = missing[end + 1, limb] == missing[start, limb]
+    limb, start, end, dutyfactor = limb[complete], start[complete], end[complete], dutyfactor[complete]
+
+    return pd.DataFrame({"Limb": np.asarray(limbs, dtype=object)[limb], "Stride Start": start, "Stride End": end,
+                         "Stride Length": end - start, "Duty Factor": dutyfactor}, columns=STRIDE_COLUMNS)
@@ -1,12 +1,14 @@
 '''
 Reference File for the stride length and duty factor calculations. Runs as a standalone script, where a DLC excel file is given as a command line argument. Includes matplotlib plots for understanding.
 '''
-import pandas as pd
 import matplotlib.pyplot as plt
-from scipy.signal import butter, filtfilt, find_peaks
+from scipy.signal import find_peaks
 import numpy as np
 import sys
 
+import posefile
+import smoothing
+
 if __name__ == "__main__":
     # Check if the file name is provided as a command-line argument
     if len(sys.argv) != 2:
@@ -14,29 +16,15 @@ if __name__ == "__main__":
     else:
         # Get the Excel file name from the command line
         excel_file_name = sys.argv[1]
-        data_frame = pd.read_excel(excel_file_name)
-        #clean data by combining labels and reindexing
-        bodyparts_labels = data_frame.loc[0]
-        coords_labels = data_frame.loc[1]
-        labels = [i + "_" + j for i, j in zip(bodyparts_labels, coords_labels)]
-        data_frame.columns = labels
-        data_frame = data_frame.iloc[2: , : ]
-        data_frame.index = range(len(data_frame.index))
-        data_frame = data_frame.drop(columns=["bodyparts_coords"])
+        pose = posefile.read_pose(excel_file_name)
+        frames = np.arange(len(pose))
 
         # Design parameters
         filter_order = 8
         cutoff_frequency = 0.05  # Half power frequency in MATLAB
 
-        # Calculate the normalized cutoff frequency for Python
-        nyquist_frequency = 0.5  # Nyquist frequency is 0.5 in normalized frequency
-        cutoff_frequency_python = cutoff_frequency / nyquist_frequency
-
-        # Design Butterworth lowpass filter coefficients
-        b, a = butter(filter_order, cutoff_frequency_python, btype='low', analog=False)
-
-        #filter the right hock x component
-        filtered_data = filtfilt(b, a, data_frame["righthock_x"])
+        #filter the right hock x component, cutoff in cycles/frame (Hz at 1 frame per second)
+        filtered_data = smoothing.smooth(pose.x("righthock"), cutoff_frequency, fps=1, order=filter_order)
 
         #take the gradient of the filtered data
         hockx_gradient = np.gradient(filtered_data)
@@ -90,14 +78,14 @@ if __name__ == "__main__":
         print(dutyfactor)
 
         plt.figure(figsize=(10, 6))
-        #plt.plot(data_frame.index, data_frame["rightHhoof_x"], label='Original Data')
-        #plt.plot(data_frame.index, filtered_data, label=f'Filtered Data (Cutoff Frequency = {cutoff_frequency} Hz)')
-        plt.plot(data_frame.index, hockx_gradient, label="First")
+        #plt.plot(frames, pose.x("rightHhoof"), label='Original Data')
+        #plt.plot(frames, filtered_data, label=f'Filtered Data (Cutoff Frequency = {cutoff_frequency} Hz)')
+        plt.plot(frames, hockx_gradient, label="First")
         plt.plot(peaks, hockx_gradient[peaks], 'rx', label='Detected Peaks')
         plt.axhline(y=threshold, color='r', linestyle='--', label=f'Threshold')
         plt.plot(footstrikes, hockx_gradient[footstrikes], 'bx', label='Toe Strikes')
         plt.plot(toeoffs, hockx_gradient[toeoffs], 'gx', label='Toeoffs')
-        #plt.fill_between(data_frame.index, 0, swing_stance, color='lightgray', alpha=0.5)
+        #plt.fill_between(frames, 0, swing_stance, color='lightgray', alpha=0.5)
         plt.title('Butterworth Lowpass Filtered Signal')
         plt.xlabel('Frame')
         plt.ylabel('Value')
@@ -0,0 +1,140 @@
+'''
+Background tasks for the user interface. Opening a video, parsing a pose file and computing gait
+parameters run on a shared QThreadPool instead of the GUI thread, so the window keeps repainting
+while they work. A task reports its progress, can be cancelled, and hands its result (or error) back
+to the widgets through signals, which Qt delivers on the GUI thread. The pool always has a few
+threads, so a video and a pose file opened together load at the same time even on one core.
+'''
+import logging
+import threading
+
+import PyQt5.QtWidgets as qtw
+import PyQt5.QtCore as qtc
+
+import profiling
+
+logger = logging.getLogger(__name__)
+
+#threads of the pool at least, whatever the number of cores
+MIN_THREADS = 4
+
+#a progress dialog only shows up for tasks running longer than this
+PROGRESS_DELAY_MS = 400
+
+#QProgressDialog counts in a C int, larger totals (bytes of a big file) are shown in this many steps
+PROGRESS_STEPS = 1000
+MAX_PROGRESS = 2 ** 31 - 1
+
+class Cancelled(Exception):
+    '''
+    Raised inside a task (by Task.report or Task.check) once it has been cancelled.
+    '''
+
+class TaskSignals(qtc.QObject):
+    #done, total (total 0 while the amount of work is unknown); 64 bit, files are counted in bytes
+    progress = qtc.pyqtSignal('qint64', 'qint64')
+    finished = qtc.pyqtSignal(object)
+    failed = qtc.pyqtSignal(str)
+    cancelled = qtc.pyqtSignal()
+
+class Task(qtc.QRunnable):
+    '''
+    Runs function(task, *args, **kwargs) on the pool. The function can call task.report(done, total)
+    to publish its progress; both report and check raise Cancelled once cancel() was called, which
+    ends the task at the next report. A function that returns anyway still delivers its result, so
+    whatever it holds (an open video, say) reaches a receiver that can release it.
+    '''
+    def __init__(self, function, *args, **kwargs):
+        super().__init__()
+        #kept alive by the running set of this module, not by the pool
+        self.setAutoDelete(False)
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def report(self, done, total=0):
+        self.check()
+        self.signals.progress.emit(int(done), int(total))
+
+    def run(self):
+        try:
+            with profiling.worker():
+                result = self.function(self, *self.args, **self.kwargs)
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            logger.exception("Background task failed")
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+#tasks started and not yet ended
+_running = set()
+
+def thread_pool():
+    #Qt's global pool, widened so there are always MIN_THREADS threads
+    pool = qtc.QThreadPool.globalInstance()
+    if pool.maxThreadCount() < MIN_THREADS:
+        pool.setMaxThreadCount(MIN_THREADS)
+    return pool
+
+def start(task: Task) -> Task:
+    '''
+    Run a task in the background. Connect to its signals first, a signal emitted before anything
+    is connected to it is lost.
+    '''
+    _running.add(task)
+    for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+        signal.connect(lambda *_: _running.discard(task))
+    thread_pool().start(task)
+    return task
+
+def wait(timeout_ms=-1):
+    '''
+    Block until every started task is done, for tests and shutdown.
+    '''
+    return thread_pool().waitForDone(timeout_ms)
+
+class ProgressDialog(qtw.QProgressDialog):
+    '''
+    Non-modal progress of one task, shown once the task has run for PROGRESS_DELAY_MS. Its cancel
+    button cancels the task and it closes itself when the task ends.
+    '''
+    def __init__(self, task: Task, label, parent=None):
+        super().__init__(label, "Cancel", 0, 0, parent)
+        self.setWindowModality(qtc.Qt.NonModal)
+        self.setMinimumDuration(PROGRESS_DELAY_MS)
+        self.setAutoReset(False)
+        self.setAutoClose(False)
+        self.setValue(0)
+        self.task = task
+        self.canceled.connect(task.cancel)
+        task.signals.progress.connect(self.update_progress)
+        for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+            signal.connect(self.done_task)
+
+    def update_progress(self, done, total):
+        if total > MAX_PROGRESS:
+            done, total = done * PROGRESS_STEPS // total, PROGRESS_STEPS
+        #a range of (0, 0) shows a busy indicator
+        self.setMaximum(total)
+        self.setValue(min(done, total))
+
+    def done_task(self, *_):
+        self.canceled.disconnect(self.task.cancel)
+        #reset also stops the timer that would show the dialog later
+        self.reset()
+        self.close()
+        self.deleteLater()
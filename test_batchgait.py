@@ -0,0 +1,37 @@
+import json
+import os
+import shutil
+import pytest
+
+import batchgait
+import diskcache
+
+LANDMARKS = {"Poll": "poll", "Nostril": "nostril", "Withers": "withers", "Right Hock": "righthock"}
+
+def test_batch_writes_trials_summary_and_error_log(tmp_path, monkeypatch):
+    monkeypatch.setenv(diskcache.CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+    trials = tmp_path / "trials"
+    (trials / "day2").mkdir(parents=True)
+    shutil.copy('test_data/3613data.xlsx', str(trials / "3613.xlsx"))
+    shutil.copy('test_data/3613data.xlsx', str(trials / "day2" / "3613.xlsx"))
+    (trials / "broken.csv").write_text("not,a,dlc,file\n")
+
+    paths = batchgait.find_inputs([str(trials)])
+    assert len(paths) == 3
+    output = str(tmp_path / "results")
+    summary, failures = batchgait.run_batch(paths, LANDMARKS, ["Head Length", "Speed", "Stride Length"],
+                                            output, workers=2, log=lambda message: None)
+
+    assert failures == 1
+    assert "broken.csv" in open(os.path.join(output, batchgait.ERROR_LOG_NAME)).read()
+    assert list(summary["Trial"]) == ["3613", "3613_2"]
+    assert summary["Strides"].tolist() == [2, 2]
+    for name in ["3613_parameters.csv", "3613_strides.csv", "3613_2_parameters.csv", batchgait.SUMMARY_NAME]:
+        assert os.path.exists(os.path.join(output, name))
+
+def test_cli_rejects_unknown_parameters(tmp_path, capsys):
+    landmarks = tmp_path / "landmarks.json"
+    landmarks.write_text(json.dumps(LANDMARKS))
+    with pytest.raises(SystemExit):
+        batchgait.main([str(landmarks), "Head Length,Tail Wag", 'test_data/3613data.xlsx'])
+    assert "Tail Wag" in capsys.readouterr().err
@@ -0,0 +1,42 @@
+import json
+import numpy as np
+
+import benchmark
+import gaitcalc
+import posefile
+
+SMALL = ["--frames", "600", "--video-frames", "12", "--width", "64", "--height", "48", "--repeat", "1"]
+
+def test_synthetic_pose_has_dropouts_and_strides():
+    pose = benchmark.synthetic_pose(1200, dropout=0.05)
+    assert pose.values.shape == (1200, len(gaitcalc.LANDMARKS), 3)
+    assert 0.02 < np.mean(pose.values[:, :, 2] < benchmark.THRESHOLD) < 0.08
+
+    engine = gaitcalc.GaitEngine(pose, benchmark.synthetic_landmarks(len(pose.bodyparts)))
+    table = engine.stride_table()
+    assert set(table["Limb"]) == set(benchmark.LIMB_PHASES)
+    assert abs(table["Stride Length"].median() - benchmark.STRIDE_FRAMES) <= 2
+
+def test_extra_bodyparts_and_csv_round_trip(tmp_path):
+    pose = benchmark.synthetic_pose(50, bodyparts=25, seed=1)
+    assert pose.bodyparts[-1] == "point24"
+    path = str(tmp_path / "pose.csv")
+    benchmark.write_dlc_csv(pose, path)
+    read = posefile.read_pose(path)
+    assert read.bodyparts == pose.bodyparts
+    assert np.allclose(read.values, pose.values, rtol=1e-5)
+
+def test_results_and_comparison(tmp_path):
+    before, after = str(tmp_path / "before.json"), str(tmp_path / "after.json")
+    assert benchmark.main(SMALL + ["-o", before]) == 0
+    with open(before) as file:
+        results = json.load(file)
+    assert list(results["stages"]) == benchmark.STAGES
+    assert results["stages"]["strides"]["strides"] > 0
+    assert all(stage["median_ms"] >= 0 for stage in results["stages"].values())
+
+    assert benchmark.main(SMALL + ["-o", after, "--stages", "masking,retention", "--compare", before,
+                                   "--tolerance", "1000"]) == 0
+    slower = {"stages": {"masking": {"median_ms": results["stages"]["masking"]["median_ms"] * 2}}}
+    (row,) = benchmark.compare(results, slower, tolerance=0.5)
+    assert row[0] == "masking" and row[-1]
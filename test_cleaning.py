@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+import benchmark
+import cleaning
+import posedata
+
+def make_pose(frames=50, bodyparts=("a", "b")):
+    t = np.arange(frames, dtype=np.float32)
+    values = np.empty((frames, len(bodyparts), 3), dtype=np.float32)
+    for i in range(len(bodyparts)):
+        values[:, i, 0] = 2 * t + i
+        values[:, i, 1] = 100 - t
+        values[:, i, 2] = 0.9
+    return posedata.PoseData(values, list(bodyparts))
+
+def test_nothing_to_clean_keeps_pose():
+    pose = make_pose()
+    result = cleaning.clean(pose, threshold=0.5)
+    assert result.pose is pose
+    assert result.masked_frames("a") == 0
+    assert result.repaired_frames("a") == 0
+
+def test_linear_fill_of_short_gap():
+    pose = make_pose()
+    pose.values[10:14, 0, 2] = 0.1
+    result = cleaning.clean(pose, threshold=0.5, max_gap=5)
+
+    #the points are on a line, so linear interpolation gives them back exactly
+    assert np.allclose(result.pose.values[:, :, :2], make_pose().values[:, :, :2])
+    assert np.array_equal(result.pose.likelihoods, pose.likelihoods)
+    assert result.masked_frames("a") == 4
+    assert result.repaired_frames("a") == 4
+    assert result.masked_frames("b") == 0
+    #the raw pose is not changed
+    assert pose.values[10, 0, 0] == 20
+
+def test_long_and_edge_gaps_stay_masked():
+    pose = make_pose()
+    pose.values[10:20, 0, 2] = 0.1
+    pose.values[:3, 1, 2] = 0.1
+    pose.values[-2:, 1, 2] = 0.1
+    result = cleaning.clean(pose, threshold=0.5, max_gap=5)
+
+    assert np.isnan(result.pose.x("a")[10:20]).all()
+    assert not np.isnan(result.pose.x("a")[:10]).any()
+    assert np.isnan(result.pose.y("b")[:3]).all()
+    assert np.isnan(result.pose.y("b")[-2:]).all()
+    assert result.masked_frames("b") == 5
+    assert result.repaired_frames("b") == 0
+
+def test_spike_is_masked_and_repaired():
+    pose = make_pose()
+    pose.values[25, 1, 0] += 300
+    result = cleaning.clean(pose, max_jump=20)
+
+    assert result.masked_frames("b") == 1
+    assert result.repaired_frames("b") == 1
+    assert result.pose.x("b")[25] == pytest.approx(51)
+    #a step that stays (a real jump, not a single frame outlier) is kept
+    pose = make_pose()
+    pose.values[25:, 1, 0] += 300
+    assert cleaning.clean(pose, max_jump=20).masked_frames("b") == 0
+
+def test_cubic_fill_follows_curve():
+    pose = make_pose(100)
+    t = np.arange(100)
+    pose.values[:, 0, 1] = (t / 10.0) ** 2
+    pose.values[40:45, 0, 2] = 0.0
+    result = cleaning.clean(pose, threshold=0.5, method="cubic")
+    assert np.allclose(result.pose.y("a")[40:45], (t[40:45] / 10.0) ** 2, atol=1e-3)
+
+def test_none_only_masks():
+    pose = make_pose()
+    pose.values[10, 0, 2] = 0.1
+    result = cleaning.clean(pose, threshold=0.5, method="none")
+    assert np.isnan(result.pose.x("a")[10])
+    assert result.repaired_frames("a") == 0
+
+def test_unknown_method():
+    pose = make_pose()
+    pose.values[10, 0, 2] = 0.1
+    with pytest.raises(ValueError):
+        cleaning.clean(pose, threshold=0.5, method="quadratic")
+
+def test_threshold_per_bodypart_broadcasts():
+    pose = make_pose(4)
+    pose.values[:, :, 2] = [[0.2, 0.6], [0.5, 0.5], [0.9, 0.1], [0.4, 0.8]]
+    assert pose.below(0.5).tolist() == [[True, False], [False, False], [False, True], [True, False]]
+    assert pose.below([0.3, 0.7]).tolist() == [[True, True], [False, True], [False, True], [False, False]]
+
+def test_retention_matches_counting():
+    pose = make_pose(500, ("a", "b", "c"))
+    rng = np.random.default_rng(1)
+    pose.values[:, :, 2] = rng.random((500, 3))
+    pose.values[:20, 2, 2] = np.nan
+    thresholds = np.linspace(0, 1, 21)
+    curve = cleaning.retention(pose, thresholds)
+
+    expected = np.array([(pose.likelihoods >= np.float32(t)).mean(axis=0) for t in thresholds])
+    assert np.allclose(curve, expected)
+    assert curve[0, 0] == 1
+    assert curve[0, 2] == pytest.approx(480 / 500)
+
+@pytest.mark.parametrize("method", ["linear", "none", "cubic"])
+def test_clean_tail_matches_a_full_clean(method):
+    pose = benchmark.synthetic_pose(300, bodyparts=6, dropout=0.15, seed=3)
+    pose.values[::37, 2, 0] += 200
+    settings = dict(threshold=0.5, max_jump=30, max_gap=5, method=method)
+    full = cleaning.clean(pose, **settings)
+
+    #rows appended in reads of different sizes, each cleaned with the end of the rows before it
+    values = np.empty_like(pose.values[:, :, :2])
+    masked = np.zeros(pose.values.shape[:2], dtype=bool)
+    start = 0
+    for stop in [1, 4, 50, 51, 58, 120, 200, 263, 300]:
+        first, result = cleaning.clean_tail(posedata.PoseData(pose.values[:stop], pose.bodyparts), start, **settings)
+        assert first <= start
+        values[first:stop] = result.pose.values[:, :, :2]
+        masked[first:stop] = result.masked_points
+        start = stop
+    assert np.array_equal(values, full.pose.values[:, :, :2], equal_nan=True)
+    assert np.array_equal(masked, full.masked_points)
+
+def test_cleaned_dataframe_marks_repaired_points():
+    pose = make_pose(10)
+    pose.values[4:6, 0, 2] = 0.1
+    df = cleaning.clean(pose, threshold=0.5).to_dataframe()
+    assert list(df.columns[:4]) == ["a_x", "a_y", "a_likelihood", "a_repaired"]
+    assert df["a_repaired"].tolist() == [i in (4, 5) for i in range(10)]
+    assert not df["a_x"].isna().any()
@@ -0,0 +1,31 @@
+import numpy as np
+
+import decimate
+
+def test_short_range_is_full_resolution():
+    y = np.arange(50, dtype=float)
+    frames, values, full_resolution = decimate.minmax_envelope(y, 10, 30, n_bins=100)
+    assert full_resolution
+    assert np.array_equal(frames, np.arange(10, 30))
+    assert np.array_equal(values, y[10:30])
+
+def test_envelope_keeps_spikes_and_dropouts():
+    y = np.sin(np.linspace(0, 20, 100000))
+    y[12345] = 50.0
+    y[67890] = -50.0
+    y[40000:40003] = np.nan
+    frames, values, full_resolution = decimate.minmax_envelope(y, n_bins=500)
+    assert not full_resolution
+    assert len(values) <= 3 * 500
+    assert np.nanmax(values) == 50.0 and np.nanmin(values) == -50.0
+    assert frames[np.nanargmax(values)] == 12345
+    #the dropout is a gap at the right frame
+    assert 40000 in frames[np.isnan(values)]
+    assert np.all(np.diff(frames) >= 0)
+
+def test_all_missing_bins_become_gaps():
+    y = np.ones(10000)
+    y[:5000] = np.nan
+    frames, values, _ = decimate.minmax_envelope(y, n_bins=100)
+    assert np.isnan(values[frames < 5000]).all()
+    assert (values[frames >= 5000] == 1).all()
@@ -0,0 +1,184 @@
+import os
+import time
+import pytest
+import numpy as np
+import cv2
+
+import framesource
+import framestore
+import diskcache
+
+@pytest.fixture
+def video_path(tmp_path):
+    #each frame is a flat grey level that encodes its frame number
+    path = str(tmp_path / "synthetic.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (64, 48))
+    for i in range(40):
+        writer.write(np.full((48, 64, 3), i * 5, np.uint8))
+    writer.release()
+    yield path
+
+def test_frame_cache_respects_budget():
+    frame = np.zeros((10, 10, 3), np.uint8)
+    cache = framesource.FrameCache(max_bytes=3 * frame.nbytes)
+    for i in range(5):
+        cache.put(i, frame.copy())
+    assert len(cache) == 3
+    assert cache.nbytes <= cache.max_bytes
+    assert 0 not in cache and 4 in cache
+
+def test_frame_cache_evicts_least_recently_used():
+    frame = np.zeros((10, 10, 3), np.uint8)
+    cache = framesource.FrameCache(max_bytes=2 * frame.nbytes)
+    cache.put(0, frame.copy())
+    cache.put(1, frame.copy())
+    cache.get(0)
+    cache.put(2, frame.copy())
+    assert 0 in cache and 1 not in cache
+
+def test_frame_source_random_access(video_path):
+    source = framesource.FrameSource(video_path, cache_bytes=4 * 48 * 64 * 3)
+    assert len(source) == 40
+    for index in [0, 1, 2, 33, 7, 39, 8]:
+        assert abs(source.frame(index).mean() - index * 5) < 3
+    assert len(source.cache) == 4
+    with pytest.raises(IndexError):
+        source.frame(40)
+    source.close()
+
+def test_memory_usage_counts_cached_frames(video_path):
+    source = framesource.FrameSource(video_path, cache_bytes=4 * 48 * 64 * 3)
+    source.frame(3)
+    usage = source.memory_usage()
+    assert set(usage) == {"frame cache", "proxy", "frame store"}
+    assert usage["frame cache"] == source.cache.nbytes >= 48 * 64 * 3
+    source.close()
+
+def wait_for_cache(source, indices, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(i in source.cache for i in indices):
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_read_ahead_follows_scrub_direction(video_path):
+    source = framesource.FrameSource(video_path)
+    source.start_prefetch(window=5)
+
+    source.frame(10)
+    source.read_ahead(10, framesource.FORWARD)
+    assert wait_for_cache(source, range(11, 16))
+
+    source.frame(30)
+    source.read_ahead(30, framesource.BACKWARD)
+    assert wait_for_cache(source, range(25, 30))
+
+    source.frame(28)
+    assert source.hits == 1 and source.misses == 2
+    source.close()
+
+@pytest.fixture
+def long_gop_video_path(tmp_path):
+    #moving texture, MPEG-4 part 2 places a keyframe every 12 frames
+    path = str(tmp_path / "synthetic.mp4")
+    texture = np.random.default_rng(0).integers(0, 255, (48, 64, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (64, 48))
+    for i in range(60):
+        writer.write(np.roll(texture, i, axis=1))
+    writer.release()
+    yield path
+
+def test_seek_index_sidecar(long_gop_video_path):
+    index = framesource.SeekIndex.for_video(long_gop_video_path)
+    assert len(index) == 60
+    assert index.keyframes[0] == 0 and len(index.keyframes) < 60
+    assert index.keyframe_before(30) <= 30
+    assert index.frame_at(index.timestamps[17]) == 17
+
+    reloaded = framesource.SeekIndex.load(long_gop_video_path)
+    assert np.array_equal(reloaded.keyframes, index.keyframes)
+    assert np.array_equal(reloaded.timestamps, index.timestamps)
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_index_corrects_the_header_frame_count(long_gop_video_path):
+    source = framesource.FrameSource(long_gop_video_path)
+    #as if the header had reported too few frames
+    source.frame_count = 50
+    source.start_proxy(32, 24)
+    counts = []
+    source.frame_count_changed = counts.append
+    source.start_indexing()
+    assert wait_for(lambda: counts == [60])
+    assert len(source) == 50
+
+    source.set_frame_count(counts[0])
+    assert len(source) == 60 and len(source.proxy) == 60
+    assert wait_for(lambda: source.proxy.filled[:].all())
+    source.frame(59)
+    source.close()
+
+def test_indexed_seeks_are_frame_accurate(long_gop_video_path):
+    capture = cv2.VideoCapture(long_gop_video_path)
+    sequential = [capture.read()[1] for _ in range(60)]
+    capture.release()
+
+    framesource.SeekIndex.for_video(long_gop_video_path)
+    source = framesource.FrameSource(long_gop_video_path, cache_bytes=0)
+    assert source.seek_index is not None
+    for index in [45, 3, 59, 13, 12, 11, 30, 0]:
+        assert np.array_equal(source.frame(index), sequential[index])
+    source.close()
+
+def test_proxy_stream_fills_in_background(video_path):
+    source = framesource.FrameSource(video_path)
+    source.start_proxy(32, 32)
+    assert (source.proxy.width, source.proxy.height) == (32, 24)
+    deadline = time.monotonic() + 5
+    while not source.proxy.filled.all() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert source.proxy.filled.all()
+
+    frame, full_resolution = source.scrub_frame(20)
+    assert not full_resolution and frame.shape == (24, 32, 3)
+    assert abs(frame.mean() - 100) < 3
+    assert source.proxy_hits == 1 and source.misses == 0
+    source.close()
+
+def test_frame_store_persists_between_opens(video_path, tmp_path, monkeypatch):
+    monkeypatch.setenv(diskcache.CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+    store = framestore.FrameStore.open(video_path, 40, 32, 24)
+    assert store.get(5) is None
+    store.put(5, np.full((48, 64, 3), 25, np.uint8))
+    store.close()
+
+    store = framestore.FrameStore.open(video_path, 40, 32, 24)
+    assert store.get(5).shape == (24, 32, 3) and store.get(5).mean() == 25
+    assert store.filled.sum() == 1
+    store.close()
+
+def test_frame_store_quota_evicts_least_recently_used(video_path, tmp_path, monkeypatch):
+    monkeypatch.setenv(diskcache.CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+    size = framestore.FrameStore.store_bytes(40, 32, 24)
+    first = framestore.FrameStore.open(video_path, 40, 32, 24, quota=2 * size)
+    first.close()
+    os.utime(first.entry, (0, 0))
+    second = framestore.FrameStore.open(video_path, 40, 16, 12, quota=2 * size)
+    second.close()
+    third = framestore.FrameStore.open(video_path, 40, 30, 22, quota=2 * size)
+    third.close()
+    assert not os.path.exists(first.entry)
+    assert os.path.exists(second.entry) and os.path.exists(third.entry)
+
+def test_frame_store_is_opt_in(monkeypatch):
+    monkeypatch.delenv(framestore.QUOTA_VARIABLE, raising=False)
+    assert framestore.configured_quota() is None
+    monkeypatch.setenv(framestore.QUOTA_VARIABLE, "0")
+    assert framestore.configured_quota() is None
+    monkeypatch.setenv(framestore.QUOTA_VARIABLE, "2.5")
+    assert framestore.configured_quota() == int(2.5 * 1024 ** 3)
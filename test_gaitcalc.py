@@ -0,0 +1,74 @@
+import pytest
+import numpy as np
+
+import gaitcalc
+import kinematics
+import posefile
+
+LANDMARKS = {'Nostril': 'nostril', 'Poll': 'poll', 'Withers': 'withers', 'Mid Back': 'midback', 'Croup': 'croup',
+             'Right Front Hoof': 'rightFhoof', 'Right Hind Hoof': 'rightHhoof', 'Right Hock': 'righthock',
+             'Right Front Fetlock': 'rightFfetlock', 'Right Hind Fetlock': 'rightHfetlock', 'Right Knee': 'rightknee'}
+
+def engine():
+    return gaitcalc.GaitEngine(posefile.read_pose('test_data/3613data.xlsx'), LANDMARKS)
+
+def test_every_offered_parameter_is_computed():
+    frame = engine().parameters(gaitcalc.GAIT_PARAMETERS)
+    per_frame = [p for p in gaitcalc.GAIT_PARAMETERS if p not in gaitcalc.STRIDE_PARAMETERS]
+    #no parameter is skipped or stored under another name
+    assert list(frame.columns) == per_frame
+    assert not frame.isna().all().any()
+
+def test_parameters_match_kernels():
+    gait = engine()
+    frame = gait.parameters(["Hind Limb Swing Angle", "Right Fore Withers to Hoof Length"])
+    pose = gait.pose
+    croup = pose.xy('croup')
+    assert np.allclose(frame["Hind Limb Swing Angle"], kinematics.angles(croup, pose.xy('rightHhoof'), croup + [0, 1]))
+    assert np.allclose(frame["Right Fore Withers to Hoof Length"], kinematics.distances(pose.xy('withers'), pose.xy('rightFhoof')))
+
+def test_intermediates_are_computed_once():
+    gait = engine()
+    gait.parameters(["Speed"])
+    velocity = gait.memo[gait.key(gaitcalc.velocity("Withers"))]
+    gait.parameters(["Speed", "Neck Length"])
+    assert gait.memo[gait.key(gaitcalc.velocity("Withers"))] is velocity
+
+    #a different mapping gets its own results
+    gait.landmarks["Withers"] = "poll"
+    assert np.allclose(gait.parameters(["Neck Length"])["Neck Length"], 0)
+
+def test_engines_with_other_landmarks_share_results():
+    gait = engine()
+    neck = gait.parameters(["Neck Length"])["Neck Length"]
+    other = gait.with_landmarks(dict(gait.landmarks, Withers="poll"))
+    assert np.allclose(other.parameters(["Neck Length"])["Neck Length"], 0)
+    #the first engine keeps its mapping, and the second finds its results
+    assert gait.landmarks["Withers"] != "poll"
+    assert gait.with_landmarks(gait.landmarks).compute(["Neck Length"])["Neck Length"] is gait.memo[gait.key("Neck Length")]
+    assert np.array_equal(gait.parameters(["Neck Length"])["Neck Length"], neck)
+
+def test_stride_table_and_unknown_names():
+    gait = engine()
+    table = gait.stride_table()
+    #the left limbs are not mapped
+    assert list(table["Limb"].unique()) == ["Right Hind", "Right Fore"]
+    right_hind = table[table["Limb"] == "Right Hind"]
+    assert right_hind["Stride Start"].tolist() == [83, 173]
+    assert np.allclose(right_hind["Duty Factor"], [23 / 90, 22 / 91])
+    with pytest.raises(ValueError):
+        gait.parameters(["Fore Limb Length"])
+
+def test_stride_parameters_share_the_stride_table():
+    gait = engine()
+    limbs = gait.stride_limbs()
+    #the stride detection is an input of the graph, not hidden inside the parameter
+    assert gaitcalc.strides(limbs) in gait.resolve(["Stride Length"])
+    values = gait.compute(["Stride Length", "Duty Factor"])
+    table = gait.memo[gait.key(gaitcalc.strides(limbs))]
+    assert np.array_equal(values["Stride Length"], table["Stride Length"].to_numpy())
+    assert gait.stride_table() is table
+
+    #nothing mapped, no strides
+    gait.landmarks = {}
+    assert len(gait.compute(["Duty Factor"])["Duty Factor"]) == 0
@@ -0,0 +1,32 @@
+import numpy as np
+
+import gait_parameters as gp
+import kinematics
+
+def random_points(n, seed, dtype=np.float64):
+    return (np.random.default_rng(seed).random((n, 2)) * 500).astype(dtype)
+
+def test_angles_match_scalar_angle():
+    vertex, point1, point2 = random_points(200, 0), random_points(200, 1), random_points(200, 2)
+    expected = [gp.angle(v, p1, p2) for v, p1, p2 in zip(vertex, point1, point2)]
+    assert np.allclose(kinematics.angles(vertex, point1, point2), expected)
+    assert np.allclose(kinematics.angles([0, 0], [1, 0], [0, 1]), 90.0)
+
+def test_distances_match_scalar_distance():
+    point1, point2 = random_points(200, 3), random_points(200, 4)
+    expected = [gp.distance(p1, p2) for p1, p2 in zip(point1, point2)]
+    assert np.allclose(kinematics.distances(point1, point2), expected)
+
+def test_speeds():
+    x = np.array([1.0, 2.0, 3.0])
+    assert np.allclose(kinematics.speeds(x, x), 1.4142135623)
+
+def test_float32_and_out():
+    vertex, point1, point2 = random_points(50, 5, np.float32), random_points(50, 6, np.float32), random_points(50, 7, np.float32)
+    out = np.empty(50, dtype=np.float32)
+    result = kinematics.angles(vertex, point1, point2, out=out)
+    assert result is out and result.dtype == np.float32
+    assert np.allclose(out, kinematics.angles(vertex.astype(float), point1.astype(float), point2.astype(float)), atol=1e-3)
+
+    assert kinematics.distances(point1, point2, out=out) is out
+    assert kinematics.speeds(point1[:, 0], point1[:, 1]).dtype == np.float32
@@ -2,38 +2,12 @@ import pytest
 import numpy as np
 import pandas as pd
 import gait_parameters as gp
+import benchmark
+import gaitcalc
+import kinematics
+import posefile
 
-from PyQt5.QtWidgets import QApplication
-
-# Import the angle() and distance() functions here
-@pytest.fixture
-def app(request):
-    application = QApplication([])
-    yield application
-    application.quit()
-
-@pytest.fixture
-def widget(request):
-    widget = gp.ParameterInputDialog([], pd.read_excel('test_data/3613data.xlsx'))
-    widget.confirmed_landmarks = {'Nostril': 'nostril', 'Poll': 'poll', 'Withers': 'withers', 'Shoulder': 'shoulder', 'Elbow': 'elbow', 
-                                  'Mid Back': 'midback', 'Croup': 'croup', 'Hip': 'hip', 'Stifle': 'stifle', 'Dock': 'NOT AVAILABLE', 
-                                  'Left Front Hoof': 'leftFhoof', 'Left Hind Hoof': 'leftHhoof', 'Left Hock': 'lefthock', 
-                                  'Left Front Fetlock': 'rightFfetlock', 'Left Hind Fetlock': 'rightHfetlock', 'Left Knee': 'leftknee', 
-                                  'Right Front Hoof': 'rightFhoof', 'Right Hind Hoof': 'rightHhoof', 'Right Hock': 'righthock', 
-                                  'Right Front Fetlock': 'rightFfetlock', 'Right Hind Fetlock': 'rightHfetlock', 'Right Knee': 'rightknee'}
-    widget.queried_gait_parameters = ['Right Shank', 'Left Shank', 'Head', 'Hind Limb Length', 'Hind Leg Length', 'Fore Limb Length', 
-                                      'Fore Leg Length', 'Neck Length', 'Fore Limb Angle', 'Hind Limb Angle', 'Fore Fetlock Angle', 'Hind Fetlock Angle']
-    widget.summ_stats = ['Minimum', 'Maximum', 'Average', 'Standard Deviation']
-
-    #clean data by combining labels and reindexing
-    bodyparts_labels = widget.data.loc[0]
-    coords_labels = widget.data.loc[1]
-    labels = [i + "_" + j for i, j in zip(bodyparts_labels, coords_labels)]
-    widget.data.columns = labels
-    widget.data = widget.data.iloc[2: , : ]
-    widget.data.index = range(len(widget.data.index))
-    widget.data = widget.data.drop(columns=["bodyparts_coords"])
-    yield widget
+LANDMARKS = {'Right Hock': 'righthock', 'Right Hind Fetlock': 'rightHfetlock'}
 
 def test_angle():
     # Test case 1: Points forming a right angle
@@ -61,53 +35,38 @@ def test_distance():
     distance_3 = gp.distance([0, 0], [3, 4])  # Expected distance: 5.0
     assert np.isclose(distance_3, 5.0)
 
-def test_vectorized_angle():
-    df = pd.DataFrame({'vertex_x': [0, 1, 2],
-                    'vertex_y': [0, 1, 2],
-                    'point1_x': [1, 2, 3],
-                    'point1_y': [0, 1, 2],
-                    'point2_x': [0, 1, 2],
-                    'point2_y': [1, 2, 3],
-                    'angle': [90.0, 90.0, 90.0]})
-    # Apply the angle function using vectorized operations
-    df['computed_angle'] = np.vectorize(gp.angle, signature='(n),(n),(n)->()')(df[['vertex_x', 'vertex_y']].values,
-                                                                             df[['point1_x', 'point1_y']].values,
-                                                                             df[['point2_x', 'point2_y']].values)
-    assert np.allclose(df['computed_angle'], df['angle'])
-
-def test_vectorized_distance():
-    df = pd.DataFrame({'landmark1_x': [1, 2, 3],
-                   'landmark1_y': [4, 5, 6],
-                   'landmark2_x': [7, 8, 9],
-                   'landmark2_y': [10, 11, 12],
-                   'distance': [8.485281, 8.485281, 8.485281]})
-    # Apply the distance function using vectorized operations
-    df['computed_distance'] = np.vectorize(gp.distance, signature='(n),(n)->()')(df[['landmark1_x', 'landmark1_y']].values,
-                                                                              df[['landmark2_x', 'landmark2_y']].values)
-
-    # Check if the computed distances match the expected distances
-    assert np.allclose(df['computed_distance'], df['distance'])
+@pytest.fixture(scope="module")
+def pose():
+    return benchmark.synthetic_pose(300, seed=2)
 
-def test_speed():
-    df = pd.DataFrame({'landmark1_x': [1,  2, 3],
-                   'landmark1_y': [1, 2, 3],
-                   'speed': [1.4142135623, 1.4142135623, 1.4142135623]})
-    
-    horizontal = np.gradient(df['landmark1_x'].to_numpy())
-    vertical = np.gradient(df['landmark1_y'].to_numpy())
-
-    df['computed_speed'] = np.vectorize(np.linalg.norm, signature='(n)->()')(np.array([horizontal, vertical]).T)
-    print(df['computed_speed'])
-    assert np.allclose(df['computed_speed'], df['speed'])
-
-
-def test_shank_calculation(app, widget):
-    calc_frame = pd.DataFrame(columns=widget.queried_gait_parameters, index=widget.data.index)
-    calc_frame['Right Shank'] = widget.vectorized_distance(column1="Right Hock", column2= "Right Hind Fetlock")
-    QApplication.processEvents()
+@pytest.fixture
+def engine(pose):
+    return gaitcalc.GaitEngine(pose, benchmark.synthetic_landmarks(len(pose.bodyparts)))
+
+def test_vectorized_angle(pose, engine):
+    vertex, point1, point2 = pose.xy('midback'), pose.xy('croup'), pose.xy('withers')
+    # The batch kernel gives the same angle as angle() on every frame
+    expected = [gp.angle(v, p1, p2) for v, p1, p2 in zip(vertex, point1, point2)]
+    assert np.allclose(kinematics.angles(vertex, point1, point2), expected, atol=1e-3)
+    assert np.allclose(engine.parameters(["Back Angle"])["Back Angle"], expected, atol=1e-3)
+
+def test_vectorized_distance(pose, engine):
+    point1, point2 = pose.xy('poll'), pose.xy('withers')
+    expected = [gp.distance(p1, p2) for p1, p2 in zip(point1, point2)]
+    assert np.allclose(kinematics.distances(point1, point2), expected, rtol=1e-5)
+    assert np.allclose(engine.parameters(["Neck Length"])["Neck Length"], expected, rtol=1e-5)
+
+def test_speed(pose, engine):
+    withers = pose.xy('withers').astype(np.float64)
+    # Central difference of each component, then the length of the velocity per frame
+    velocity = np.stack([np.gradient(withers[:, 0]), np.gradient(withers[:, 1])], axis=1)
+    expected = [np.linalg.norm(v) for v in velocity]
+    assert np.allclose(kinematics.speeds(withers[:, 0], withers[:, 1]), expected)
+    assert np.allclose(engine.parameters(["Speed"])["Speed"], expected, rtol=1e-4)
+
+def test_shank_calculation():
+    #the shank is the hind cannon, from the hock to the fetlock
+    pose = posefile.read_pose('test_data/3613data.xlsx')
+    calc_frame = gaitcalc.GaitEngine(pose, LANDMARKS).parameters(["Right Hind Cannon Length"])
     correct_right_shank = pd.read_excel('test_data/3613correct_right_shank.xlsx')
-    assert np.allclose(calc_frame["Right Shank"], correct_right_shank["Right Shank"])
-
-
-# Run the tests
-pytest.main()
+    assert np.allclose(calc_frame["Right Hind Cannon Length"], correct_right_shank["Right Shank"])
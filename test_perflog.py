@@ -0,0 +1,65 @@
+import csv
+import json
+import logging
+import pytest
+
+import applog
+import perflog
+import posefile
+
+@pytest.fixture
+def recording():
+    perflog.clear()
+    perflog.set_enabled(True)
+    yield
+    perflog.set_enabled(False)
+    perflog.clear()
+
+def test_nothing_recorded_when_disabled():
+    perflog.clear()
+    perflog.set_enabled(False)
+    with perflog.timed("plot", "test"):
+        pass
+    assert perflog.snapshot() == []
+
+def test_timed_records_fields_and_failures(recording):
+    with perflog.timed("compute", "Speed", frames=10) as timing:
+        timing.fields["strides"] = 2
+    with pytest.raises(ValueError):
+        with perflog.timed("decode", 5):
+            raise ValueError()
+
+    compute, decode = perflog.snapshot()
+    assert compute["stage"] == "compute" and compute["name"] == "Speed"
+    assert compute["frames"] == 10 and compute["strides"] == 2 and compute["ms"] >= 0
+    assert decode["name"] == "5" and decode["failed"] is True
+    assert perflog.snapshot("decode") == [decode]
+    assert perflog.summary(perflog.snapshot())["compute"]["count"] == 1
+
+def test_parse_is_timed_and_exported(recording, tmp_path):
+    posefile.read_pose('test_data/3613data.xlsx')
+    record, = perflog.snapshot("parse")
+    assert record["name"] == "3613data.xlsx" and record["frames"] == 354
+
+    perflog.export(str(tmp_path / "perf.csv"))
+    perflog.export(str(tmp_path / "perf.jsonl"))
+    with open(str(tmp_path / "perf.csv")) as file:
+        rows = list(csv.DictReader(file))
+    assert rows[0]["stage"] == "parse" and rows[0]["frames"] == "354"
+    with open(str(tmp_path / "perf.jsonl")) as file:
+        assert json.loads(file.readline())["bodyparts"] == record["bodyparts"]
+
+def test_log_goes_through_queue_with_module_levels(tmp_path):
+    path = applog.configure(str(tmp_path))
+    try:
+        logging.getLogger("matplotlib.font_manager").debug("findfont: spam")
+        logging.getLogger("gait_parameters").info("computed")
+        perflog.record("load", "trial.csv", 0.5)
+    finally:
+        applog.shutdown()
+        perflog.clear()
+    with open(path) as file:
+        text = file.read()
+    assert "computed" in text
+    assert '"stage": "load"' in text
+    assert "spam" not in text
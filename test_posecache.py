@@ -0,0 +1,49 @@
+import os
+import shutil
+import numpy as np
+
+import diskcache
+import posecache
+import posefile
+
+def test_second_load_is_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setenv(diskcache.CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+    parsed = posecache.load('test_data/3613data.xlsx')
+    cached = posecache.load('test_data/3613data.xlsx')
+
+    assert isinstance(cached.values, np.memmap)
+    assert cached.bodyparts == parsed.bodyparts
+    assert np.array_equal(cached.values, posefile.read_pose('test_data/3613data.xlsx').values, equal_nan=True)
+
+def test_changed_file_is_converted_again(tmp_path, monkeypatch):
+    monkeypatch.setenv(diskcache.CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+    path = str(tmp_path / "pose.csv")
+    with open(path, "w") as file:
+        file.write("scorer,DLC,DLC,DLC\nbodyparts,nose,nose,nose\ncoords,x,y,likelihood\n0,1.0,2.0,0.5\n")
+    first_entry = posecache.entry_path(path)
+    assert posecache.load(path).x("nose")[0] == 1.0
+
+    with open(path, "w") as file:
+        file.write("scorer,DLC,DLC,DLC\nbodyparts,nose,nose,nose\ncoords,x,y,likelihood\n0,7.0,2.0,0.5\n")
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10**9))
+    assert posecache.entry_path(path) != first_entry
+    assert posecache.load(path).x("nose")[0] == 7.0
+
+def test_quota_evicts_and_warm_converts_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv(diskcache.CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+    data = tmp_path / "data"
+    data.mkdir()
+    for name in ["a.xlsx", "b.xlsx", "notes.txt"]:
+        shutil.copy('test_data/3613data.xlsx', str(data / name))
+
+    messages = []
+    assert posecache.warm(str(data), log=messages.append) == 2
+    assert len(os.listdir(diskcache.cache_dir(posecache.CACHE_NAME))) == 2
+    assert not any("notes.txt" in message for message in messages)
+
+    #room for a single converted file: converting b pushes out a
+    shutil.rmtree(diskcache.cache_dir(posecache.CACHE_NAME))
+    one_entry = posefile.read_pose('test_data/3613data.xlsx').nbytes + 4096
+    assert posecache.warm(str(data), quota=one_entry, log=messages.append) == 2
+    entries = os.listdir(diskcache.cache_dir(posecache.CACHE_NAME))
+    assert entries == [os.path.basename(posecache.entry_path(str(data / "b.xlsx")))]
@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+import posedata
+import posefile
+
+def write_dlc_csv(path, values, bodyparts, individuals=None):
+    coords = list(posedata.COORDS) * (values.shape[1] // 3)
+    rows = [["scorer"] + ["DLC_resnet50"] * len(coords)]
+    if individuals is not None:
+        rows.append(["individuals"] + individuals)
+    rows.append(["bodyparts"] + bodyparts)
+    rows.append(["coords"] + coords)
+    with open(path, "w") as file:
+        for row in rows:
+            file.write(",".join(row) + "\n")
+        for i, frame in enumerate(values):
+            file.write(",".join([str(i)] + [repr(float(v)) for v in frame]) + "\n")
+
+def test_csv_header_and_values(tmp_path):
+    values = np.random.default_rng(0).random((20, 6)) * 100
+    values[3, 0] = np.nan
+    path = str(tmp_path / "pose.csv")
+    write_dlc_csv(path, values, ["right_hock"] * 3 + ["nose"] * 3)
+
+    pose = posefile.read_pose(path)
+    assert pose.bodyparts == ["right_hock", "nose"]
+    assert pose.values.dtype == np.float32 and pose.values.flags['C_CONTIGUOUS']
+    assert np.array_equal(pose.values.reshape(20, 6), values.astype(np.float32), equal_nan=True)
+    assert np.isnan(pose.x("right_hock")[3])
+
+def test_csv_multi_animal_header(tmp_path):
+    values = np.arange(24, dtype=float).reshape(2, 12)
+    path = str(tmp_path / "pose.csv")
+    write_dlc_csv(path, values, ["nose"] * 3 + ["tail"] * 3 + ["nose"] * 3 + ["tail"] * 3,
+                  individuals=["horse1"] * 6 + ["horse2"] * 6)
+
+    pose = posefile.read_pose(path)
+    assert pose.bodyparts == ["horse1_nose", "horse1_tail", "horse2_nose", "horse2_tail"]
+    assert np.array_equal(pose.xy("horse2_nose"), values[:, 6:8])
+
+def test_excel_matches_header_cleaning():
+    pose = posefile.read_pose('test_data/3613data.xlsx')
+
+    #the cleaning the display used to do on every open
+    data = pd.read_excel('test_data/3613data.xlsx')
+    labels = [i + "_" + j for i, j in zip(data.loc[0], data.loc[1])]
+    data.columns = labels
+    data = data.iloc[2: , : ].drop(columns=["bodyparts_coords"])
+    expected = posedata.PoseData.from_dataframe(data)
+
+    assert pose.bodyparts == expected.bodyparts
+    assert np.array_equal(pose.values, expected.values, equal_nan=True)
+
+def test_hdf_matches_csv(tmp_path):
+    pytest.importorskip("tables")
+    values = np.random.default_rng(1).random((10, 6)).astype(np.float32)
+    columns = pd.MultiIndex.from_product([["DLC_resnet50"], ["nose", "withers"], list(posedata.COORDS)],
+                                         names=["scorer", "bodyparts", "coords"])
+    path = str(tmp_path / "pose.h5")
+    pd.DataFrame(values, columns=columns).to_hdf(path, key="df_with_missing")
+
+    pose = posefile.read_pose(path)
+    assert pose.bodyparts == ["nose", "withers"]
+    assert np.array_equal(pose.values.reshape(10, 6), values)
+
+def test_unsupported_extension():
+    with pytest.raises(ValueError):
+        posefile.read_pose("pose.txt")
@@ -0,0 +1,52 @@
+import numpy as np
+
+import posetail
+
+HEADER = "scorer,DLC,DLC,DLC\nbodyparts,nose,nose,nose\ncoords,x,y,likelihood\n"
+
+def test_growable_array_amortized_growth():
+    array = posetail.GrowableArray((2,), capacity=4)
+    moves = 0
+    for i in range(100):
+        moves += array.append(np.full((3, 2), i))
+    assert len(array) == 300
+    assert moves == 7 #4 -> 8 -> ... -> 512
+    assert np.array_equal(array.data[::3, 0], np.arange(100))
+
+def test_growable_array_truncate_overwrites_the_end():
+    array = posetail.GrowableArray(capacity=4)
+    array.append(np.arange(5))
+    array.truncate(3)
+    array.append([7, 8])
+    assert np.array_equal(array.data, [0, 1, 2, 7, 8])
+
+def test_csv_tail_reads_only_complete_new_rows(tmp_path):
+    path = str(tmp_path / "pose.csv")
+    with open(path, "w") as file:
+        file.write(HEADER + "0,1.0,2.0,0.9\n1,3.0,4.0,0.8\n2,5.0")
+    tail = posetail.CsvTail(path)
+    assert tail.bodyparts == ["nose"]
+
+    rows = tail.read_new()
+    assert rows.shape == (2, 1, 3)
+    assert np.array_equal(rows[:, 0, 0], [1.0, 3.0])
+    assert len(tail.read_new()) == 0
+
+    #the row being written is finished, then another one is appended
+    with open(path, "a") as file:
+        file.write(",6.0,0.7\n3,7.0,8.0,0.6\n")
+    rows = tail.read_new()
+    assert np.allclose(rows[:, 0, :], [[5.0, 6.0, 0.7], [7.0, 8.0, 0.6]])
+
+def test_csv_tail_restarts_after_truncation(tmp_path):
+    path = str(tmp_path / "pose.csv")
+    with open(path, "w") as file:
+        file.write(HEADER + "0,1.0,2.0,0.9\n1,3.0,4.0,0.8\n")
+    tail = posetail.CsvTail(path)
+    tail.read_new()
+
+    with open(path, "w") as file:
+        file.write(HEADER + "0,9.0,9.0,0.9\n")
+    assert tail.truncated()
+    tail.restart()
+    assert np.array_equal(tail.read_new()[:, 0, 0], [9.0])
@@ -0,0 +1,78 @@
+import pstats
+import threading
+import pytest
+
+import profiling
+
+@pytest.fixture(autouse=True)
+def clean_probes():
+    profiling.reset()
+    yield
+    profiling.reset()
+
+def test_record_percentiles():
+    for ms in range(1, 101):
+        profiling.record("seek", ms / 1000)
+    stats = profiling.latency("seek")
+    assert stats["count"] == 100 and stats["max"] == pytest.approx(100)
+    assert stats["p50"] == pytest.approx(50.5)
+    assert stats["p95"] <= stats["p99"] <= stats["max"]
+    assert profiling.latency("never called") is None
+
+def test_window_keeps_recent_calls_and_total_count(monkeypatch):
+    monkeypatch.setattr(profiling, "WINDOW", 10)
+    for ms in range(20):
+        profiling.record("resize", ms / 1000)
+    stats = profiling.latency("resize")
+    assert stats["count"] == 20
+    assert stats["p50"] == pytest.approx(14.5)
+
+def test_probe_records_calls_that_raise():
+    @profiling.probe("replot")
+    def replot(fail):
+        if fail:
+            raise ValueError()
+        return 1
+
+    assert replot(False) == 1
+    with pytest.raises(ValueError):
+        replot(True)
+    assert replot.__name__ == "replot"
+    assert list(profiling.latencies()) == ["replot"]
+    assert profiling.latency("replot")["count"] == 2
+
+    profiling.reset()
+    assert profiling.latencies() == {}
+
+def test_profile_capture_writes_stats_and_summary(tmp_path):
+    capture = profiling.ProfileCapture()
+    capture.start()
+    assert capture.running
+    sorted(range(1000), key=lambda i: -i)
+    path = str(tmp_path / "session.prof")
+    assert capture.stop(path) >= 0
+    assert not capture.running
+    assert pstats.Stats(path).total_calls > 0
+    assert "cumulative" in open(path + ".txt").read()
+
+def test_capture_includes_worker_threads(tmp_path):
+    def background_work():
+        return sorted(range(1000), key=lambda i: -i)
+
+    def run():
+        with profiling.worker():
+            background_work()
+
+    capture = profiling.ProfileCapture()
+    capture.start()
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    path = str(tmp_path / "session.prof")
+    capture.stop(path)
+    functions = [function for _, _, function in pstats.Stats(path).stats]
+    assert "background_work" in functions
+
+    #outside a capture worker() does nothing
+    with profiling.worker() as block:
+        assert block.profile is None
@@ -0,0 +1,39 @@
+import numpy as np
+from scipy.signal import sosfiltfilt
+
+import posedata
+import smoothing
+
+def noisy(frames, columns, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames)[:, None]
+    return np.sin(t / 40.0 + np.arange(columns)) * 100 + rng.normal(0, 5, (frames, columns))
+
+def test_design_is_cached():
+    assert smoothing.lowpass(4, 6.0, 60) is smoothing.lowpass(4, 6.0, 60)
+    assert smoothing.lowpass(4, 6.0, 30) is not smoothing.lowpass(4, 6.0, 60)
+
+def test_matches_sosfiltfilt_without_gaps():
+    values = noisy(500, 3)
+    expected = sosfiltfilt(smoothing.lowpass(4, 6.0, 60), values, axis=0)
+    assert np.allclose(smoothing.smooth(values, 6.0, 60), expected)
+
+def test_gaps_are_kept_and_not_bridged():
+    values = noisy(600, 2)
+    values[200:220, 0] = np.nan
+    result = smoothing.smooth(values, 6.0, 60)
+
+    assert np.isnan(result[200:220, 0]).all()
+    assert not np.isnan(result[:, 1]).any()
+    #each side of the gap is filtered on its own
+    sos = smoothing.lowpass(4, 6.0, 60)
+    assert np.allclose(result[:200, 0], sosfiltfilt(sos, values[:200, 0]))
+    assert np.allclose(result[220:, 0], sosfiltfilt(sos, values[220:, 0]))
+
+def test_pose_keeps_dtype_and_likelihoods():
+    values = noisy(2000, 30).astype(np.float32)
+    pose = posedata.PoseData(np.stack([values, values, np.ones_like(values)], axis=2), [str(i) for i in range(30)])
+    pose.values[500:510, 3, :2] = np.nan
+    smoothed = smoothing.smooth_pose(pose, 6.0, 60)
+    assert smoothed.values.dtype == np.float32
+    assert np.array_equal(smoothed.likelihoods, pose.likelihoods)
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+#what mainGUI imports before its window shows
+STARTUP_IMPORT = "import applog, videoplayer, grapher, perfview"
+
+#loaded on first use, never at startup
+DEFERRED_MODULES = ["scipy", "cv2", "pandas", "matplotlib.pyplot", "tkinter", "turtle",
+                    "gait_parameters", "gaitcalc", "stridedetect", "smoothing"]
+
+#generous, a cold start on a slow machine; the current figure is well under a second
+STARTUP_BUDGET_SECONDS = 3.0
+
+def import_times(statement):
+    '''
+    Cumulative import time in microseconds of every module imported by statement in a fresh
+    interpreter, and the total of the top level imports, from -X importtime.
+    '''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    modules = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.setdefault(name.strip(), int(cumulative))
+        #top level modules are indented by a single space
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return modules, total
+
+def test_heavy_modules_are_deferred():
+    modules, _ = import_times(STARTUP_IMPORT)
+    loaded = [name for name in DEFERRED_MODULES if name in modules]
+    assert loaded == []
+    assert "grapher" in modules
+
+def test_startup_import_budget():
+    _, total = import_times(STARTUP_IMPORT)
+    assert total / 1e6 < STARTUP_BUDGET_SECONDS
@@ -0,0 +1,45 @@
+import numpy as np
+
+import stridedetect
+
+def synthetic_hock(frames, period, phase):
+    '''
+    Hock moving forward quickly during a third of every stride (swing) and slowly otherwise (stance).
+    '''
+    t = (np.arange(frames) + phase) % period
+    swing = t < period / 3
+    velocity = np.where(swing, 6.0, 0.2)
+    return np.cumsum(velocity)
+
+def test_all_limbs_in_one_table():
+    limbs = ["Right Hind", "Left Hind", "Right Fore"]
+    x = np.stack([synthetic_hock(600, 90, 0), synthetic_hock(600, 90, 45), synthetic_hock(600, 60, 10)], axis=1)
+    table = stridedetect.detect_strides(x, limbs)
+
+    assert list(table.columns) == stridedetect.STRIDE_COLUMNS
+    for limb, period in zip(limbs, [90, 90, 60]):
+        rows = table[table["Limb"] == limb]
+        assert len(rows) >= 600 // period - 2
+        assert np.all(np.abs(rows["Stride Length"] - period) <= 2)
+        #stance is two thirds of the stride
+        assert np.allclose(rows["Duty Factor"], 2 / 3, atol=0.1)
+
+def test_gaps_are_not_strides():
+    limbs = ["Right Hind", "Left Hind"]
+    x = np.stack([synthetic_hock(900, 90, 0), synthetic_hock(900, 90, 45)], axis=1)
+    full = stridedetect.detect_strides(x, limbs)
+
+    #unrepaired gaps of the cleaned pose, in stance and in swing
+    gaps = [(100, 108), (250, 256), (431, 440), (600, 612)]
+    for start, stop in gaps:
+        x[start:stop, 0] = np.nan
+    table = stridedetect.detect_strides(x, limbs)
+
+    rows = table[table["Limb"] == "Right Hind"]
+    assert len(rows) < len(full[full["Limb"] == "Right Hind"])
+    assert np.all(np.abs(rows["Stride Length"] - 90) <= 2)
+    for start, stop in gaps:
+        assert not np.any((rows["Stride Start"] < stop) & (rows["Stride End"] >= start))
+    #the other limb is untouched
+    other = table[table["Limb"] == "Left Hind"].reset_index(drop=True)
+    assert other.equals(full[full["Limb"] == "Left Hind"].reset_index(drop=True))
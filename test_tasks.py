@@ -0,0 +1,90 @@
+import threading
+import numpy as np
+import pytest
+
+import PyQt5.QtCore as qtc
+
+import posefile
+import tasks
+
+@pytest.fixture(scope="module")
+def app():
+    application = qtc.QCoreApplication.instance() or qtc.QCoreApplication([])
+    yield application
+
+def run_until_done(app, task, timeout_ms=10000):
+    '''
+    Start task and process events until it ends. Returns the signals received as (name, args).
+    '''
+    received = []
+    loop = qtc.QEventLoop()
+    task.signals.progress.connect(lambda *args: received.append(("progress", args)))
+    for name in ("finished", "failed", "cancelled"):
+        getattr(task.signals, name).connect(lambda *args, name=name: (received.append((name, args)), loop.quit()))
+    qtc.QTimer.singleShot(timeout_ms, loop.quit)
+    tasks.start(task)
+    loop.exec_()
+    return received
+
+def test_result_is_delivered_on_gui_thread(app):
+    gui_thread = threading.get_ident()
+    threads = []
+    task = tasks.Task(lambda task, a, b: (threads.append(threading.get_ident()), a + b)[1], 2, b=3)
+    task.signals.finished.connect(lambda result: threads.append(threading.get_ident()))
+    received = run_until_done(app, task)
+
+    assert received == [("finished", (5,))]
+    assert threads[0] != gui_thread
+    assert threads[1] == gui_thread
+
+def test_progress_and_cancel(app):
+    started = threading.Event()
+    def work(task):
+        for i in range(1000):
+            task.report(i, 1000)
+            started.set()
+            threading.Event().wait(0.005)
+        return "not cancelled"
+    task = tasks.Task(work)
+    task.signals.progress.connect(lambda done, total: task.cancel() if done >= 2 else None)
+    received = run_until_done(app, task)
+
+    assert received[-1] == ("cancelled", ())
+    assert ("progress", (0, 1000)) in received
+
+def test_progress_beyond_32_bits(app):
+    #bytes read of a CSV over 2 GiB
+    received = run_until_done(app, tasks.Task(lambda task: task.report(3 * 2 ** 30, 4 * 2 ** 30)))
+    assert received[0] == ("progress", (3 * 2 ** 30, 4 * 2 ** 30))
+
+def test_failure_is_reported(app, capsys):
+    def work(task):
+        raise ValueError("bad file")
+    received = run_until_done(app, tasks.Task(work))
+    assert received == [("failed", ("bad file",))]
+
+def test_tasks_run_concurrently(app):
+    #both tasks have to be running at the same time to get past the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    first = tasks.Task(lambda task: barrier.wait() is not None)
+    second = tasks.Task(lambda task: barrier.wait() is not None)
+    tasks.start(first)
+    assert run_until_done(app, second) == [("finished", (True,))]
+    tasks.wait()
+
+def test_csv_parse_reports_progress(tmp_path):
+    pose = posefile.read_pose('test_data/3613data.xlsx')
+    path = str(tmp_path / "trial.csv")
+    with open(path, "w") as file:
+        file.write("scorer" + ",s" * (3 * len(pose.bodyparts)) + "\n")
+        file.write("bodyparts" + "".join(",{0},{0},{0}".format(b) for b in pose.bodyparts) + "\n")
+        file.write("coords" + ",x,y,likelihood" * len(pose.bodyparts) + "\n")
+        for i in range(3000):
+            frame = pose.values[i % len(pose)].reshape(-1)
+            file.write(str(i) + "".join("," + repr(float(v)) for v in frame) + "\n")
+
+    reports = []
+    loaded = posefile.read_csv(path, progress=lambda done, total: reports.append((done, total)))
+    assert np.allclose(loaded.values, posefile.read_csv(path).values, equal_nan=True)
+    assert len(loaded) == 3000
+    assert reports and reports[-1][0] == reports[-1][1]
@@ -1,11 +1,6 @@
 #Standard Library
-import sys
-import glob
 import os
-import cv2
-
-#Numpy
-import numpy as np
+import logging
 
 #PyQt5
 import PyQt5.QtWidgets as qtw
@@ -17,10 +12,20 @@ import matplotlib
 matplotlib.use('Qt5Agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
-from matplotlib.axis import Axis
 
 #Other GUI Files
 import grapher
+import framesource
+import framestore
+import playback
+import tasks
+import perflog
+import profiling
+
+logger = logging.getLogger(__name__)
+
+#milliseconds the position has to stay still before a proxy frame is replaced by the full resolution frame
+SETTLE_MS = 150
 
 class MplCanvas(FigureCanvasQTAgg):
     def __init__(self, parent=None, width=5, height=4, dpi=100):
@@ -38,15 +43,47 @@ class CustomSlider(qtw.QSlider):
             super().keyPressEvent(event)
 
 class VideoPlayer(qtw.QWidget):
+    #emitted with the new frame number whenever the displayed frame changes
+    positionChanged = qtc.pyqtSignal(int)
+
+    #frame source and its frame count from the seek index, emitted on the indexing thread
+    frameCountChanged = qtc.pyqtSignal(object, int)
+
     def __init__(self):
         super().__init__()
 
-        #create list of frames as Pixmap objects
-        self.frames = []
+        #lazily decoded frames of the open video, None until a video is opened
+        self.frame_source = None
+
+        #memory budget for decoded frames held by the frame source
+        self.frame_cache_bytes = framesource.DEFAULT_CACHE_BYTES
+
+        #decoded frames are kept on disk between sessions within this quota, None (the default) disables it
+        self.disk_cache_quota = framestore.configured_quota()
+
+        #store full resolution frames on disk too, not only the scrubbing proxy (uses a lot of disk for HD video)
+        self.disk_cache_full_resolution = False
+
+        #number of frames decoded in the background ahead of the current frame
+        self.prefetch_window = framesource.DEFAULT_PREFETCH_WINDOW
+
+        #direction of the last position change, read-ahead follows it when scrubbing in reverse
+        self.scrub_direction = framesource.FORWARD
 
         #bool to describe state of pause/play
         self.isPlaying = False
 
+        #decides which frame is due during playback and drops frames we cannot keep up with
+        self.playback = playback.PlaybackClock(self)
+        self.playback.frameDue.connect(self.set_position)
+        self.playback.stopped.connect(self.playback_stopped)
+
+        #video being opened in the background, None when idle
+        self.open_task = None
+
+        #the seek index is built on a thread of its own, the player is resized on the GUI thread
+        self.frameCountChanged.connect(self.frame_count_changed, qtc.Qt.QueuedConnection)
+
         #store a reference to the grapher obj
         self.graph_reference = None
 
@@ -93,12 +130,28 @@ class VideoPlayer(qtw.QWidget):
         saveBtn = qtw.QPushButton('Save Current Frame')
         saveBtn.clicked.connect(self.save_frame_to_file)
 
+        #create play/pause button
+        self.playBtn = qtw.QPushButton('Play')
+        self.playBtn.clicked.connect(self.toggle_playback)
+
+        #create playback rate selector
+        self.rateBox = qtw.QComboBox()
+        for rate in playback.PLAYBACK_RATES:
+            self.rateBox.addItem("{:g}x".format(rate), rate)
+        self.rateBox.setCurrentIndex(playback.PLAYBACK_RATES.index(1.0))
+        self.rateBox.currentIndexChanged.connect(self.change_playback_rate)
+
+        #create playback statistics label, updated while playing
+        self.playbackLabel = qtw.QLabel()
+        self.playbackLabel.setSizePolicy(qtw.QSizePolicy.Preferred, qtw.QSizePolicy.Maximum)
+        self.playbackLabelString = "Playback: {:.1f} fps, {} dropped"
+
         #create scrubbing slider
         self.slider = CustomSlider(qtc.Qt.Horizontal)
         self.slider.setRange(0,0)
         self.slider.sliderMoved.connect(self.set_position)
         self.slider.valueChanged.connect(self.set_position)
-        self.slider.keyPressEvent
+        self.slider.sliderPressed.connect(self.pause)
 
         #create frame label
         self.frameLabel = qtw.QLabel()
@@ -106,13 +159,28 @@ class VideoPlayer(qtw.QWidget):
         self.frameLabelString = "Frame: {} / {}"
         self.frameLabel.setText(self.frameLabelString)
 
+        #create frame cache statistics label
+        self.cacheLabel = qtw.QLabel()
+        self.cacheLabel.setSizePolicy(qtw.QSizePolicy.Preferred, qtw.QSizePolicy.Maximum)
+        self.cacheLabelString = "Cache: {} hits / {} proxy / {} misses ({:.0%})"
+
+        #create timer that swaps the scrubbing proxy for the full resolution frame
+        self.settleTimer = qtc.QTimer(self)
+        self.settleTimer.setSingleShot(True)
+        self.settleTimer.setInterval(SETTLE_MS)
+        self.settleTimer.timeout.connect(self.show_full_resolution)
+
         #create hbox layout
         hboxLayout = qtw.QHBoxLayout()
         hboxLayout.setContentsMargins(0,0,0,0)
 
         #set widgets to the hbox layout
+        hboxLayout.addWidget(self.playBtn)
+        hboxLayout.addWidget(self.rateBox)
         hboxLayout.addWidget(openBtn)
         hboxLayout.addWidget(saveBtn)
+        hboxLayout.addWidget(self.cacheLabel)
+        hboxLayout.addWidget(self.playbackLabel)
 
         #create vbox layout
         mainLayout = qtw.QVBoxLayout()
@@ -127,8 +195,9 @@ class VideoPlayer(qtw.QWidget):
         self.setLayout(mainLayout)
     
     #EVENTS=============================================================
+    @profiling.probe("resizeEvent")
     def resizeEvent(self, _event: qtg.QResizeEvent = None) -> None:
-        if self.frames:
+        if self.frame_source is not None:
             rect = self.geometry()
             size = qtc.QSize(rect.width(), rect.height())
 
@@ -142,71 +211,163 @@ class VideoPlayer(qtw.QWidget):
               pixmap_size.width() <= size.width()):
                 return
 
-            self.imageSurface.setPixmap(self.frames[self.current_frame].scaled(size,
-                qtc.Qt.KeepAspectRatio, qtc.Qt.SmoothTransformation))
+            self.imageSurface.setPixmap(self.frame_pixmap(self.frame_source.frame(self.current_frame)))
             self.imageSurface.setFixedHeight(int(size.width() / self.aspect_ratio))
     
+    @profiling.probe("set_position")
     def set_position(self, position):
         #self.imageSurface.axes.imshow(self.frames[position])
+        if self.frame_source is None: return
+        position = min(max(position, 0), len(self.frame_source) - 1)
+        if position > self.current_frame:
+            self.scrub_direction = framesource.FORWARD
+        elif position < self.current_frame:
+            self.scrub_direction = framesource.BACKWARD
         self.current_frame = position
-        self.imageSurface.setPixmap(self.frames[self.current_frame])
-        currFrameString = self.frameLabelString.format(position, len(self.frames) - 1)
+
+        #while scrubbing, uncached frames are shown from the proxy until the position settles
+        frame, full_resolution = self.frame_source.scrub_frame(position)
+        self.imageSurface.setPixmap(self.frame_pixmap(frame))
+        if full_resolution:
+            self.settleTimer.stop()
+        else:
+            self.settleTimer.start()
+
+        currFrameString = self.frameLabelString.format(position, len(self.frame_source) - 1)
         self.frameLabel.setText(currFrameString)
+        #valueChanged would call set_position again for the frame just shown
+        self.slider.blockSignals(True)
         self.slider.setSliderPosition(position)
+        self.slider.blockSignals(False)
+
+        self.frame_source.read_ahead(position, self.scrub_direction)
+        self.cacheLabel.setText(self.cacheLabelString.format(self.frame_source.hits,
+            self.frame_source.proxy_hits, self.frame_source.misses, self.frame_source.hit_rate()))
+
+        if self.isPlaying:
+            if position != self.playback.current_frame:
+                #moved by the user during playback, carry on playing from there
+                self.playback.seek(position)
+            self.playbackLabel.setText(self.playbackLabelString.format(self.playback.achieved_fps(),
+                self.playback.dropped_frames))
+
+        self.positionChanged.emit(position)
+
+    #PLAYBACK=============================================================
+    def toggle_playback(self):
+        if self.isPlaying:
+            self.pause()
+        elif self.frame_source is not None:
+            start = self.current_frame
+            if start >= len(self.frame_source) - 1:
+                start = 0
+                self.set_position(start)
+            self.isPlaying = True
+            self.playBtn.setText('Pause')
+            self.playback.start(start)
+
+    def pause(self):
+        self.playback.stop()
+
+    def playback_stopped(self):
+        self.isPlaying = False
+        self.playBtn.setText('Play')
+        self.playbackLabel.setText(self.playbackLabelString.format(self.playback.achieved_fps(),
+            self.playback.dropped_frames))
+
+    def change_playback_rate(self, _index):
+        self.playback.set_rate(self.rateBox.currentData())
+
+    def show_full_resolution(self):
+        if self.frame_source is not None:
+            self.imageSurface.setPixmap(self.frame_pixmap(self.frame_source.frame(self.current_frame)))
 
     #FILE HANDLING======================================================
     def open_file(self):
+        filename, _ = qtw.QFileDialog.getOpenFileName(self, "Open Video")
+
+        if filename:
+            if self.open_task is not None:
+                self.open_task.cancel()
+            #the container is opened and the first frame decoded on the task pool
+            task = tasks.Task(open_source, filename, self.frame_cache_bytes,
+                self.disk_cache_quota, self.disk_cache_full_resolution)
+            tasks.ProgressDialog(task, "Opening " + os.path.basename(filename) + "...", self)
+            task.signals.finished.connect(lambda source: self.video_opened(task, source))
+            task.signals.failed.connect(lambda message: self.video_open_failed(task, message))
+            task.signals.cancelled.connect(lambda: self.video_open_failed(task, None))
+            self.open_task = tasks.start(task)
+
+    def video_opened(self, task, source):
+        if task is not self.open_task or task.is_cancelled():
+            #cancelled, or a newer video was opened meanwhile
+            source.close()
+            return
+        self.open_task = None
         try:
-            filename, _ = qtw.QFileDialog.getOpenFileName(self, "Open Video")
-
-            if filename:
-                self.frames.clear()
-                self.extract_frames(filename)
-
-                self.slider.setRange(0, len(self.frames) - 1)
-
-                self.imageSurface.setPixmap(self.frames[self.current_frame])
-                 
-                self.aspect_ratio = self.frames[self.current_frame].width() / self.frames[self.current_frame].height()
-                self.resizeEvent()
-                #self.imageSurface.axes.imshow(self.frames[self.current_frame])
-
-                self.set_position(0)
+            self.pause()
+            if self.frame_source is not None:
+                self.frame_source.close()
+                self.frame_source = None
+            self.frame_source = source
+            self.frame_source.frame_count_changed = lambda frame_count: self.frameCountChanged.emit(source, frame_count)
+            self.frame_source.start_indexing()
+            self.frame_source.start_prefetch(self.prefetch_window)
+            self.frame_source.start_proxy(self.geometry().width(), self.geometry().height())
+            self.current_frame = 0
+            self.scrub_direction = framesource.FORWARD
+
+            self.slider.setRange(0, len(self.frame_source) - 1)
+            self.playback.set_video(self.frame_source.fps, len(self.frame_source))
+
+            self.imageSurface.setPixmap(self.frame_pixmap(self.frame_source.frame(self.current_frame)))
+             
+            self.aspect_ratio = self.frame_source.aspect_ratio
+            self.resizeEvent()
+            #self.imageSurface.axes.imshow(self.frames[self.current_frame])
+
+            self.set_position(0)
         except Exception as e:
-                show_warning_messagebox("Error occured when opening video. Please check format of file.")
-                print(str(e))
-    
-    def extract_frames(self, path):
-        # Path to video file
-        vidObj = cv2.VideoCapture(path)
-    
-        # Used as counter variable
-        count = 0
-    
-        # checks whether frames were extracted
-        success = 1
-    
-        while success:
+            logger.exception("Could not show video %s", source.path)
+            show_warning_messagebox("Error occured when opening video. Please check format of file.")
+
+    #the seek index counted a different number of frames than the video header reported
+    def frame_count_changed(self, source, frame_count):
+        if source is not self.frame_source: return
+        self.pause()
+        source.set_frame_count(frame_count)
+        self.slider.setRange(0, frame_count - 1)
+        self.playback.set_video(source.fps, frame_count)
+        self.set_position(min(self.current_frame, frame_count - 1))
+
+    #message is None when opening was cancelled
+    def video_open_failed(self, task, message):
+        if task is not self.open_task: return
+        self.open_task = None
+        if message is not None:
+            logger.error("Could not open video: %s", message)
+            show_warning_messagebox("Error occured when opening video. Please check format of file.")
     
-            # vidObj object calls read
-            # function extract frames
-            success, image = vidObj.read()
-
-            if success:
-                image = qtg.QImage(image.data, image.shape[1], image.shape[0], qtg.QImage.Format_RGB888).rgbSwapped()
-                image = qtg.QPixmap.fromImage(image)
-                #image = image.scaled(720, 720, qtc.Qt.KeepAspectRatio)
-                self.frames.append(image)
-    
-            # Saves the frames with frame-count
-            #cv2.imwrite("frame%d.jpg" % count, image)
-    
-            count += 1
+    def frame_pixmap(self, frame, scaled=True):
+        '''
+        Convert a decoded BGR frame into a QPixmap. Unless scaled is False the frame is first shrunk
+        to the size it is displayed at, so the conversion only touches pixels that are shown.
+        '''
+        if scaled:
+            rect = self.geometry()
+            scale = min(rect.width() / frame.shape[1], rect.height() / frame.shape[0])
+            if scale < 1:
+                size = (max(int(frame.shape[1] * scale), 1), max(int(frame.shape[0] * scale), 1))
+                frame = framesource.resize(frame, *size)
+        image = qtg.QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], qtg.QImage.Format_BGR888)
+        return qtg.QPixmap.fromImage(image)
 
     def save_frame_to_file(self):
-        photo = self.frames[self.current_frame]
+        if self.frame_source is None: return
+        photo = self.frame_pixmap(self.frame_source.frame(self.current_frame), scaled=False)
         filename, _ = qtw.QFileDialog.getSaveFileName(self, "Save File", '', '*.jpg')
-        photo.save(filename)
+        if filename:
+            photo.save(filename)
 
     #GRAPH INTERACTIVITY======================================================
     def set_graph_reference(self, graph: grapher.DataDisplay):
@@ -214,7 +375,7 @@ class VideoPlayer(qtw.QWidget):
 
     def click_graph(self, event):
         if all(event.inaxes != ax for ax in self.graph_reference.plot.axes): return
-        if self.graph_reference.plot.axes[0].lines and self.graph_reference.plot.axes[1].lines:
+        if self.graph_reference.has_data():
             position = round(event.xdata)
             self.set_position(position)
             self.slider.setValue(position)
@@ -230,6 +391,22 @@ class VideoPlayer(qtw.QWidget):
             self.slider.setValue(position)
 
 
+def open_source(task, path, cache_bytes, disk_quota, store_full_resolution):
+    '''
+    Open a FrameSource and decode its first frame, run as a background task.
+    '''
+    with perflog.timed("load", os.path.basename(path)) as timing:
+        source = framesource.FrameSource(path, cache_bytes, disk_quota, store_full_resolution)
+        timing.fields.update(frames=len(source), width=source.width, height=source.height)
+    try:
+        task.check()
+        source.frame(0)
+        task.check()
+    except BaseException:
+        source.close()
+        raise
+    return source
+
 def show_warning_messagebox(message):
     msg = qtw.QMessageBox()
     msg.setIcon(qtw.QMessageBox.Warning)